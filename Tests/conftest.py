@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Fixtures shared by the GIACONVERT tests.
+"""
+
+import io
+
+import pytest
+from docx import Document
+
+
+@pytest.fixture
+def pictures_docx(tmp_path):
+    """Make a .docx in tmp_path with one paragraph per picture given (and one in the header)"""
+    def make(name, *images, header_image=None):
+        doc = Document()
+        if header_image is not None:
+            doc.sections[0].header.paragraphs[0].add_run().add_picture(io.BytesIO(header_image))
+        for image in images:
+            doc.add_paragraph().add_run().add_picture(io.BytesIO(image))
+        path = tmp_path / name
+        doc.save(str(path))
+        return path
+    return make
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Sample pictures shared by the GIACONVERT tests.
+"""
+
+import io
+
+from PIL import Image
+
+
+def png_bytes(color, size=(64, 48)):
+    """A solid-colour PNG"""
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, format='PNG')
+    return output.getvalue()
+
+
+def jpeg_bytes(color, size):
+    """A solid-colour JPEG"""
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, format='JPEG')
+    return output.getvalue()
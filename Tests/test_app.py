@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Tests for the GIACONVERT web backend (FastAPI app).
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from docx import Document
+from fastapi.testclient import TestClient
+
+import app as webapp
+
+TEST_DOCUMENTS = Path(__file__).parent / "test_documents"
+FINISHED = ('completed', 'completed_with_errors', 'failed')
+
+
+@pytest.fixture
+def client():
+    with TestClient(webapp.app) as test_client:
+        yield test_client
+
+
+def wait_for(client, conversion_id, timeout=60):
+    """Poll the status endpoint until the conversion finishes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/api/status/{conversion_id}").json()
+        if status['status'] in FINISHED:
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"Conversion {conversion_id} did not finish in {timeout}s")
+
+
+def start(client, files, destination):
+    response = client.post("/api/convert", json={
+        'files': [str(f) for f in files],
+        'mode': 'complete',
+        'output_option': 'single_folder',
+        'destination_path': str(destination),
+    })
+    assert response.status_code == 200, response.text
+    return response.json()['conversion_id']
+
+
+def test_conversion_completes(client, tmp_path):
+    docs = sorted(TEST_DOCUMENTS.glob("sample_document*.docx"))
+    status = wait_for(client, start(client, docs, tmp_path))
+    assert status['status'] == 'completed'
+    assert status['completed_files'] == len(docs)
+    assert [Path(r['source_file']).name for r in status['results']] == [d.name for d in docs]
+
+
+def test_image_options(client, tmp_path):
+    assert 'auto' in client.get("/api/modes").json()['image_formats']
+    docs = [TEST_DOCUMENTS / "sample_document.docx"]
+    request = {'files': [str(d) for d in docs], 'mode': 'complete', 'output_option': 'single_folder',
+               'destination_path': str(tmp_path)}
+    response = client.post("/api/convert", json={**request, 'image_format': 'tiff'})
+    assert response.status_code == 400
+
+    response = client.post("/api/convert", json={**request, 'image_format': 'auto', 'responsive_images': True})
+    status = wait_for(client, response.json()['conversion_id'])
+    assert status['status'] == 'completed'
+    for result in status['results']:
+        if result['images_extracted']:
+            assert 'loading="lazy"' in Path(result['output_file']).read_text(encoding='utf-8')
+    assert status['image_bytes'] == sum(r['image_bytes'] for r in status['results'])
+    assert status['image_source_bytes'] == sum(r['image_source_bytes'] for r in status['results'])
+
+
+def test_health_stays_responsive_during_conversion(client, tmp_path):
+    """A long conversion must not stall the event loop"""
+    large = tmp_path / "large.docx"
+    doc = Document()
+    for i in range(1500):
+        doc.add_paragraph(f"Paragraph {i} of a long contract.")
+    doc.save(str(large))
+
+    conversion_id = start(client, [large, large], tmp_path / "out")
+    assert client.get(f"/api/status/{conversion_id}").json()['status'] not in FINISHED
+
+    started = time.perf_counter()
+    assert client.get("/api/health").status_code == 200
+    assert time.perf_counter() - started < 0.5
+
+    wait_for(client, conversion_id)
+
+
+def test_slow_job_store_does_not_stall_other_requests(client, tmp_path, monkeypatch):
+    """A status read waiting on the job store (e.g. a locked database) runs off the event loop"""
+    import threading
+
+    conversion_id = start(client, [TEST_DOCUMENTS / "sample_document.docx"], tmp_path)
+    wait_for(client, conversion_id)
+    jobs = webapp.app.state.job_store
+    read, reading = jobs.get, threading.Event()
+
+    def slow_get(job_id):
+        reading.set()
+        time.sleep(1.0)
+        return read(job_id)
+
+    monkeypatch.setattr(jobs, 'get', slow_get)
+    status = threading.Thread(target=client.get, args=(f"/api/status/{conversion_id}",))
+    status.start()
+    assert reading.wait(5)
+    started = time.perf_counter()
+    assert client.get("/api/modes").status_code == 200
+    assert time.perf_counter() - started < 0.5
+    status.join()
+
+
+def test_cache_counters(tmp_path, monkeypatch):
+    """Repeat conversions are served from the cache and counted per job and globally"""
+    monkeypatch.setattr(webapp, 'CACHE_DIR', str(tmp_path / "cache"))
+    docs = sorted(TEST_DOCUMENTS.glob("sample_document*.docx"))
+    with TestClient(webapp.app) as client:
+        first = wait_for(client, start(client, docs, tmp_path / "first"))
+        second = wait_for(client, start(client, docs, tmp_path / "second"))
+        health = client.get("/api/health").json()
+
+    assert (first['cache_hits'], first['cache_misses']) == (0, len(docs))
+    assert (second['cache_hits'], second['cache_misses']) == (len(docs), 0)
+    assert all(r['cached'] for r in second['results'])
+    assert health['cache'] == {'hits': len(docs), 'misses': len(docs)}
+
+
+def test_finished_jobs_expire(tmp_path, monkeypatch):
+    """The sweeper forgets finished jobs, their downloads and expired uploads"""
+    monkeypatch.setattr(webapp, 'JOB_TTL', 0)
+    monkeypatch.setattr(webapp, 'UPLOAD_TTL', 0)
+    with TestClient(webapp.app) as client:
+        data = (TEST_DOCUMENTS / "sample_document.docx").read_bytes()
+        upload = client.post("/api/upload", files=[('files', ('sample.docx', data))]).json()[0]
+        status = wait_for(client, start(client, [upload['path']], tmp_path))
+        file_id = status['results'][0]['file_id']
+        assert client.get(f"/api/download/{file_id}").status_code == 200
+
+        stats = client.get("/api/jobs").json()
+        assert (stats['jobs'], stats['running_jobs'], stats['downloads'], stats['uploads']) == (1, 0, 1, 1)
+        assert stats['upload_dir_bytes'] >= len(data)
+
+        time.sleep(0.01)
+        swept = webapp.sweep_jobs()
+        assert (swept['jobs'], swept['uploads']) == (1, 1)
+        assert not Path(upload['path']).exists()
+        assert client.get(f"/api/status/{status['conversion_id']}").status_code == 404
+        assert client.get(f"/api/download/{file_id}").status_code == 404
+        assert client.get("/api/jobs").json()['jobs'] == 0
+
+
+def test_sqlite_job_store(tmp_path, monkeypatch):
+    """With the SQLite backend, a restarted server still knows finished conversions"""
+    monkeypatch.setattr(webapp, 'JOB_STORE', 'sqlite')
+    monkeypatch.setattr(webapp, 'JOB_DB', str(tmp_path / "jobs.sqlite3"))
+    docs = sorted(TEST_DOCUMENTS.glob("sample_document*.docx"))
+    with TestClient(webapp.app) as client:
+        status = wait_for(client, start(client, docs, tmp_path / "out"))
+        assert client.get("/api/jobs").json()['backend'] == 'sqlite'
+
+    with TestClient(webapp.app) as client:
+        again = client.get(f"/api/status/{status['conversion_id']}").json()
+        assert again['status'] == 'completed'
+        assert again['results'] == status['results']
+        assert client.get(f"/api/download/{status['results'][0]['file_id']}").status_code == 200
+
+
+def test_full_queue_is_rejected(client, tmp_path, monkeypatch):
+    """Jobs beyond the admission queue are turned away with 503"""
+    import asyncio
+
+    monkeypatch.setattr(webapp.app.state, 'conversion_queue', asyncio.Queue(maxsize=1))
+    docs = [TEST_DOCUMENTS / "sample_document.docx"]
+    start(client, docs, tmp_path)
+    response = client.post("/api/convert", json={
+        'files': [str(d) for d in docs],
+        'mode': 'basic',
+        'output_option': 'single_folder',
+        'destination_path': str(tmp_path),
+    })
+    assert response.status_code == 503
+
+
+def read_events(client, conversion_id, headers=None):
+    """Collect (event, id, data) from the progress stream until it ends"""
+    import json
+
+    events = []
+    with client.stream("GET", f"/api/events/{conversion_id}", headers=headers or {}) as response:
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/event-stream')
+        event = {}
+        for line in response.iter_lines():
+            if line.startswith('event: '):
+                event['event'] = line[len('event: '):]
+            elif line.startswith('id: '):
+                event['id'] = line[len('id: '):]
+            elif line.startswith('data: '):
+                event['data'] = json.loads(line[len('data: '):])
+            elif not line and event:
+                events.append(event)
+                event = {}
+    return events
+
+
+def test_progress_stream_sends_each_file_once(client, tmp_path):
+    docs = sorted(TEST_DOCUMENTS.glob("sample_document*.docx")) + [tmp_path / "missing.docx"]
+    conversion_id = start(client, docs, tmp_path)
+    events = read_events(client, conversion_id)
+
+    results = [e['data'] for e in events if e['event'] == 'result']
+    errors = [e['data'] for e in events if e['event'] == 'file_error']
+    assert [Path(r['source_file']).name for r in results] == [d.name for d in docs[:-1]]
+    assert [Path(e['source_file']).name for e in errors] == ['missing.docx']
+    assert all('results' not in e['data'] for e in events if e['event'] in ('progress', 'done'))
+
+    done = events[-1]
+    assert done['event'] == 'done'
+    assert done['data']['status'] == 'completed_with_errors'
+    assert (done['data']['results_count'], done['data']['errors_count']) == (len(docs) - 1, 1)
+    assert done['id'] == f"{len(docs) - 1}:1"
+
+    # A reconnecting browser only receives what it has not seen yet
+    resumed = read_events(client, conversion_id, headers={'Last-Event-ID': f"{len(docs) - 2}:1"})
+    assert [e['event'] for e in resumed] == ['result', 'done']
+    assert resumed[0]['data'] == results[-1]
+
+    assert client.get("/api/events/unknown").status_code == 404
+
+
+def test_progress_stream_sees_a_change_made_while_sending(client):
+    """A status change between the stream's read of the job and its wait is not lost"""
+    import asyncio
+
+    jobs = webapp.app.state.job_store
+    jobs.create('racing', **webapp.new_job_counters(1, '2024-01-01T00:00:00'))
+
+    async def stream():
+        events = webapp.conversion_events('racing', None, 0, 0)
+        assert (await events.__anext__()).startswith('event: progress')
+        # The job finishes after the stream has read it, before it starts waiting
+        jobs.update('racing', status='completed', progress=1.0)
+        webapp.notify_status('racing')
+        return await asyncio.wait_for(events.__anext__(), webapp.EVENT_KEEPALIVE / 10)
+
+    assert asyncio.run(stream()).startswith('event: done')
+
+
+def test_status_pages_with_a_cursor(client, tmp_path):
+    docs = sorted(TEST_DOCUMENTS.glob("sample_document*.docx"))
+    docs = docs + docs + [tmp_path / "missing.docx"]
+    conversion_id = start(client, docs, tmp_path)
+    full = wait_for(client, conversion_id)
+    assert full['results_count'] == len(full['results']) == len(docs) - 1
+
+    results, errors, cursor = [], [], '0:0'
+    while True:
+        page = client.get(f"/api/status/{conversion_id}", params={'since': cursor, 'limit': 2}).json()
+        assert len(page['results']) <= 2 and len(page['errors']) <= 2
+        assert (page['results_count'], page['errors_count']) == (len(docs) - 1, 1)
+        results += page['results']
+        errors += page['errors']
+        cursor = page['next_cursor']
+        if not page['has_more']:
+            break
+    assert results == full['results']
+    assert errors == full['errors']
+    assert cursor == f"{len(docs) - 1}:1"
+
+    # Nothing new after the last cursor
+    page = client.get(f"/api/status/{conversion_id}", params={'since': cursor}).json()
+    assert (page['results'], page['errors'], page['next_cursor']) == ([], [], cursor)
+
+    assert client.get(f"/api/status/{conversion_id}", params={'since': 'abc'}).status_code == 400
+    assert client.get(f"/api/status/{conversion_id}", params={'limit': 0}).status_code == 400
+
+
+def test_upload_is_streamed_and_hashed(client):
+    import hashlib
+
+    source = TEST_DOCUMENTS / "sample_document_with_images.docx"
+    data = source.read_bytes()
+    response = client.post("/api/upload", files=[('files', (source.name, data))])
+    assert response.status_code == 200, response.text
+    upload = response.json()[0]
+
+    assert upload['size'] == len(data)
+    assert upload['sha256'] == hashlib.sha256(data).hexdigest()
+    assert Path(upload['path']).read_bytes() == data
+    assert webapp.app.state.job_store.upload_hash(upload['path']) == upload['sha256']
+
+
+def test_upload_limits(client, monkeypatch):
+    data = (TEST_DOCUMENTS / "sample_document.docx").read_bytes()
+    upload_dir = webapp.app.state.upload_dir
+    before = set(upload_dir.iterdir())
+
+    # Per file: the oversized file is rejected and nothing from the request is kept
+    monkeypatch.setattr(webapp, 'UPLOAD_CHUNK_SIZE', 1024)
+    monkeypatch.setattr(webapp, 'MAX_UPLOAD_FILE_BYTES', len(data) - 1)
+    response = client.post("/api/upload", files=[('files', ('small.docx', b'x' * 10)), ('files', ('big.docx', data))])
+    assert response.status_code == 413
+    assert 'per file' in response.json()['error']['message']
+    assert set(upload_dir.iterdir()) == before
+
+    # Per request: each file fits, together they do not
+    monkeypatch.setattr(webapp, 'MAX_UPLOAD_FILE_BYTES', None)
+    monkeypatch.setattr(webapp, 'MAX_UPLOAD_REQUEST_BYTES', len(data) + len(data) // 2)
+    response = client.post("/api/upload", files=[('files', ('a.docx', data)), ('files', ('b.docx', data))])
+    assert response.status_code == 413
+    assert 'per request' in response.json()['error']['message']
+    assert set(upload_dir.iterdir()) == before
+
+    # Announced bodies over the request limit are refused before they are read
+    monkeypatch.setattr(webapp, 'MAX_UPLOAD_REQUEST_BYTES', 1024)
+    response = client.post("/api/upload", files=[('files', ('a.docx', b'x' * 200 * 1024))])
+    assert response.status_code == 413
+
+
+def test_resumable_upload(client, tmp_path, monkeypatch):
+    """Chunks arrive out of order, the upload resumes from its missing chunks and converts in place"""
+    import hashlib
+
+    monkeypatch.setattr(webapp.app.state.upload_store, 'chunk_size', 4096)
+    data = (TEST_DOCUMENTS / "sample_document_with_images.docx").read_bytes()
+    upload = client.post("/api/uploads", json={'filename': 'report.docx', 'size': len(data)}).json()
+    upload_id, chunk_size = upload['upload_id'], upload['chunk_size']
+    assert upload['missing'] == list(range(upload['chunks']))
+
+    def put(index, body=None):
+        chunk = data[index * chunk_size:(index + 1) * chunk_size]
+        return client.put(f"/api/uploads/{upload_id}", params={'offset': index * chunk_size},
+                          content=chunk if body is None else body,
+                          headers={'X-Chunk-SHA256': hashlib.sha256(chunk).hexdigest()})
+
+    # Send every other chunk backwards, as if the connection dropped half way
+    for index in reversed(upload['missing'][::2]):
+        assert put(index).status_code == 200
+    assert put(1, body=b'corrupted'.ljust(chunk_size, b'!')).status_code == 400
+    response = client.post(f"/api/uploads/{upload_id}/finalize", json={})
+    assert response.status_code == 409
+
+    missing = client.get(f"/api/uploads/{upload_id}").json()['missing']
+    assert missing == upload['missing'][1::2]
+    for index in missing:
+        assert put(index).status_code == 200
+
+    sha256 = hashlib.sha256(data).hexdigest()
+    response = client.post(f"/api/uploads/{upload_id}/finalize", json={'sha256': sha256})
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result['sha256'] == sha256
+    assert Path(result['path']).read_bytes() == data
+    assert client.get(f"/api/uploads/{upload_id}").status_code == 404
+
+    status = wait_for(client, start(client, [result['path']], tmp_path))
+    assert status['status'] == 'completed'
+
+
+def test_racing_finalize_requests_move_the_upload_once(client):
+    """Two finalize requests for one upload: one gets the file, the other a 404"""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    data = b'x' * 10
+    upload_id = client.post("/api/uploads", json={'filename': 'a.docx', 'size': len(data)}).json()['upload_id']
+    assert client.put(f"/api/uploads/{upload_id}", params={'offset': 0}, content=data).status_code == 200
+
+    # Both requests get past the completeness check before either moves the file
+    both_checked = threading.Barrier(2)
+    webapp.app.state.upload_store.get(upload_id).missing = lambda: (both_checked.wait(5), [])[1]
+    with ThreadPoolExecutor(2) as pool:
+        responses = list(pool.map(
+            lambda _: client.post(f"/api/uploads/{upload_id}/finalize", json={}), range(2)))
+    assert sorted(r.status_code for r in responses) == [200, 404]
+    finalized = next(r.json() for r in responses if r.status_code == 200)
+    assert Path(finalized['path']).read_bytes() == data
+
+    assert client.post(f"/api/uploads/{upload_id}/finalize", json={}).status_code == 404
+
+
+def test_upload_store_lock_does_not_stall_other_requests(client):
+    """Upload requests waiting on the upload store (e.g. a finalize moving a file) run off the event loop"""
+    import threading
+
+    upload_id = client.post("/api/uploads", json={'filename': 'a.docx', 'size': 10}).json()['upload_id']
+    lock = webapp.app.state.upload_store._lock
+    requests = [
+        threading.Thread(target=client.post, args=("/api/uploads",), kwargs={'json': {'filename': 'b.docx', 'size': 10}}),
+        threading.Thread(target=client.get, args=(f"/api/uploads/{upload_id}",)),
+        threading.Thread(target=client.delete, args=(f"/api/uploads/{upload_id}",)),
+    ]
+    answered = threading.Event()
+    modes = threading.Thread(target=lambda: answered.set() if client.get("/api/modes").status_code == 200 else None)
+    with lock:
+        for request in requests:
+            request.start()
+        time.sleep(0.2)
+        modes.start()
+        # Released either way, so a blocked event loop fails the test instead of hanging it
+        assert answered.wait(0.5)
+    for request in requests + [modes]:
+        request.join()
+
+
+def test_resumable_upload_is_validated(client):
+    assert client.post("/api/uploads", json={'filename': 'notes.txt', 'size': 10}).status_code == 400
+    too_large = client.post("/api/uploads", json={'filename': 'a.docx', 'size': webapp.MAX_UPLOAD_FILE_BYTES + 1})
+    assert too_large.status_code == 413
+
+    upload = client.post("/api/uploads", json={'filename': 'a.docx', 'size': 10}).json()
+    url = f"/api/uploads/{upload['upload_id']}"
+    assert client.put(url, params={'offset': 1}, content=b'x' * 9).status_code == 400
+    assert client.put(url, params={'offset': 0}, content=b'x' * 5).status_code == 400
+    assert client.delete(url).status_code == 200
+    assert client.put(url, params={'offset': 0}, content=b'x' * 10).status_code == 404
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
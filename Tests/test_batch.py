@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the GIACONVERT process-pool batch engine and the CLI --jobs option.
+"""
+
+import shutil
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from click.testing import CliRunner
+
+import giaconvert_complete
+from giaconvert_batch import BatchConverter, convert_document_task
+
+TEST_DOCUMENTS = Path(__file__).parent / "test_documents"
+
+
+def sleep_and_echo(value, delay):
+    """Picklable task used to check ordering and timeouts"""
+    time.sleep(delay)
+    return {'success': True, 'value': value}
+
+
+def fail(value):
+    """Picklable task that always raises"""
+    raise ValueError(f"bad document {value}")
+
+
+def test_results_are_reported_in_input_order():
+    """Later tasks finishing first must not reorder the results"""
+    tasks = [(i, delay) for i, delay in enumerate([0.3, 0.0, 0.1, 0.0])]
+    batch = BatchConverter(sleep_and_echo, jobs=4)
+    results = list(batch.run(tasks))
+    assert [index for index, _, _ in results] == [0, 1, 2, 3]
+    assert [result['value'] for _, _, result in results] == [0, 1, 2, 3]
+
+
+def test_exceptions_become_failed_results():
+    """One failing task does not stop the batch"""
+    batch = BatchConverter(fail, jobs=2)
+    results = [result for _, _, result in batch.run([(1,), (2,)])]
+    assert all(not r['success'] for r in results)
+    assert results[1]['error'] == 'bad document 2'
+
+
+def test_per_file_timeout():
+    """A task over its time budget is reported as a TIMEOUT failure"""
+    batch = BatchConverter(sleep_and_echo, jobs=1, timeout=0.2)
+    results = [result for _, _, result in batch.run([('slow', 2.0), ('fast', 0.0)])]
+    assert results[0]['error_code'] == 'TIMEOUT'
+    assert results[1] == {'success': True, 'value': 'fast'}
+
+
+def test_convert_document_task(tmp_path):
+    """The web worker entry point converts through the universal converter"""
+    output = tmp_path / "sample.html"
+    result = convert_document_task(str(TEST_DOCUMENTS / "sample_document.docx"), str(output), 'basic')
+    assert result['success']
+    assert output.exists()
+
+
+def test_cli_parallel_jobs(tmp_path):
+    """--jobs converts a whole directory on the pool with the same output as a serial run"""
+    serial_dir = tmp_path / "serial"
+    parallel_dir = tmp_path / "parallel"
+    for target in (serial_dir, parallel_dir):
+        target.mkdir()
+        for docx in TEST_DOCUMENTS.glob("*.docx"):
+            shutil.copy(docx, target / docx.name)
+
+    runner = CliRunner()
+    serial = runner.invoke(giaconvert_complete.main, [str(serial_dir)])
+    parallel = runner.invoke(giaconvert_complete.main, [str(parallel_dir), '--jobs', '3'])
+    assert serial.exit_code == 0, serial.output
+    assert parallel.exit_code == 0, parallel.output
+    assert "Parallel workers: 3" in parallel.output
+    assert "Successfully converted: 4" in parallel.output
+
+    for html in serial_dir.glob("*.html"):
+        assert html.read_text(encoding='utf-8') == (parallel_dir / html.name).read_text(encoding='utf-8')
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the benchmark corpus generator and the benchmark CLI.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+
+import pytest
+from click.testing import CliRunner
+from docx import Document
+
+import bench
+from corpus import generate_document
+
+
+def test_generated_document_has_requested_content(tmp_path):
+    path = generate_document(tmp_path / "doc.docx", paragraphs=60, tables=3, images=2, headers_footers='simple')
+    doc = Document(str(path))
+
+    assert len(doc.tables) == 3
+    assert len(doc.inline_shapes) == 2
+    assert len(doc.paragraphs) > 60
+    assert doc.sections[0].header.paragraphs[0].text.startswith('Section 1')
+
+    # Deterministic for the same parameters
+    again = generate_document(tmp_path / "again.docx", paragraphs=60, tables=3, images=2, headers_footers='simple')
+    assert [p.text for p in Document(str(again)).paragraphs] == [p.text for p in doc.paragraphs]
+
+
+def test_run_and_compare(tmp_path):
+    runner = CliRunner()
+    corpus = tmp_path / "corpus"
+    result = runner.invoke(bench.cli, ['generate', str(corpus), '-n', '20', '-i', '1', '--legacy'])
+    assert result.exit_code == 0, result.output
+    assert sorted(p.name for p in corpus.iterdir()) == ['p20_t0_i1_none.doc', 'p20_t0_i1_none.docx']
+
+    baseline = tmp_path / "baseline.json"
+    result = runner.invoke(bench.cli, ['run', str(corpus), '-o', str(baseline), '-r', '1',
+                                       '--converter', 'universal', '--mode', 'enhanced'])
+    assert result.exit_code == 0, result.output
+    report = json.loads(baseline.read_text())
+    cases = {(r['document'], r['engine']) for r in report['results']}
+    assert cases == {('p20_t0_i1_none.doc', 'docx'), ('p20_t0_i1_none.docx', 'docx'),
+                     ('p20_t0_i1_none.docx', 'fast')}
+    assert all(r['success'] and r['output_bytes'] > 0 for r in report['results'])
+
+    result = runner.invoke(bench.cli, ['compare', str(baseline), str(baseline)])
+    assert result.exit_code == 0, result.output
+
+    # A case that got twice as slow is flagged
+    slower = dict(report, results=[dict(r, wall_time=r['wall_time'] * 2 + 1) for r in report['results']])
+    candidate = tmp_path / "candidate.json"
+    candidate.write_text(json.dumps(slower))
+    result = runner.invoke(bench.cli, ['compare', str(baseline), str(candidate)])
+    assert result.exit_code == 1
+    assert result.output.count('REGRESSION (time)') == 3
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
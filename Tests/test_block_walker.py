@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-pass body walker shared by the GIACONVERT converters.
+Includes a scaling benchmark: body conversion time must grow linearly with paragraph count.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from docx import Document
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+from giaconvert_blocks import iter_block_items
+from giaconvert_universal import UniversalDocumentConverter
+
+
+def build_document(paragraph_count, table_every=50):
+    """Build an in-memory document with interleaved paragraphs and small tables"""
+    doc = Document()
+    for i in range(paragraph_count):
+        doc.add_paragraph(f'Paragraph {i} with some body text.')
+        if table_every and i % table_every == 0:
+            table = doc.add_table(rows=2, cols=2)
+            table.cell(0, 0).text = f'Table {i}'
+    return doc
+
+
+def test_iter_block_items_preserves_document_order():
+    """Walker yields the same elements as doc.paragraphs/doc.tables, in body order"""
+    doc = build_document(20, table_every=5)
+    blocks = list(iter_block_items(doc))
+
+    body_elements = [el for el in doc.element.body if el.tag.endswith(('}p', '}tbl'))]
+    assert [b._element for b in blocks] == body_elements
+
+    paragraphs = [b for b in blocks if isinstance(b, Paragraph)]
+    tables = [b for b in blocks if isinstance(b, Table)]
+    assert [p.text for p in paragraphs] == [p.text for p in doc.paragraphs]
+    assert [t._element for t in tables] == [t._element for t in doc.tables]
+
+
+def test_iter_block_items_walks_table_cells():
+    """Walker also accepts block containers such as table cells"""
+    doc = build_document(1, table_every=1)
+    cell = doc.tables[0].cell(0, 0)
+    blocks = list(iter_block_items(cell))
+    assert len(blocks) == 1
+    assert blocks[0].text == 'Table 0'
+
+
+def time_body_conversion(paragraph_count, repeats=3):
+    """Best-of-N wall time for converting the body of an N-paragraph document"""
+    doc = build_document(paragraph_count)
+    converter = UniversalDocumentConverter()
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        converter._convert_docx_content_to_html(doc, 'benchmark', None, False)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def test_body_conversion_scales_linearly():
+    """Quadrupling the paragraph count must not take ~16x longer (quadratic lookup)"""
+    small = time_body_conversion(500)
+    large = time_body_conversion(2000)
+    ratio = large / small
+    print(f"500 paragraphs: {small:.3f}s, 2000 paragraphs: {large:.3f}s, ratio {ratio:.1f}x")
+    # Linear scaling gives ~4x; allow generous headroom for noisy machines
+    assert ratio < 8, f"Body conversion scaled {ratio:.1f}x for 4x more paragraphs"
+
+
+if __name__ == "__main__":
+    test_iter_block_items_preserves_document_order()
+    test_iter_block_items_walks_table_cells()
+    test_body_conversion_scales_linearly()
+    print("✅ Block walker tests passed")
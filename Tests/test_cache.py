@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Tests for the GIACONVERT content-addressed conversion cache and image cache.
+"""
+
+import os
+import pickle
+import shutil
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from click.testing import CliRunner
+from docx import Document
+
+import giaconvert_complete
+from giaconvert_cache import ConversionCache, ImageCache
+from giaconvert_universal import UniversalDocumentConverter
+from helpers import png_bytes
+
+TEST_DOCUMENTS = Path(__file__).parent / "test_documents"
+IMAGES_DOC = TEST_DOCUMENTS / "sample_document_with_images.docx"
+
+
+def convert(source, output, cache=None, mode='enhanced'):
+    return UniversalDocumentConverter(cache=cache).convert_document(str(source), str(output), mode)
+
+
+def test_second_conversion_is_a_hit(tmp_path):
+    cache = ConversionCache(tmp_path / "cache")
+    first = convert(IMAGES_DOC, tmp_path / "a" / "doc.html", cache)
+    second = convert(IMAGES_DOC, tmp_path / "b" / "doc.html", cache)
+
+    assert first['cache'] == 'miss' and second['cache'] == 'hit'
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert second['images_extracted'] == first['images_extracted'] > 0
+    # Images are hard-linked out of the cache rather than copied
+    restored = sorted((tmp_path / "b" / "doc_images").iterdir())
+    assert len(restored) == first['images_extracted']
+    assert all(image.stat().st_nlink > 1 for image in restored)
+    assert (tmp_path / "a" / "doc.html").read_bytes() == (tmp_path / "b" / "doc.html").read_bytes()
+
+
+def test_hit_under_new_names_matches_fresh_conversion(tmp_path):
+    """A renamed copy of a cached document gets its own title and image folder"""
+    cache = ConversionCache(tmp_path / "cache")
+    renamed = tmp_path / "renamed copy.docx"
+    shutil.copy(IMAGES_DOC, renamed)
+
+    convert(IMAGES_DOC, tmp_path / "cached" / "original.html", cache)
+    hit = convert(renamed, tmp_path / "cached" / "other.html", cache)
+    convert(renamed, tmp_path / "fresh" / "other.html")
+
+    assert hit['cache'] == 'hit'
+    cached_html = (tmp_path / "cached" / "other.html").read_text(encoding='utf-8')
+    fresh_html = (tmp_path / "fresh" / "other.html").read_text(encoding='utf-8')
+    assert cached_html == fresh_html
+    assert sorted(p.name for p in (tmp_path / "cached" / "other_images").iterdir()) == \
+        sorted(p.name for p in (tmp_path / "fresh" / "other_images").iterdir())
+
+
+def test_hit_under_new_names_keeps_the_text(pictures_docx, tmp_path):
+    """Only image links follow the new folder name, not text that happens to mention the old one"""
+    source = pictures_docx("report.docx", png_bytes('red'))
+    doc = Document(str(source))
+    doc.add_paragraph('The figures are in report_images/ next to this page.')
+    doc.save(str(source))
+    cache = ConversionCache(tmp_path / "cache")
+
+    convert(source, tmp_path / "report.html", cache, mode='complete')
+    hit = convert(source, tmp_path / "summary.html", cache, mode='complete')
+
+    assert hit['cache'] == 'hit'
+    html = (tmp_path / "summary.html").read_text(encoding='utf-8')
+    assert 'src="summary_images/' in html and 'src="report_images/' not in html
+    assert 'The figures are in report_images/ next to this page.' in html
+
+    page = '<img src="a_images/x.png" srcset="a_images/x-480w.png 480w, a_images/x.png 800w"/><p>a_images/</p>'
+    retargeted = ConversionCache._retarget(page, {'title': 't', 'images_name': 'a_images'}, 't', 'b_images')
+    assert retargeted == ('<img src="b_images/x.png" srcset="b_images/x-480w.png 480w, b_images/x.png 800w"/>'
+                          '<p>a_images/</p>')
+
+
+def test_hit_replaces_the_images_folder(tmp_path):
+    """Files left by an earlier conversion do not survive a restore"""
+    cache = ConversionCache(tmp_path / "cache")
+    fresh = convert(IMAGES_DOC, tmp_path / "fresh" / "doc.html", cache)
+    stale = tmp_path / "out" / "doc_images" / "image_099.png"
+    stale.parent.mkdir(parents=True)
+    stale.write_bytes(png_bytes('blue'))
+
+    assert convert(IMAGES_DOC, tmp_path / "out" / "doc.html", cache)['cache'] == 'hit'
+    assert sorted(p.name for p in stale.parent.iterdir()) == \
+        sorted(p.name for p in (tmp_path / "fresh" / "doc_images").iterdir())
+    assert len(list(stale.parent.iterdir())) == fresh['images_extracted']
+
+
+def test_mode_is_part_of_the_key(tmp_path):
+    cache = ConversionCache(tmp_path / "cache")
+    convert(IMAGES_DOC, tmp_path / "basic.html", cache, mode='basic')
+    assert convert(IMAGES_DOC, tmp_path / "complete.html", cache, mode='complete')['cache'] == 'miss'
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    docs = sorted(TEST_DOCUMENTS.glob("sample_document*.docx"))
+    cache = ConversionCache(tmp_path / "cache", max_bytes=10 ** 9)
+    for i, doc in enumerate(docs):
+        convert(doc, tmp_path / f"{i}.html", cache, mode='basic')
+        # Space out access times so LRU order is unambiguous
+        for entry in (tmp_path / "cache").glob("*/*/entry.json"):
+            os.utime(entry, (entry.stat().st_atime, entry.stat().st_mtime - 10))
+
+    sizes = cache.stats()['size_bytes']
+    cache.max_bytes = sizes - 1
+    cache.evict()
+
+    assert cache.stats()['entries'] == len(docs) - 1
+    assert convert(docs[0], tmp_path / "again.html", cache, mode='basic')['cache'] == 'miss'
+    assert convert(docs[-1], tmp_path / "again.html", cache, mode='basic')['cache'] == 'hit'
+
+
+def test_cli_reports_cache_counters(tmp_path):
+    source = tmp_path / "docs"
+    source.mkdir()
+    for docx in TEST_DOCUMENTS.glob("sample_document*.docx"):
+        shutil.copy(docx, source / docx.name)
+    cache_dir = tmp_path / "cache"
+
+    runner = CliRunner()
+    first = runner.invoke(giaconvert_complete.main, [str(source), '--cache-dir', str(cache_dir)])
+    second = runner.invoke(giaconvert_complete.main, [str(source), '--cache-dir', str(cache_dir), '--jobs', '2'])
+
+    assert "Cache hits: 0, misses: 3" in first.output
+    assert "Cache hits: 3, misses: 0" in second.output
+
+
+
+def test_converter_upgrade_invalidates_entries(tmp_path, monkeypatch):
+    """Pages cached by an older converter version are converted again"""
+    source = tmp_path / "docs"
+    source.mkdir()
+    shutil.copy(IMAGES_DOC, source / IMAGES_DOC.name)
+    args = [str(source), '--cache-dir', str(tmp_path / "cache")]
+
+    runner = CliRunner()
+    assert "misses: 1" in runner.invoke(giaconvert_complete.main, args).output
+    assert "hits: 1" in runner.invoke(giaconvert_complete.main, args).output
+    monkeypatch.setattr(giaconvert_complete, '__version__', giaconvert_complete.__version__ + '.1')
+    assert "Cache hits: 0, misses: 1" in runner.invoke(giaconvert_complete.main, args).output
+
+
+def test_image_cache_is_keyed_by_settings_and_evicts_lru(tmp_path):
+    cache = ImageCache(tmp_path / "images", max_bytes=250)
+    key = cache.key('abc', 1200, 800, 85, 'JPEG')
+    assert key != cache.key('abc', 1200, 800, 70, 'JPEG')
+    assert key != cache.key('abc', 1200, 800, 85, 'WEBP')
+
+    assert cache.get(key) is None
+    cache.put(key, b'a' * 100)
+    assert cache.get(key, source_size=1000) == b'a' * 100
+    assert (cache.hits, cache.misses, cache.bytes_saved) == (1, 1, 1000)
+
+    # Workers receive a copy of the cache
+    assert pickle.loads(pickle.dumps(cache)).get(key) == b'a' * 100
+
+    older, newer = cache.key('old', 1, 1, 1, 'JPEG'), cache.key('new', 1, 1, 1, 'JPEG')
+    cache.put(older, b'o' * 100)
+    past = os.stat(cache._entry_path(key)).st_mtime - 60
+    os.utime(cache._entry_path(older), (past, past))
+    cache.put(newer, b'n' * 100)
+    assert cache.get(older) is None
+    assert cache.get(key) is not None and cache.get(newer) is not None
+    assert cache.stats()['size_bytes'] == 200
+
+
+def test_cli_reports_image_cache_counters(tmp_path):
+    source = tmp_path / "docs"
+    source.mkdir()
+    shutil.copy(IMAGES_DOC, source / "a.docx")
+    shutil.copy(IMAGES_DOC, source / "b.docx")
+    image_cache = tmp_path / "image-cache"
+    runner = CliRunner()
+    args = [str(source), '--optimize-images', '--image-cache-dir', str(image_cache)]
+    first = runner.invoke(giaconvert_complete.main, args)
+    second = runner.invoke(giaconvert_complete.main, args + ['--jobs', '2'])
+
+    assert "Image cache hits: 2, misses: 2 (50% hit rate" in first.output
+    assert "Image cache hits: 4, misses: 0 (100% hit rate" in second.output
+    # Cached images are the ones a fresh optimization writes
+    for image in (source / "a_images").iterdir():
+        assert image.read_bytes() == (source / "b_images" / image.name).read_bytes()
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
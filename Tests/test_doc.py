@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Tests for the Word 97-2003 .doc reader: parity with the .docx conversion of
+the same content, pictures, headers and footers, files saved by Word itself
+and unreadable files; and for the docx2txt fallback's private image
+directories.
+"""
+
+import io
+import re
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+from docx import Document
+from docx.enum.section import WD_SECTION
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_UNDERLINE
+from docx.shared import Pt, RGBColor
+
+from giaconvert_doc import DocFormatError, DocTable, Word97Reader, is_word97_document
+from giaconvert_universal import UniversalDocumentConverter
+from helpers import png_bytes
+from word97 import write_word97
+
+TEST_DOCUMENTS_DIR = Path(__file__).parent / "test_documents"
+TEST_DOCUMENTS = sorted(TEST_DOCUMENTS_DIR.glob("*.docx"))
+# Saved by Microsoft Word rather than by benchmarks/word97.py (see word97/SOURCES.md)
+WORD_SAVED = TEST_DOCUMENTS_DIR / "word97"
+
+_SAME_STYLE_SPANS = re.compile(r'(<span (?:style|class)="[^"]*">)([^<]*)</span>\1')
+
+
+def merge_runs(html):
+    """Join adjacent spans with the same style: .doc files keep one run per change of format"""
+    while True:
+        merged = _SAME_STYLE_SPANS.sub(r'\1\2', html)
+        if merged == html:
+            return html
+        html = merged
+
+
+def convert(source, tmp_path, mode, **options):
+    html_path = tmp_path / source.suffix.lstrip('.') / f"{source.stem}.html"
+    result = UniversalDocumentConverter(**options).convert_document(str(source), str(html_path), mode)
+    assert result['success'], result
+    images_dir = html_path.parent / f"{source.stem}_images"
+    images = {p.name: p.read_bytes() for p in images_dir.iterdir()} if images_dir.exists() else {}
+    return html_path.read_text(encoding='utf-8'), images, result
+
+
+def convert_both(docx_path, tmp_path, mode, **options):
+    doc_path = write_word97(Document(str(docx_path)), tmp_path / 'word97' / f"{docx_path.stem}.doc")
+    assert is_word97_document(doc_path)
+    return convert(docx_path, tmp_path, mode, **options), convert(doc_path, tmp_path, mode, **options)
+
+
+@pytest.fixture
+def layout_docx(tmp_path):
+    """Headings, aligned paragraphs, mixed run formats, a table with a picture, sections with headers"""
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = 'First header'
+    doc.sections[0].footer.paragraphs[0].text = 'First footer'
+    doc.add_heading('Title', 0)
+    doc.add_heading('Chapter <1>', 1)
+    doc.add_heading('Deep heading', 9)
+
+    p = doc.add_paragraph()
+    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    p.add_run('bold ').bold = True
+    p.add_run('italic ').italic = True
+    p.add_run('double').font.underline = WD_UNDERLINE.DOUBLE
+    run = p.add_run('tab\there')
+    run.add_break()
+    run.add_text('after')
+    run = p.add_run(' black')
+    run.font.color.rgb = RGBColor(0, 0, 0)
+    run.font.size = Pt(7.5)
+    run.font.name = 'Courier New'
+    doc.add_paragraph('')
+    doc.add_paragraph('Ünïcödé — “quotes” & <tags>').alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+
+    table = doc.add_table(rows=3, cols=3)
+    for i, row in enumerate(table.rows):
+        for j, cell in enumerate(row.cells):
+            cell.text = f'{i}{j}'
+    table.cell(1, 1).add_paragraph('second line')
+    table.cell(2, 0).paragraphs[0].add_run().add_picture(io.BytesIO(png_bytes('red')))
+
+    section = doc.add_section(WD_SECTION.NEW_PAGE)
+    section.header.is_linked_to_previous = False
+    section.header.paragraphs[0].text = 'Second header'
+    doc.add_paragraph('again').add_run().add_picture(io.BytesIO(png_bytes('red')))
+    doc.add_paragraph().add_run().add_picture(io.BytesIO(png_bytes('blue')))
+    doc.add_section()
+    doc.add_paragraph('inherits the second header')
+
+    path = tmp_path / 'layout.docx'
+    doc.save(str(path))
+    return path
+
+
+@pytest.mark.parametrize("source", TEST_DOCUMENTS, ids=lambda p: p.stem)
+@pytest.mark.parametrize("mode", ['basic', 'enhanced', 'complete'])
+def test_same_output_as_docx(source, mode, tmp_path):
+    (docx_html, docx_images, docx_result), (doc_html, doc_images, doc_result) = convert_both(source, tmp_path, mode)
+    assert doc_html == merge_runs(docx_html)
+    assert doc_images == docx_images
+    assert doc_result['images_extracted'] == docx_result['images_extracted']
+
+
+@pytest.mark.parametrize("options", [{}, {'css_classes': True}], ids=['inline', 'css_classes'])
+def test_same_output_for_complex_layout(layout_docx, tmp_path, options):
+    (docx_html, docx_images, _), (doc_html, doc_images, result) = convert_both(layout_docx, tmp_path, 'complete',
+                                                                             **options)
+    assert doc_html == merge_runs(docx_html)
+    assert doc_images == docx_images
+    assert '<h1>Chapter &lt;1&gt;</h1>' in doc_html
+    assert '<h6>Deep heading</h6>' in doc_html
+    assert '<p style="text-align:center">' in doc_html
+    assert doc_html.count('Second header') == 2
+    assert 'First footer' in doc_html
+    assert '<th><p>00</p></th>' in doc_html
+    # Two distinct pictures, one of them used twice
+    assert result['images_extracted'] == 2
+
+
+def test_reader_walks_paragraphs_and_tables(layout_docx, tmp_path):
+    doc_path = write_word97(Document(str(layout_docx)), tmp_path / 'layout.doc')
+    with Word97Reader(doc_path) as reader:
+        blocks = list(reader.iter_blocks())
+        tables = [block for block in blocks if isinstance(block, DocTable)]
+        assert len(tables) == 1
+        assert [[[p.text for p in cell] for cell in row] for row in tables[0].rows][1] == [
+            ['10'], ['11', 'second line'], ['12']]
+        assert blocks[1].style_name == 'Heading 1'
+        bold, italic = blocks[3].runs[:2]
+        assert (bold[0], bold[1].bold, italic[0], italic[1].italic) == ('bold ', True, 'italic ', True)
+        footers = [[p.text for p in paragraphs] for paragraphs in reader.header_footer_paragraphs('footer')]
+        assert footers == [['First footer']] * 3
+
+
+def test_embedded_images_stay_embedded(layout_docx, tmp_path):
+    doc_path = write_word97(Document(str(layout_docx)), tmp_path / 'layout.doc')
+    html, images, result = convert(doc_path, tmp_path, 'basic')
+    assert images == {}
+    assert html.count('data:image/png;base64,') == 3
+
+
+def test_renamed_docx_falls_back_to_text(tmp_path):
+    source = tmp_path / 'renamed.doc'
+    shutil.copyfile(TEST_DOCUMENTS[0], source)
+    assert not is_word97_document(source)
+    html, _, _ = convert(source, tmp_path, 'basic')
+    assert 'Converted from .doc format' in html
+
+
+def test_unreadable_documents_are_reported(layout_docx, tmp_path):
+    doc_path = write_word97(Document(str(layout_docx)), tmp_path / 'layout.doc')
+    data = bytearray(doc_path.read_bytes())
+    # WordDocument is the first stream, right after the 512-byte compound file header: set fEncrypted
+    data[512 + 0x0B] |= 0x01
+    encrypted = tmp_path / 'encrypted.doc'
+    encrypted.write_bytes(bytes(data))
+
+    with pytest.raises(DocFormatError, match='Encrypted'):
+        Word97Reader(encrypted)
+    result = UniversalDocumentConverter().convert_document(str(encrypted), str(tmp_path / 'out.html'), 'basic')
+    assert not result['success']
+    assert 'Encrypted' in result['error']
+
+
+def test_documents_saved_by_word(tmp_path):
+    with Word97Reader(WORD_SAVED / 'test-ole-file.doc') as reader:
+        assert [block.text for block in reader.iter_blocks()] == ['Test OLE file, saved as Word 97-2003 Document.']
+
+    with Word97Reader(WORD_SAVED / 'harmless-clean.doc') as reader:
+        blocks = list(reader.iter_blocks())
+    assert [(block.style_name, block.text) for block in blocks[:3]] == [
+        ('Heading 1', 'Test'), ('Standard', ''), ('Standard', 'This is a harmless test document.')]
+    assert blocks[-1].text == ('Just to make things slightly interesting, however, we add some '
+                               'ünicöde-ßtringß and different text sizes, colors and fonts')
+    formats = dict(blocks[-1].runs)
+    assert (formats['sizes'].size, formats['colors '].color, formats['fonts'].font) == (16.0, (192, 0, 0), 'Algerian')
+    assert not any(fmt.bold or fmt.italic or fmt.underline or fmt.size for text, fmt in blocks[-1].runs
+                   if text != 'sizes')
+
+    html, images, _ = convert(WORD_SAVED / 'harmless-clean.doc', tmp_path, 'complete')
+    assert '<h1>Test</h1>' in html
+    assert ('different text <span style="font-size:21px">sizes</span>, '
+            '<span style="color:rgb(192,0,0)">colors </span>and '
+            '<span style="font-family:\'Algerian\',sans-serif">fonts</span></p>') in html
+    assert images == {}
+
+
+def test_encrypted_document_saved_by_word(tmp_path):
+    with pytest.raises(DocFormatError, match='Encrypted'):
+        Word97Reader(WORD_SAVED / 'encrypted.doc')
+    result = UniversalDocumentConverter().convert_document(
+        str(WORD_SAVED / 'encrypted.doc'), str(tmp_path / 'out.html'), 'basic')
+    assert not result['success']
+    assert 'Encrypted' in result['error']
+
+
+def test_parallel_fallback_conversions_keep_their_images_apart(tmp_path):
+    """.doc files converted by docx2txt at once into one folder, reusing each converter"""
+    out = tmp_path / 'out'
+    (out / 'temp_images').mkdir(parents=True)
+    (out / 'temp_images' / 'keep.txt').write_text('not a conversion\'s file')
+    sources = []
+    for i in range(4):
+        sources.append(tmp_path / f'doc{i}.doc')
+        shutil.copyfile(TEST_DOCUMENTS_DIR / 'sample_document_with_images.docx', sources[-1])
+
+    def run(source):
+        converter = UniversalDocumentConverter()
+        return [converter.convert_document(str(source), str(out / f'{source.stem}.html'), 'enhanced')
+                for _ in range(2)]
+
+    with ThreadPoolExecutor(len(sources)) as pool:
+        results = list(pool.map(run, sources))
+
+    for source, (first, second) in zip(sources, results):
+        assert first['success'] and second['success']
+        assert first['images_extracted'] == second['images_extracted'] > 0
+        images_dir = out / f'{source.stem}_images'
+        assert len(list(images_dir.iterdir())) == first['images_extracted']
+        assert f'{images_dir.name}/image_1' in (out / f'{source.stem}.html').read_text(encoding='utf-8')
+    # No temporary directories are left, and a folder that merely has the old shared name is untouched
+    assert [p.name for p in out.iterdir() if p.name.startswith('.')] == []
+    assert (out / 'temp_images' / 'keep.txt').exists()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Parity tests for the universal converter's lxml fast engine.
+"""
+
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+from docx import Document
+from docx.enum.section import WD_SECTION
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_BREAK, WD_UNDERLINE
+from docx.shared import Pt, RGBColor
+
+from giaconvert_universal import UniversalDocumentConverter
+from helpers import png_bytes
+
+TEST_DOCUMENTS = sorted((Path(__file__).parent / "test_documents").glob("*.docx"))
+
+
+def convert_with_both_engines(source, tmp_path, mode, **options):
+    pages = {}
+    for engine in ('docx', 'fast'):
+        html_path = tmp_path / engine / f"{source.stem}.html"
+        result = UniversalDocumentConverter(**options).convert_document(str(source), str(html_path), mode, engine=engine)
+        assert result['success'], result
+        images_dir = html_path.parent / f"{source.stem}_images"
+        images = {p.name: p.read_bytes() for p in images_dir.iterdir()} if images_dir.exists() else {}
+        pages[engine] = (html_path.read_text(encoding='utf-8'), images, result)
+    return pages
+
+
+@pytest.fixture
+def layout_docx(tmp_path):
+    """Merged cells, sections with their own headers, breaks, hyperlinks and mixed run formats"""
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = 'First header'
+    doc.add_heading('Title', 0)
+    doc.add_heading('Deep heading', 9)
+
+    p = doc.add_paragraph(style='List Bullet')
+    p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+    p.add_run('double').font.underline = WD_UNDERLINE.DOUBLE
+    run = p.add_run('tab\there')
+    run.add_break()
+    run.add_text('after')
+    run.add_break(WD_BREAK.PAGE)
+    run = p.add_run('black')
+    run.font.color.rgb = RGBColor(0, 0, 0)
+    run.font.size = Pt(7.5)
+    run.font.name = 'Courier New'
+    doc.add_paragraph('')
+
+    table = doc.add_table(rows=4, cols=4)
+    for i, row in enumerate(table.rows):
+        for j, cell in enumerate(row.cells):
+            cell.text = f'{i}{j} <&>'
+    table.cell(0, 0).merge(table.cell(0, 1))
+    table.cell(1, 1).merge(table.cell(3, 1))
+    table.cell(1, 2).merge(table.cell(2, 3))
+    table.cell(2, 0).paragraphs[0].add_run().add_picture(io.BytesIO(png_bytes('red')))
+
+    section = doc.add_section(WD_SECTION.NEW_PAGE)
+    section.header.is_linked_to_previous = False
+    section.header.paragraphs[0].text = 'Second header'
+    doc.add_paragraph('again').add_run().add_picture(io.BytesIO(png_bytes('red')))
+    doc.add_section()
+    doc.add_paragraph('inherits the second header')
+
+    path = tmp_path / 'layout.docx'
+    doc.save(str(path))
+    return path
+
+
+@pytest.mark.parametrize("source", TEST_DOCUMENTS, ids=lambda p: p.stem)
+@pytest.mark.parametrize("mode", ['basic', 'enhanced', 'complete'])
+def test_same_output_as_python_docx(source, mode, tmp_path):
+    pages = convert_with_both_engines(source, tmp_path, mode)
+    assert pages['fast'][0] == pages['docx'][0]
+    assert pages['fast'][1] == pages['docx'][1]
+    assert pages['fast'][2]['images_extracted'] == pages['docx'][2]['images_extracted']
+
+
+@pytest.mark.parametrize("options", [{}, {'css_classes': True}], ids=['inline', 'css_classes'])
+def test_same_output_for_complex_layout(layout_docx, tmp_path, options):
+    pages = convert_with_both_engines(layout_docx, tmp_path, 'complete', **options)
+    html = pages['fast'][0]
+    assert html == pages['docx'][0]
+    assert pages['fast'][1] == pages['docx'][1]
+    assert html.count('Second header') == 2
+    assert '<h6>Deep heading</h6>' in html
+
+
+def test_unknown_engine_is_reported(tmp_path):
+    result = UniversalDocumentConverter().convert_document(
+        str(TEST_DOCUMENTS[0]), str(tmp_path / 'out.html'), 'basic', engine='sax')
+    assert not result['success']
+    assert 'Unknown engine' in result['error']
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Tests for image extraction, deduplication and threaded optimization.
+"""
+
+import io
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+from docx import Document
+from PIL import Image, ImageDraw
+
+import giaconvert_complete
+from giaconvert_fastdocx import FastDocxReader
+from giaconvert_images import (
+    IMAGE_FORMATS, IMAGE_PREFETCH_PER_THREAD, ImageOptimizer, ImageRegistry, iter_body_image_parts, optimize_image
+)
+from giaconvert_universal import UniversalDocumentConverter
+from helpers import jpeg_bytes, png_bytes
+
+
+@pytest.fixture
+def repeated_images_docx(tmp_path):
+    """A logo in the header and three times in the body, plus one other picture"""
+    logo = png_bytes('red')
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].add_run('Company').add_picture(io.BytesIO(logo))
+    for i in range(3):
+        doc.add_paragraph(f'Section {i}')
+        doc.add_paragraph().add_run().add_picture(io.BytesIO(logo))
+    doc.add_paragraph().add_run().add_picture(io.BytesIO(png_bytes('blue')))
+    path = tmp_path / 'report.docx'
+    doc.save(str(path))
+    return path
+
+
+def test_repeated_images_are_written_once(repeated_images_docx, tmp_path):
+    html_path = tmp_path / 'out' / 'report.html'
+    result = UniversalDocumentConverter().convert_document(str(repeated_images_docx), str(html_path), 'complete')
+
+    assert result['success']
+    images = sorted(p.name for p in (tmp_path / 'out' / 'report_images').iterdir())
+    assert images == ['image_001.png', 'image_002.png']
+    assert result['images_extracted'] == 2
+    assert result['images_unique'] == 2
+    assert result['images_deduplicated'] == 3
+    logo_size = (tmp_path / 'out' / 'report_images' / 'image_001.png').stat().st_size
+    assert result['image_bytes_saved'] == 3 * logo_size
+
+    html = html_path.read_text(encoding='utf-8')
+    assert html.count('src="report_images/image_001.png"') == 4
+    assert html.count('src="report_images/image_002.png"') == 1
+
+
+def test_inline_images_are_encoded_once(repeated_images_docx, tmp_path):
+    converter = giaconvert_complete.WordToHTMLConverter(image_mode='inline')
+    html_path = tmp_path / 'report.html'
+    assert converter.convert_docx_to_html(repeated_images_docx, html_path)
+
+    html = html_path.read_text(encoding='utf-8')
+    assert html.count('data:image/png;base64,') == 4
+    assert converter.image_counter == 2
+    assert converter.image_registry.duplicate_images == 2
+
+
+def test_large_inline_images_fall_back_to_files(pictures_docx, tmp_path):
+    docx_path = pictures_docx('figures.docx', photo_bytes((800, 500)), png_bytes('red'))
+    limit = len(png_bytes('red')) + 1
+
+    converter = giaconvert_complete.WordToHTMLConverter(image_mode='inline', inline_max_size=limit)
+    assert converter.convert_docx_to_html(docx_path, tmp_path / 'figures.html')
+    html = (tmp_path / 'figures.html').read_text(encoding='utf-8')
+    assert '<img src="figures_images/image_001.png"' in html
+    assert html.count('data:image/png;base64,') == 1
+    assert [p.name for p in (tmp_path / 'figures_images').iterdir()] == ['image_001.png']
+
+    html_path = tmp_path / 'basic' / 'figures.html'
+    result = UniversalDocumentConverter(inline_max_size=limit).convert_document(
+        str(docx_path), str(html_path), 'basic')
+    assert result['images_dir'] == str(tmp_path / 'basic' / 'figures_images')
+    html = html_path.read_text(encoding='utf-8')
+    assert '<img src="figures_images/image_001.png"' in html
+    assert html.count('data:image/png;base64,') == 1
+
+
+def test_identical_parts_are_matched_by_content():
+    registry = ImageRegistry()
+    first = SimpleNamespace(partname='/word/media/image1.png', blob=b'same bytes')
+    copy = SimpleNamespace(partname='/word/media/image7.png', blob=b'same bytes')
+
+    html, digest = registry.lookup(first)
+    assert html is None
+    registry.add(digest, '<img src="a"/>')
+    assert registry.lookup(copy) == ('<img src="a"/>', None)
+
+    registry.start_document()
+    assert registry.lookup(copy)[0] is None
+
+
+def test_batch_scope_links_files_between_documents(repeated_images_docx, tmp_path):
+    converter = UniversalDocumentConverter(dedupe_images='batch')
+    first = converter.convert_document(str(repeated_images_docx), str(tmp_path / 'a' / 'report.html'), 'enhanced')
+    second = converter.convert_document(str(repeated_images_docx), str(tmp_path / 'b' / 'report.html'), 'enhanced')
+
+    assert first['image_bytes_saved'] < second['image_bytes_saved']
+    for name in ('image_001.png', 'image_002.png'):
+        a = tmp_path / 'a' / 'report_images' / name
+        b = tmp_path / 'b' / 'report_images' / name
+        assert a.read_bytes() == b.read_bytes()
+        assert a.stat().st_ino == b.stat().st_ino
+
+    # Rewriting the first document's image must not leak into the second one
+    third = UniversalDocumentConverter().convert_document(
+        str(repeated_images_docx), str(tmp_path / 'a' / 'report.html'), 'enhanced')
+    assert third['success']
+    assert (tmp_path / 'a' / 'report_images' / 'image_001.png').stat().st_ino != \
+        (tmp_path / 'b' / 'report_images' / 'image_001.png').stat().st_ino
+
+
+def test_assets_are_shared_across_documents_and_runs(repeated_images_docx, tmp_path):
+    """Every image folder links to one file per distinct image, whichever worker wrote it"""
+    docs = tmp_path / 'docs'
+    (docs / 'sub').mkdir(parents=True)
+    for name in ('a.docx', 'b.docx', 'sub/c.docx'):
+        (docs / name).write_bytes(repeated_images_docx.read_bytes())
+    assets = tmp_path / 'assets'
+
+    converter = giaconvert_complete.WordToHTMLConverter(jobs=2, assets_dir=str(assets))
+    assert converter.convert_directory(docs)
+    assert converter.converted_count == 3
+    stored = sorted(assets.iterdir())
+    assert [p.suffix for p in stored] == ['.png', '.png']
+    assert converter.assets_written + converter.assets_reused == 6
+    inodes = {p.stat().st_ino for p in stored}
+    for folder in ('a_images', 'b_images', 'sub/c_images'):
+        images = sorted((docs / folder).iterdir())
+        assert [p.name for p in images] == ['image_001.png', 'image_002.png']
+        assert {p.stat().st_ino for p in images} == inodes
+
+    # A later run, and the universal converter, find the assets already there
+    again = giaconvert_complete.WordToHTMLConverter(assets_dir=str(assets))
+    assert again.convert_directory(docs)
+    assert (again.assets_written, again.assets_reused) == (0, 6)
+    result = UniversalDocumentConverter(assets_dir=str(assets)).convert_document(
+        str(repeated_images_docx), str(tmp_path / 'web' / 'report.html'), 'complete', engine='fast')
+    assert (result['assets_written'], result['assets_reused']) == (0, 2)
+    assert {p.stat().st_ino for p in (tmp_path / 'web' / 'report_images').iterdir()} == inodes
+
+
+def test_optimize_image_draft_keeps_the_bounds():
+    optimized = Image.open(io.BytesIO(optimize_image(jpeg_bytes('green', (4000, 1000)))))
+    assert (optimized.format, optimized.size) == ('JPEG', (1200, 300))
+    # Unreadable data is passed through
+    assert optimize_image(b'not an image') == b'not an image'
+
+
+def test_images_are_optimized_on_threads(repeated_images_docx, tmp_path):
+    """Optimizing ahead of the walk gives the same page and files as optimizing in the walk"""
+    optimized = []
+    optimizer = ImageOptimizer(lambda data: optimized.append(data) or optimize_image(data), threads=2)
+    registry = ImageRegistry()
+    doc = Document(str(repeated_images_docx))
+    optimizer.start_document(doc, registry)
+    assert len(optimized) <= 2
+    optimizer.close()
+    assert len(optimized) == 2  # the logo once, the other picture once
+
+    outputs = []
+    for prefetch in (False, True):
+        converter = giaconvert_complete.WordToHTMLConverter(optimize_images=True, image_threads=2)
+        if not prefetch:
+            # Reference: each image is optimized when the walk reaches it
+            converter.image_optimizer.start_document = lambda doc, registry: None
+        out = tmp_path / f'prefetch_{prefetch}'
+        out.mkdir()
+        assert converter.convert_docx_to_html(repeated_images_docx, out / 'report.html')
+        outputs.append(out)
+
+    serial, threaded = outputs
+    assert (threaded / 'report.html').read_text() == (serial / 'report.html').read_text()
+    files = sorted(p.name for p in (threaded / 'report_images').iterdir())
+    assert files == ['image_001.jpg', 'image_002.jpg']
+    for name in files:
+        assert (threaded / 'report_images' / name).read_bytes() == (serial / 'report_images' / name).read_bytes()
+
+
+def test_optimizer_keeps_a_window_of_body_images(pictures_docx):
+    """Only the body's pictures are optimized, in document order and a few ahead of the walk"""
+    colors = ['blue', 'green', 'yellow', 'purple', 'orange', 'black', 'white', 'gray']
+    path = pictures_docx('many.docx', *(png_bytes(color) for color in colors),
+                         header_image=png_bytes('red'))
+
+    doc = Document(str(path))
+    optimized = []
+    optimizer = ImageOptimizer(lambda data: optimized.append(data) or data, threads=1)
+    registry = ImageRegistry()
+    optimizer.start_document(doc, registry)
+    for i, part in enumerate(iter_body_image_parts(doc)):
+        assert len(optimized) <= i + IMAGE_PREFETCH_PER_THREAD
+        assert optimizer.result(registry.digest(part), part.blob) == part.blob
+    optimizer.close()
+    assert optimized == [png_bytes(color) for color in colors]
+
+
+def diagram_bytes(mode='RGB'):
+    """A flat graphic: a few solid shapes, transparent around them in RGBA"""
+    img = Image.new(mode, (600, 400), (255, 255, 255, 0) if mode == 'RGBA' else 'white')
+    draw = ImageDraw.Draw(img)
+    for i, color in enumerate(['red', 'green', 'blue', 'black']):
+        draw.rectangle([40 + i * 120, 50, 130 + i * 120, 350], fill=color)
+    output = io.BytesIO()
+    img.save(output, format='PNG')
+    return output.getvalue()
+
+
+def photo_bytes(size=(1600, 1000)):
+    """Continuous tone, far more colours than a palette holds"""
+    fractal = Image.effect_mandelbrot(size, (-2, -1.2, 1, 1.2), 100)
+    img = Image.merge('RGB', [fractal, fractal.rotate(3), Image.linear_gradient('L').resize(size)])
+    output = io.BytesIO()
+    img.save(output, format='PNG')
+    return output.getvalue()
+
+
+def test_image_formats_keep_transparency():
+    source = diagram_bytes('RGBA')
+    for output_format, expected in [('webp', 'WEBP'), ('png', 'PNG'), ('jpeg', 'JPEG')]:
+        optimized = Image.open(io.BytesIO(optimize_image(source, output_format=output_format)))
+        assert optimized.format == expected
+        # Only JPEG flattens onto white
+        assert optimized.convert('RGBA').getpixel((5, 5))[3] == (255 if expected == 'JPEG' else 0)
+
+    # Flat graphics are stored losslessly: a palette PNG
+    palette = Image.open(io.BytesIO(optimize_image(source, output_format='png')))
+    assert palette.mode == 'P'
+    assert palette.convert('RGBA').getpixel((50, 60)) == (255, 0, 0, 255)
+    with pytest.raises(ValueError):
+        optimize_image(source, output_format='tiff')
+
+
+def test_auto_format_picks_the_smallest_encoding():
+    for source in (diagram_bytes(), photo_bytes()):
+        sizes = {fmt: len(optimize_image(source, output_format=fmt)) for fmt in IMAGE_FORMATS if fmt != 'auto'}
+        auto = optimize_image(source, output_format='auto')
+        assert len(auto) <= min(sizes.values())
+        assert len(auto) < sizes['jpeg']
+
+    # A diagram stays pixel-exact
+    auto = Image.open(io.BytesIO(optimize_image(diagram_bytes(), output_format='auto')))
+    original = Image.open(io.BytesIO(diagram_bytes()))
+    assert auto.convert('RGB').tobytes() == original.convert('RGB').tobytes()
+
+
+def test_image_bytes_are_reported(pictures_docx, tmp_path):
+    docx_path = pictures_docx('figures.docx', diagram_bytes('RGBA'), photo_bytes())
+    source_bytes = len(diagram_bytes('RGBA')) + len(photo_bytes())
+
+    converter = giaconvert_complete.WordToHTMLConverter(optimize_images=True, image_format='auto')
+    assert converter.convert_docx_to_html(docx_path, tmp_path / 'figures.html')
+    images = sorted((tmp_path / 'figures_images').iterdir())
+    assert [p.suffix for p in images] == ['.webp', '.webp']
+    stats = converter.image_registry.stats()
+    assert stats['image_source_bytes'] == source_bytes
+    assert stats['image_output_bytes'] == sum(p.stat().st_size for p in images) < source_bytes
+
+    html_path = tmp_path / 'web' / 'figures.html'
+    result = UniversalDocumentConverter(image_format='webp').convert_document(str(docx_path), str(html_path), 'enhanced')
+    assert result['image_source_bytes'] == source_bytes
+    assert 0 < result['image_output_bytes'] < source_bytes
+    assert sorted(p.suffix for p in (tmp_path / 'web' / 'figures_images').iterdir()) == ['.webp', '.webp']
+
+
+def test_responsive_images(pictures_docx, tmp_path):
+    docx_path = pictures_docx('figures.docx', photo_bytes((1600, 1000)), png_bytes('red'))
+
+    converter = giaconvert_complete.WordToHTMLConverter(responsive_images=True)
+    assert converter.convert_docx_to_html(docx_path, tmp_path / 'figures.html')
+    html = (tmp_path / 'figures.html').read_text(encoding='utf-8')
+    assert ('<img src="figures_images/image_001.png" alt="Image 1" width="1600" height="1000" '
+            'loading="lazy" decoding="async" srcset="figures_images/image_001-480w.png 480w, '
+            'figures_images/image_001-960w.png 960w, figures_images/image_001.png 1600w" '
+            'sizes="(max-width: 1600px) 100vw, 1600px"') in html
+    # Small images need no variants
+    assert 'alt="Image 2" width="64" height="48" loading="lazy" decoding="async" style=' in html
+    variant = Image.open(tmp_path / 'figures_images' / 'image_001-480w.png')
+    assert (variant.format, variant.size) == ('PNG', (480, 300))
+    assert len(list((tmp_path / 'figures_images').iterdir())) == 4
+
+    # Inline images get their dimensions but no variants; both engines agree
+    pages = []
+    for engine in ('docx', 'fast'):
+        html_path = tmp_path / engine / 'figures.html'
+        result = UniversalDocumentConverter(responsive_images=True).convert_document(
+            str(docx_path), str(html_path), 'enhanced', engine=engine)
+        assert result['success']
+        pages.append(html_path.read_text(encoding='utf-8'))
+        assert sorted(p.name for p in (tmp_path / engine / 'figures_images').iterdir()) == [
+            'image_001-480w.png', 'image_001-960w.png', 'image_001.png', 'image_002.png']
+    assert pages[0] == pages[1]
+    assert 'srcset="figures_images/image_001-480w.png 480w' in pages[0]
+
+    converter = giaconvert_complete.WordToHTMLConverter(image_mode='inline', responsive_images=True)
+    assert converter.convert_docx_to_html(docx_path, tmp_path / 'inline.html')
+    html = (tmp_path / 'inline.html').read_text(encoding='utf-8')
+    assert 'width="1600" height="1000" loading="lazy" decoding="async" style=' in html
+    assert 'srcset' not in html
+
+
+def test_fast_engine_streams_images_from_the_zip(repeated_images_docx, tmp_path, monkeypatch):
+    """External images copied unchanged are never read whole; the files match the docx engine's"""
+    read_whole = []
+    original_read = FastDocxReader.read
+    monkeypatch.setattr(FastDocxReader, 'read', lambda self, name: read_whole.append(name) or original_read(self, name))
+
+    outputs = {}
+    for engine in ('docx', 'fast'):
+        html_path = tmp_path / engine / 'report.html'
+        result = UniversalDocumentConverter().convert_document(
+            str(repeated_images_docx), str(html_path), 'complete', engine=engine)
+        assert result['success']
+        assert result['images_deduplicated'] == 3
+        outputs[engine] = {p.name: p.read_bytes() for p in (tmp_path / engine / 'report_images').iterdir()}
+    assert outputs['fast'] == outputs['docx']
+    assert len(outputs['fast']) == 2
+    assert not [name for name in read_whole if '/media/' in name]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
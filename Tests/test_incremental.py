@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental directory conversion (--incremental) and its manifest.
+"""
+
+import os
+import shutil
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from click.testing import CliRunner
+
+import giaconvert_complete
+from giaconvert_manifest import MANIFEST_NAME
+
+TEST_DOCUMENTS = Path(__file__).parent / "test_documents"
+
+
+def make_tree(root):
+    """Copy the sample documents into a small nested directory tree"""
+    (root / "sub").mkdir(parents=True)
+    shutil.copy(TEST_DOCUMENTS / "sample_document.docx", root / "a.docx")
+    shutil.copy(TEST_DOCUMENTS / "sample_document_with_images.docx", root / "sub" / "b.docx")
+    shutil.copy(TEST_DOCUMENTS / "sample_document_with_headers_footers.docx", root / "sub" / "c.docx")
+
+
+def run(root, *args):
+    result = CliRunner().invoke(giaconvert_complete.main, [str(root), '--incremental', *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_unchanged_documents_are_skipped(tmp_path):
+    make_tree(tmp_path)
+    first = run(tmp_path)
+    assert "Successfully converted: 3" in first
+    assert (tmp_path / MANIFEST_NAME).exists()
+
+    second = run(tmp_path)
+    assert "All 3 Word document(s) are up to date." in second
+    assert "Converting:" not in second
+
+
+def test_changed_and_touched_documents(tmp_path):
+    make_tree(tmp_path)
+    run(tmp_path)
+
+    # Touched but identical: the content hash keeps it up to date
+    touched = tmp_path / "a.docx"
+    os.utime(touched, (touched.stat().st_atime, touched.stat().st_mtime + 100))
+    # Replaced with different content: must be reconverted
+    shutil.copy(TEST_DOCUMENTS / "legacy_test_document.docx", tmp_path / "sub" / "b.docx")
+
+    output = run(tmp_path)
+    assert "Converting: sub/b.docx" in output
+    assert "Converting: a.docx" not in output
+    assert "Up to date (skipped): 2" in output
+
+
+def test_missing_output_and_option_changes_reconvert(tmp_path):
+    make_tree(tmp_path)
+    run(tmp_path)
+
+    (tmp_path / "a.html").unlink()
+    assert "Converting: a.docx" in run(tmp_path)
+
+    # Different options invalidate every entry
+    assert "Successfully converted: 3" in run(tmp_path, '--headers-footers', 'skip')
+
+
+def test_converter_upgrade_reconverts(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    run(tmp_path)
+    monkeypatch.setattr(giaconvert_complete, '__version__', giaconvert_complete.__version__ + '.1')
+    assert "Successfully converted: 3" in run(tmp_path)
+    assert "All 3 Word document(s) are up to date." in run(tmp_path)
+
+
+def test_outputs_of_deleted_documents_are_removed(tmp_path):
+    make_tree(tmp_path)
+    run(tmp_path)
+    assert (tmp_path / "sub" / "b_images").is_dir()
+
+    (tmp_path / "sub" / "b.docx").unlink()
+    output = run(tmp_path)
+
+    assert "Outputs of deleted documents removed: 2" in output
+    assert not (tmp_path / "sub" / "b.html").exists()
+    assert not (tmp_path / "sub" / "b_images").exists()
+    assert (tmp_path / "sub" / "c.html").exists()
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Tests for the job stores: expiry of jobs, downloads and uploads, the directory
+sweep, and the batched writes of the SQLite backend.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from giaconvert_jobs import InMemoryJobStore, SQLiteJobStore, create_job_store
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    stores = []
+
+    def make(**kwargs):
+        clock = FakeClock()
+        path = tmp_path / 'jobs.sqlite3' if request.param == 'sqlite' else None
+        stores.append(create_job_store(request.param, path, clock=clock, **kwargs))
+        return stores[-1], clock
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+def finish(store, job_id):
+    store.update(job_id, status='completed', progress=1.0)
+
+
+def test_finished_jobs_expire_with_their_downloads(make_store):
+    store, clock = make_store(ttl=60)
+    store.create('done', status='processing', progress=0.0)
+    store.create('running', status='processing', progress=0.0)
+    store.append('done', 'results', {'file_id': 'f1', 'output_file': '/out/a.html'})
+    store.add_download('f1', '/out/a.html', 'done')
+    finish(store, 'done')
+
+    assert store.get('done')['results_count'] == 1
+    assert store.entries('done', 'results', 0, 1) == [{'file_id': 'f1', 'output_file': '/out/a.html'}]
+
+    clock.now += 30
+    assert store.sweep() == {'jobs': 0, 'uploads': 0}
+    assert store.get_download('f1') == '/out/a.html'
+
+    # A running job outlives any TTL
+    clock.now += 3600
+    assert store.sweep() == {'jobs': 1, 'uploads': 0}
+    assert store.get('done') is None
+    assert store.get_download('f1') is None
+    assert store.get('running')['status'] == 'processing'
+
+
+def test_oldest_finished_jobs_are_evicted_over_the_limit(make_store):
+    store, clock = make_store(max_jobs=2)
+    for job_id in ('running', 'a', 'b', 'c'):
+        store.create(job_id, status='processing')
+    for job_id in ('a', 'b', 'c'):
+        clock.now += 1
+        finish(store, job_id)
+
+    assert store.get('a') is None
+    assert store.get('b') is not None and store.get('c') is not None
+    assert store.get('running') is not None
+    stats = store.stats()
+    assert stats['jobs'] == 3
+    assert stats['running_jobs'] == 1
+    assert stats['evicted_jobs'] == 1
+
+
+def test_sweep_directory_deletes_expired_uploads_and_orphaned_outputs(make_store, tmp_path):
+    tmp_path = tmp_path / 'uploads'
+    tmp_path.mkdir()
+    store, clock = make_store(upload_ttl=100)
+    old = clock.now - 1000
+
+    def old_file(name):
+        path = tmp_path / name
+        path.write_bytes(b'x' * 10)
+        os.utime(path, (old, old))
+        return path
+
+    expired_upload = old_file('1_expired.docx')
+    orphaned_output = old_file('1_expired.html')
+    orphaned_images = tmp_path / '1_expired_images'
+    orphaned_images.mkdir()
+    (orphaned_images / 'image_001.png').write_bytes(b'y' * 5)
+    os.utime(orphaned_images, (old, old))
+    live_upload = old_file('2_live.docx')
+    in_progress = old_file('3.part')
+    recent = tmp_path / '4_recent.docx'
+    recent.write_bytes(b'z')
+
+    store.add_upload(str(expired_upload), 'hash1')
+    clock.now += 200
+    store.add_upload(str(live_upload), 'hash2')
+    assert store.sweep() == {'jobs': 0, 'uploads': 1}
+    assert store.upload_hash(str(expired_upload)) is None
+
+    swept = store.sweep_directory(tmp_path, keep={str(in_progress)})
+    assert swept == {'paths': 3, 'bytes': 25}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['2_live.docx', '3.part', '4_recent.docx']
+    assert store.stats()['swept_bytes'] == 25
+
+
+def test_memory_estimate_follows_the_entries():
+    store = InMemoryJobStore()
+    store.create('job', status='processing')
+    before = store.stats()['memory_bytes']
+    store.append('job', 'errors', {'source_file': 'a.docx', 'error': 'x' * 1000})
+    assert store.stats()['memory_bytes'] > before + 1000
+    store.delete('job')
+    assert store.stats()['memory_bytes'] == 0
+
+
+def test_sqlite_results_are_written_in_batches(tmp_path):
+    """Another process sees per-file results once a batch is written, status changes at once"""
+    writer = SQLiteJobStore(tmp_path / 'jobs.sqlite3', batch_size=3, flush_interval=3600)
+    reader = SQLiteJobStore(tmp_path / 'jobs.sqlite3')
+    try:
+        assert writer._db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        writer.create('job', status='queued', progress=0.0)
+        writer.update('job', status='processing')
+        assert reader.get('job')['status'] == 'processing'
+
+        writer.append('job', 'results', {'file_id': 'f0'})
+        writer.append('job', 'errors', {'error': 'broken'})
+        writer.update('job', progress=0.5)
+        assert (reader.get('job')['results_count'], reader.get('job')['progress']) == (0, 0.0)
+
+        # The third buffered change fills the batch
+        writer.add_download('f0', '/out/0.html', 'job')
+        status = reader.get('job')
+        assert (status['results_count'], status['errors_count'], status['progress']) == (1, 1, 0.5)
+        assert reader.get_download('f0') == '/out/0.html'
+
+        writer.append('job', 'results', {'file_id': 'f1'})
+        writer.append('job', 'results', {'file_id': 'f2'})
+        assert reader.get('job')['results_count'] == 1
+        # The writing process reads its own buffered changes
+        assert writer.get('job')['results_count'] == 3
+        assert [e['file_id'] for e in writer.entries('job', 'results', 1, 3)] == ['f1', 'f2']
+        assert reader.entries('job', 'results', 1, 3) == []
+        writer.flush()
+        assert [e['file_id'] for e in reader.entries('job', 'results', 1, 3)] == ['f1', 'f2']
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_sqlite_polling_does_not_write_the_buffer(tmp_path):
+    """Status polls in the writing process answer from the buffer instead of flushing it"""
+    store = SQLiteJobStore(tmp_path / 'jobs.sqlite3', batch_size=100, flush_interval=3600)
+    statements = []
+    try:
+        store.create('job', status='processing', progress=0.0)
+        store.append('job', 'results', {'file_id': 'f0', 'output_file': '/out/0.html'})
+        store.add_download('f0', '/out/0.html', 'job')
+        store.update('job', progress=0.5)
+        store._db.set_trace_callback(statements.append)
+
+        for _ in range(5):
+            status = store.get('job')
+            assert (status['status'], status['progress'], status['results_count']) == ('processing', 0.5, 1)
+            assert store.entries('job', 'results') == [{'file_id': 'f0', 'output_file': '/out/0.html'}]
+            assert store.get_download('f0') == '/out/0.html'
+            assert '/out/0.html' in store.live_paths()
+            assert store.stats()['downloads'] == 1
+
+        assert not [sql for sql in statements if sql.startswith(('BEGIN', 'INSERT', 'UPDATE'))]
+        store.flush()
+        assert statements.count('BEGIN IMMEDIATE') == 1
+    finally:
+        store._db.set_trace_callback(None)
+        store.close()
+
+
+def test_sqlite_jobs_survive_a_restart(tmp_path):
+    store = SQLiteJobStore(tmp_path / 'jobs.sqlite3')
+    store.create('job', status='processing')
+    store.append('job', 'results', {'file_id': 'f1'})
+    store.update('job', status='completed', progress=1.0)
+    store.add_upload('/uploads/a.docx', 'abc')
+    store.close()
+
+    store = SQLiteJobStore(tmp_path / 'jobs.sqlite3')
+    try:
+        assert store.get('job')['status'] == 'completed'
+        assert store.entries('job', 'results') == [{'file_id': 'f1'}]
+        assert store.upload_hash('/uploads/a.docx') == 'abc'
+        assert store.stats()['running_jobs'] == 0
+    finally:
+        store.close()
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_job_store('redis')
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
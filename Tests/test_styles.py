@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for memoized run styles and the shared CSS class mode.
+"""
+
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from docx import Document
+from docx.shared import Pt, RGBColor
+
+import giaconvert
+from giaconvert_styles import RunStyleCache
+from giaconvert_universal import UniversalDocumentConverter
+
+
+def formatted_document(paragraphs=20):
+    doc = Document()
+    for i in range(paragraphs):
+        p = doc.add_paragraph()
+        plain = p.add_run(f"Clause {i}: ")
+        bold = p.add_run("important")
+        bold.bold = True
+        colored = p.add_run(" & <colored>")
+        colored.font.color.rgb = RGBColor(0, 100, 200)
+        colored.font.size = Pt(14)
+    return doc
+
+
+def test_each_format_is_computed_once():
+    doc = formatted_document()
+    calls = []
+    converter = UniversalDocumentConverter()
+
+    def compute(run):
+        calls.append(run)
+        return converter._get_run_style(run)
+
+    styles = RunStyleCache(compute)
+    runs = [run for p in doc.paragraphs for run in p.runs]
+    css = [styles.css(run) for run in runs]
+
+    assert len(calls) == 3
+    assert css == [converter._get_run_style(run) for run in runs]
+    assert css[1] is css[4]
+
+
+def test_css_classes_replace_inline_styles(tmp_path):
+    source = tmp_path / "styled.docx"
+    formatted_document().save(str(source))
+
+    inline = UniversalDocumentConverter()._convert_docx_content_to_html(
+        Document(str(source)), 'styled', None, False)
+    classes = UniversalDocumentConverter(css_classes=True)._convert_docx_content_to_html(
+        Document(str(source)), 'styled', None, False)
+
+    assert 'style="font-weight:bold"' in inline
+    assert ' style="' not in classes.split('<main')[1].split('</main>')[0]
+    assert '<span class="r1">important</span>' in classes
+    assert '.r1 { font-weight:bold }' in classes
+    assert '.r2 { color:rgb(0,100,200);font-size:18px }' in classes
+    # The rules come before the body, so it is never shown unstyled
+    assert '.r1 { font-weight:bold }' in classes.split('</head>')[0]
+    assert len(classes) < len(inline)
+
+    # Same text, only the styling mechanism differs
+    strip = lambda html: re.sub(r'<[^>]+>', '', html.split('<main')[1].split('</main>')[0])
+    assert strip(classes) == strip(inline)
+
+
+def test_classes_restart_for_each_document(tmp_path):
+    converter = giaconvert.WordToHTMLConverter(css_classes=True)
+    pages = []
+    for name in ("a", "b"):
+        source = tmp_path / f"{name}.docx"
+        formatted_document(2).save(str(source))
+        assert converter.convert_docx_to_html(source, tmp_path / f"{name}.html")
+        pages.append((tmp_path / f"{name}.html").read_text(encoding='utf-8'))
+
+    assert pages[0] == pages[1].replace('<title>b</title>', '<title>a</title>')
+    assert pages[0].count('.r1 {') == 1
+    assert pages[0].index('.r1 {') < pages[0].index('</head>')
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
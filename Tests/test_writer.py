@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for the GIACONVERT streaming HTML writer.
+"""
+
+import base64
+import io
+import os
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from docx import Document
+
+from giaconvert_universal import UniversalDocumentConverter
+import giaconvert_writer
+from giaconvert_writer import BASE64_CHUNK_SIZE, HTMLWriter, InlineImages, open_html_output
+
+
+def test_writer_matches_join():
+    parts = ['<html>', '', '<p>one</p>', '<p>two</p>', '</html>']
+    buffer = io.StringIO()
+    writer = HTMLWriter(buffer)
+    writer.write(parts[0])
+    writer.extend(parts[1:])
+    assert buffer.getvalue() == '\n'.join(parts)
+
+
+def test_inline_images_are_streamed_as_base64():
+    images = InlineImages()
+    data = os.urandom(BASE64_CHUNK_SIZE * 2 + 7)
+    small = b'\x89PNG tiny'
+    buffer = io.StringIO()
+    writer = HTMLWriter(buffer, inline_images=images)
+    writer.write(f'<p><img src="data:image/png;base64,{images.placeholder("a", data)}"/></p>')
+    writer.write(f'<p>{images.placeholder("b", small)}|{images.placeholder("a", data)}</p>')
+
+    big = base64.b64encode(data).decode()
+    assert buffer.getvalue() == (f'<p><img src="data:image/png;base64,{big}"/></p>\n'
+                                 f'<p>{base64.b64encode(small).decode()}|{big}</p>')
+
+
+def test_failed_conversion_keeps_previous_page(tmp_path):
+    page = tmp_path / "page.html"
+    page.write_text("previous", encoding='utf-8')
+
+    with pytest.raises(RuntimeError):
+        with open_html_output(page) as writer:
+            writer.write('<p>half a page</p>')
+            raise RuntimeError("conversion failed")
+
+    assert page.read_text(encoding='utf-8') == "previous"
+    assert list(tmp_path.iterdir()) == [page]
+
+
+def test_page_is_moved_into_place(tmp_path):
+    page = tmp_path / "page.html"
+    with open_html_output(page) as writer:
+        writer.extend(['<html>', '</html>'])
+    assert page.read_text(encoding='utf-8') == '<html>\n</html>'
+    assert list(tmp_path.iterdir()) == [page]
+
+
+@pytest.mark.parametrize("spool_size", [giaconvert_writer.DEFERRED_SPOOL_SIZE, 16], ids=['memory', 'file'])
+def test_deferred_part_is_written_in_its_place(tmp_path, monkeypatch, spool_size):
+    """A part known only at the end (e.g. a stylesheet) lands where it was deferred"""
+    monkeypatch.setattr(giaconvert_writer, 'DEFERRED_SPOOL_SIZE', spool_size)
+    images = InlineImages()
+    data = os.urandom(1000)
+    rules = []
+    page = tmp_path / "page.html"
+    with open_html_output(page, inline_images=images) as writer:
+        writer.extend(['<html>', '<head>'])
+        writer.defer(lambda: ['<style>', *rules, '</style>'])
+        writer.extend(['</head>', '<body>'])
+        rules.append('.r1 { font-weight:bold }')
+        writer.write(f'<p class="r1">é<img src="data:image/png;base64,{images.placeholder("a", data)}"/></p>')
+        writer.extend(['</body>', '</html>'])
+
+    assert page.read_text(encoding='utf-8') == '\n'.join([
+        '<html>', '<head>', '<style>', '.r1 { font-weight:bold }', '</style>', '</head>', '<body>',
+        f'<p class="r1">é<img src="data:image/png;base64,{base64.b64encode(data).decode()}"/></p>',
+        '</body>', '</html>'])
+
+
+def test_empty_deferred_part_leaves_no_trace():
+    buffer = io.StringIO()
+    writer = HTMLWriter(buffer)
+    writer.write('<head>')
+    writer.defer(list)
+    writer.write('</head>')
+    writer.finish()
+    assert buffer.getvalue() == '<head>\n</head>'
+
+
+def test_peak_memory_does_not_grow_with_the_page(tmp_path):
+    """Streaming keeps only the current element in memory, not the whole page"""
+    doc = Document()
+    for i in range(1000):
+        doc.add_paragraph(f"Paragraph {i} of a long contract with enough words to matter. " * 3)
+    converter = UniversalDocumentConverter()
+    page = tmp_path / "large.html"
+
+    tracemalloc.start()
+    try:
+        with open_html_output(page) as writer:
+            converter._write_docx_content_html(writer, doc, 'large', None, False)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    page_size = page.stat().st_size
+    print(f"page: {page_size} bytes, peak traced memory: {peak} bytes")
+    assert peak < page_size / 2
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
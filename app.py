@@ -9,29 +9,74 @@ import sys
 import re
 import json
 import uuid
+import hashlib
 import asyncio
 import tempfile
 import traceback
 from pathlib import Path
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
-# Import our universal converter
+# Import our universal converter and the process-pool batch engine
 from giaconvert_universal import UniversalDocumentConverter
+from giaconvert_batch import BatchConverter, WorkerPool, convert_document_task
+from giaconvert_cache import DEFAULT_CACHE_SIZE, ConversionCache
+from giaconvert_images import IMAGE_FORMATS, avif_supported
+from giaconvert_jobs import (
+    DEFAULT_JOB_TTL, DEFAULT_MAX_JOBS, DEFAULT_UPLOAD_TTL, FINISHED_STATES, create_job_store
+)
+from giaconvert_uploads import DEFAULT_CHUNK_SIZE, UploadError, UploadStore, UploadTooLarge
+from giaconvert_writer import open_atomic
+
+# Wakes the progress streams of a conversion whenever its status changes (conversion_id -> Event)
+status_changes = {}
+
+# Seconds between keep-alive comments on an idle progress stream
+EVENT_KEEPALIVE = 15.0
+
+# With a shared job store, a progress stream served by another process than the one running
+# the conversion is not woken by it, and checks the store this often (seconds) instead
+EVENT_POLL_INTERVAL = 1.0
+
+# Page size for /api/status when `since` is given without `limit`, and its upper bound
+STATUS_PAGE_SIZE = 100
+MAX_STATUS_PAGE_SIZE = 1000
+
+# Batch conversion settings (override with environment variables)
+CONVERSION_WORKERS = int(os.environ.get('GIACONVERT_WORKERS', '0'))  # 0 = one process per CPU core
+CONVERSION_TIMEOUT = float(os.environ.get('GIACONVERT_FILE_TIMEOUT', '0')) or None  # seconds per file
+MAX_CONCURRENT_JOBS = int(os.environ.get('GIACONVERT_MAX_JOBS', '2'))  # conversions running at once
+MAX_QUEUED_JOBS = int(os.environ.get('GIACONVERT_QUEUE_SIZE', '100'))  # admitted jobs waiting to start
+
+# Upload limits in MB (0 = no limit); uploads are copied to disk in chunks of UPLOAD_CHUNK_SIZE bytes
+MAX_UPLOAD_FILE_BYTES = int(os.environ.get('GIACONVERT_MAX_FILE_MB', '512')) * 1024 * 1024 or None
+MAX_UPLOAD_REQUEST_BYTES = int(os.environ.get('GIACONVERT_MAX_UPLOAD_MB', '2048')) * 1024 * 1024 or None
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+RESUMABLE_CHUNK_SIZE = int(os.environ.get('GIACONVERT_UPLOAD_CHUNK_MB', '0')) * 1024 * 1024 or DEFAULT_CHUNK_SIZE
+MULTIPART_OVERHEAD = 64 * 1024  # allowance for form boundaries and headers in Content-Length
+
+# Job store settings: finished conversions and their download links are kept for JOB_TTL
+# seconds (at most JOBS_KEPT of them), uploads and outputs beside them for UPLOAD_TTL seconds
+JOB_TTL = float(os.environ.get('GIACONVERT_JOB_TTL', str(DEFAULT_JOB_TTL)))
+JOBS_KEPT = int(os.environ.get('GIACONVERT_JOBS_KEPT', str(DEFAULT_MAX_JOBS)))
+UPLOAD_TTL = float(os.environ.get('GIACONVERT_UPLOAD_TTL', str(DEFAULT_UPLOAD_TTL)))
+SWEEP_INTERVAL = float(os.environ.get('GIACONVERT_SWEEP_INTERVAL', '60'))  # seconds between sweeps
 
-# Global variables for tracking conversions
-active_conversions = {}
-conversion_results = {}
+# Job store backend: 'memory' (one server process) or 'sqlite' (shared by several worker
+# processes, e.g. uvicorn --workers 4, through the database at JOB_DB)
+JOB_STORE = os.environ.get('GIACONVERT_JOB_STORE', 'memory')
+JOB_DB = os.environ.get('GIACONVERT_JOB_DB') or str(Path(tempfile.gettempdir()) / "giaconvert_jobs.sqlite3")
 
-# Registry mapping download file_id -> absolute path on disk
-download_registry = {}
+# Conversion cache settings (the cache is disabled unless a directory is configured)
+CACHE_DIR = os.environ.get('GIACONVERT_CACHE_DIR')
+CACHE_SIZE_MB = int(os.environ.get('GIACONVERT_CACHE_SIZE_MB', str(DEFAULT_CACHE_SIZE // (1024 * 1024))))
 
 # Conversion modes mapping (using the universal converter for all modes)
 CONVERTER_CLASSES = {
@@ -46,24 +91,42 @@ class ConversionRequest(BaseModel):
     mode: str  # 'basic', 'enhanced', 'complete'
     output_option: str  # 'beside', 'mirrored', 'single_folder'
     destination_path: Optional[str] = None  # For mirrored/single_folder options
+    image_format: Optional[str] = None  # optimize images to one of IMAGE_FORMATS (None keeps them as they are)
+    responsive_images: bool = False  # image dimensions, lazy loading and srcset variants
 
 class ConversionStatus(BaseModel):
     conversion_id: str
-    status: str  # 'pending', 'processing', 'completed', 'failed'
+    status: str  # 'queued', 'processing', 'completed', 'completed_with_errors', 'failed'
     progress: float  # 0.0 to 1.0
     current_file: Optional[str] = None
     completed_files: int = 0
     total_files: int = 0
     results: List[Dict[str, Any]] = []
     errors: List[Dict[str, Any]] = []
+    cache_hits: int = 0
+    cache_misses: int = 0
+    image_source_bytes: int = 0  # image bytes in the converted documents, and in their pages
+    image_bytes: int = 0
     start_time: Optional[str] = None
     end_time: Optional[str] = None
+    results_count: int = 0  # totals, also when `results`/`errors` hold a single page
+    errors_count: int = 0
+    next_cursor: Optional[str] = None  # pass as `since` to get the entries after this page
+    has_more: bool = False
 
 class FileUploadResponse(BaseModel):
     upload_id: str
     filename: str
     size: int
     path: str
+    sha256: Optional[str] = None
+
+class ResumableUploadRequest(BaseModel):
+    filename: str
+    size: int
+
+class FinalizeUploadRequest(BaseModel):
+    sha256: Optional[str] = None  # checked against the assembled file when given
 
 # Error handling
 class GiaconvertError(Exception):
@@ -83,8 +146,33 @@ async def lifespan(app: FastAPI):
     upload_dir = Path(tempfile.gettempdir()) / "giaconvert_uploads"
     upload_dir.mkdir(exist_ok=True)
     app.state.upload_dir = upload_dir
+    app.state.upload_store = UploadStore(upload_dir, RESUMABLE_CHUNK_SIZE, MAX_UPLOAD_FILE_BYTES)
+    app.state.job_store = create_job_store(
+        JOB_STORE, JOB_DB if JOB_STORE == 'sqlite' else None,
+        ttl=JOB_TTL, max_jobs=JOBS_KEPT, upload_ttl=UPLOAD_TTL
+    )
+    background = [asyncio.create_task(sweep_periodically(SWEEP_INTERVAL))]
+    if app.state.job_store.flush_interval:
+        background.append(asyncio.create_task(flush_periodically(app.state.job_store.flush_interval)))
     
     print(f"📁 Upload directory: {upload_dir}")
+    if app.state.job_store.shared:
+        print(f"🗄️  Job store: {JOB_STORE} ({JOB_DB})")
+    
+    # Conversions run on a shared process pool; admitted jobs wait in a bounded queue
+    app.state.conversion_pool = WorkerPool(CONVERSION_WORKERS)
+    app.state.conversion_queue = asyncio.Queue(maxsize=MAX_QUEUED_JOBS)
+    app.state.conversion_cache = (
+        ConversionCache(CACHE_DIR, max_bytes=CACHE_SIZE_MB * 1024 * 1024) if CACHE_DIR else None
+    )
+    runners = [
+        asyncio.create_task(conversion_runner(app.state.conversion_queue))
+        for _ in range(MAX_CONCURRENT_JOBS)
+    ]
+    
+    print(f"⚙️  Conversion workers: {app.state.conversion_pool.jobs} processes, {MAX_CONCURRENT_JOBS} concurrent jobs")
+    if app.state.conversion_cache:
+        print(f"💾 Conversion cache: {app.state.conversion_cache.cache_dir}")
     print("✅ Server ready!")
     
     yield
@@ -92,10 +180,16 @@ async def lifespan(app: FastAPI):
     # Shutdown
     print("🛑 GIACONVERT Web Application shutting down...")
     
-    # Cleanup temp files
+    for task in (*runners, *background):
+        task.cancel()
+    await asyncio.gather(*runners, *background, return_exceptions=True)
+    app.state.conversion_pool.shutdown()
+    app.state.job_store.close()
+    
+    # Cleanup temp files (a shared job store outlives this process, and so do its uploads)
     try:
         import shutil
-        if upload_dir.exists():
+        if upload_dir.exists() and not app.state.job_store.shared:
             shutil.rmtree(upload_dir)
             print("🧹 Temporary files cleaned up")
     except Exception as e:
@@ -118,6 +212,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Turn away uploads that announce a body over the request limit before it is received"""
+    if request.url.path == "/api/upload" and MAX_UPLOAD_REQUEST_BYTES:
+        try:
+            content_length = int(request.headers.get('content-length', '0'))
+        except ValueError:
+            content_length = 0
+        if content_length > MAX_UPLOAD_REQUEST_BYTES + MULTIPART_OVERHEAD:
+            return JSONResponse(
+                status_code=413,
+                content={
+                    "error": {
+                        "code": "HTTP_413",
+                        "message": f"Upload exceeds the limit of {MAX_UPLOAD_REQUEST_BYTES // (1024 * 1024)} MB per request"
+                    }
+                }
+            )
+    return await call_next(request)
+
 # Mount static files
 static_dir = Path(__file__).parent / "web"
 app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
@@ -139,16 +253,41 @@ async def root():
             "status": "running",
             "endpoints": {
                 "upload": "/api/upload",
+                "resumable_upload": "/api/uploads",
                 "convert": "/api/convert",
                 "status": "/api/status/{conversion_id}",
-                "download": "/api/download/{file_id}"
+                "events": "/api/events/{conversion_id}",
+                "download": "/api/download/{file_id}",
+                "jobs": "/api/jobs"
             }
         })
 
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    health = {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    cache = app.state.conversion_cache
+    if cache:
+        health["cache"] = {"hits": cache.hits, "misses": cache.misses}
+    jobs = await asyncio.to_thread(app.state.job_store.stats)
+    health["jobs"] = {"jobs": jobs["jobs"], "running_jobs": jobs["running_jobs"]}
+    return health
+
+@app.get("/api/cache")
+async def cache_statistics():
+    """Conversion cache counters and disk usage"""
+    cache = app.state.conversion_cache
+    if not cache:
+        return {"enabled": False}
+    stats = await asyncio.to_thread(cache.stats)
+    return {"enabled": True, **stats}
+
+@app.get("/api/jobs")
+async def job_statistics():
+    """Job store size, memory estimate and upload directory disk usage"""
+    stats = await asyncio.to_thread(app.state.job_store.stats)
+    stats["upload_dir_bytes"] = await asyncio.to_thread(directory_size, app.state.upload_dir)
+    return stats
 
 @app.get("/api/modes")
 async def get_conversion_modes():
@@ -170,49 +309,153 @@ async def get_conversion_modes():
                 "description": "Full document with headers and footers",
                 "features": ["Text formatting", "Tables", "Images", "Headers/Footers", "Page layout"]
             }
-        }
+        },
+        # Values of a conversion's "image_format" (images modes only); leave it out to keep images as they are
+        "image_formats": [fmt for fmt in IMAGE_FORMATS if fmt != 'avif' or avif_supported()]
     }
 
+def save_upload(source, target: Path, max_bytes: Optional[int]) -> Tuple[int, str]:
+    """
+    Copy an uploaded file to `target` in UPLOAD_CHUNK_SIZE chunks, hashing it on the way.
+
+    Returns (size, sha256). Raises UploadTooLarge as soon as more than
+    `max_bytes` have been read; nothing is left behind at `target` then.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open_atomic(target, 'wb') as out:
+        while True:
+            chunk = source.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+            digest.update(chunk)
+            out.write(chunk)
+    return size, digest.hexdigest()
+
 @app.post("/api/upload", response_model=List[FileUploadResponse])
 async def upload_files(files: List[UploadFile] = File(...)):
     """Upload Word documents for conversion"""
     upload_responses = []
+    saved_paths = []
+    request_bytes = 0
     
-    for file in files:
-        if not (file.filename.lower().endswith('.docx') or file.filename.lower().endswith('.doc')):
-            raise HTTPException(
-                status_code=400,
-                detail=f"File {file.filename} is not a Word document (.doc or .docx)"
-            )
-        
-        # Generate upload ID and save file
-        upload_id = str(uuid.uuid4())
-        file_path = app.state.upload_dir / f"{upload_id}_{file.filename}"
-        
-        try:
-            content = await file.read()
-            file_path.write_bytes(content)
+    try:
+        for file in files:
+            if not (file.filename.lower().endswith('.docx') or file.filename.lower().endswith('.doc')):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"File {file.filename} is not a Word document (.doc or .docx)"
+                )
             
+            # Generate upload ID and save file
+            upload_id = str(uuid.uuid4())
+            file_path = app.state.upload_dir / f"{upload_id}_{file.filename}"
+            
+            # Stop at whichever limit is closer: this file's or what is left of the request's
+            limits = [MAX_UPLOAD_FILE_BYTES]
+            if MAX_UPLOAD_REQUEST_BYTES:
+                limits.append(MAX_UPLOAD_REQUEST_BYTES - request_bytes)
+            max_bytes = min((limit for limit in limits if limit is not None), default=None)
+            
+            try:
+                # Chunked copy off the event loop; the converter later reads this file in place
+                size, sha256 = await asyncio.to_thread(save_upload, file.file, file_path, max_bytes)
+            except UploadTooLarge:
+                if MAX_UPLOAD_FILE_BYTES is not None and max_bytes == MAX_UPLOAD_FILE_BYTES:
+                    limit = f"{MAX_UPLOAD_FILE_BYTES // (1024 * 1024)} MB per file"
+                else:
+                    limit = f"{MAX_UPLOAD_REQUEST_BYTES // (1024 * 1024)} MB per request"
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File {file.filename} exceeds the upload limit of {limit}"
+                )
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Failed to save {file.filename}: {str(e)}"
+                )
+            
+            saved_paths.append(file_path)
+            request_bytes += size
+            await asyncio.to_thread(app.state.job_store.add_upload, str(file_path), sha256)
             upload_responses.append(FileUploadResponse(
                 upload_id=upload_id,
                 filename=file.filename,
-                size=len(content),
-                path=str(file_path)
+                size=size,
+                path=str(file_path),
+                sha256=sha256
             ))
-            
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to save {file.filename}: {str(e)}"
-            )
+    except HTTPException:
+        # A rejected request keeps none of its files
+        for path in saved_paths:
+            await asyncio.to_thread(app.state.job_store.remove_upload, str(path))
+            path.unlink(missing_ok=True)
+        raise
     
     return upload_responses
 
+# Resumable uploads: init -> PUT chunks by offset (any order, in parallel) -> finalize
+@app.post("/api/uploads")
+async def create_resumable_upload(request: ResumableUploadRequest):
+    """Start a chunked upload; the response tells the client the chunk size and which chunks to send"""
+    try:
+        upload = await asyncio.to_thread(app.state.upload_store.create, request.filename, request.size)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return upload.status()
+
+@app.get("/api/uploads/{upload_id}")
+async def get_resumable_upload(upload_id: str):
+    """Progress of a chunked upload, used to resume it after an interruption"""
+    try:
+        upload = await asyncio.to_thread(app.state.upload_store.get, upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return upload.status()
+
+@app.put("/api/uploads/{upload_id}")
+async def put_upload_chunk(upload_id: str, offset: int, request: Request):
+    """Receive one chunk (the raw request body) and write it at `offset`"""
+    store = app.state.upload_store
+    try:
+        upload = await asyncio.to_thread(store.get, upload_id)
+        # Never hold more than one chunk of the body in memory
+        data = bytearray()
+        async for piece in request.stream():
+            data.extend(piece)
+            if len(data) > upload.chunk_size:
+                raise UploadError(f"Chunks must not exceed {upload.chunk_size} bytes", 413)
+        upload = await asyncio.to_thread(
+            store.write_chunk, upload_id, offset, bytes(data), request.headers.get('x-chunk-sha256')
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return {'upload_id': upload_id, 'offset': offset, 'missing': len(upload.missing())}
+
+@app.post("/api/uploads/{upload_id}/finalize", response_model=FileUploadResponse)
+async def finalize_upload(upload_id: str, request: FinalizeUploadRequest):
+    """Complete a chunked upload; the file can then be converted like a regular upload"""
+    try:
+        result = await asyncio.to_thread(app.state.upload_store.finalize, upload_id, request.sha256)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    await asyncio.to_thread(app.state.job_store.add_upload, result['path'], result['sha256'])
+    return FileUploadResponse(**result)
+
+@app.delete("/api/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    """Cancel a chunked upload"""
+    try:
+        await asyncio.to_thread(app.state.upload_store.abort, upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return {'upload_id': upload_id, 'status': 'cancelled'}
+
 @app.post("/api/convert")
-async def start_conversion(
-    request: ConversionRequest,
-    background_tasks: BackgroundTasks
-):
+async def start_conversion(request: ConversionRequest):
     """Start document conversion process"""
     
     # Validate conversion mode
@@ -222,6 +465,13 @@ async def start_conversion(
             detail=f"Invalid conversion mode: {request.mode}"
         )
     
+    # Validate image format
+    if request.image_format is not None and request.image_format not in IMAGE_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid image format: {request.image_format}"
+        )
+    
     # Validate output option
     if request.output_option not in ['beside', 'mirrored', 'single_folder']:
         raise HTTPException(
@@ -240,48 +490,207 @@ async def start_conversion(
     conversion_id = str(uuid.uuid4())
     
     # Initialize conversion status
-    status = ConversionStatus(
-        conversion_id=conversion_id,
-        status='pending',
-        progress=0.0,
-        total_files=len(request.files),
-        start_time=datetime.now().isoformat()
-    )
-    
-    active_conversions[conversion_id] = status
-    
-    # Start background conversion
-    background_tasks.add_task(
-        process_conversion,
+    jobs = app.state.job_store
+    await asyncio.to_thread(
+        jobs.create,
         conversion_id,
-        request
+        **new_job_counters(total_files=len(request.files), start_time=datetime.now().isoformat())
     )
+    for file_path in request.files:
+        await asyncio.to_thread(jobs.touch_upload, file_path)
+    
+    # Admit the job to the conversion queue, or turn it away if the server is saturated
+    try:
+        app.state.conversion_queue.put_nowait((conversion_id, request))
+    except asyncio.QueueFull:
+        await asyncio.to_thread(jobs.delete, conversion_id)
+        raise HTTPException(
+            status_code=503,
+            detail="The server is busy with other conversions. Please try again shortly."
+        )
     
     return {"conversion_id": conversion_id, "status": "started"}
 
+def parse_cursor(cursor: str) -> Tuple[int, int]:
+    """A status cursor "<results>:<errors>" (the same form as progress event ids)"""
+    match = re.fullmatch(r'(\d+):(\d+)', cursor)
+    if not match:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return int(match.group(1)), int(match.group(2))
+
 @app.get("/api/status/{conversion_id}", response_model=ConversionStatus)
-async def get_conversion_status(conversion_id: str):
-    """Get conversion progress and status"""
+async def get_conversion_status(conversion_id: str, since: Optional[str] = None, limit: Optional[int] = None):
+    """
+    Get conversion progress and status.
+    
+    With `since` (a cursor, "0:0" for the start) and/or `limit`, only the
+    results and errors after the cursor are returned, at most `limit` of
+    each, together with the counters and the `next_cursor` to continue
+    from; the response size then no longer grows with the job. Without
+    them the full lists are returned.
+    """
     
-    if conversion_id not in active_conversions:
+    jobs = app.state.job_store
+    status = await asyncio.to_thread(jobs.get, conversion_id)
+    if status is None:
         raise HTTPException(
             status_code=404,
             detail="Conversion not found"
         )
     
-    return active_conversions[conversion_id]
+    results_since, errors_since = 0, 0
+    if since is not None:
+        try:
+            results_since, errors_since = parse_cursor(since)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if limit is None:
+        limit = STATUS_PAGE_SIZE if since is not None else None
+    elif not 1 <= limit <= MAX_STATUS_PAGE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit must be between 1 and {MAX_STATUS_PAGE_SIZE}"
+        )
+    
+    results_count, errors_count = status['results_count'], status['errors_count']
+    results_end = results_count if limit is None else min(results_since + limit, results_count)
+    errors_end = errors_count if limit is None else min(errors_since + limit, errors_count)
+    return ConversionStatus(
+        conversion_id=conversion_id,
+        **status,
+        results=await asyncio.to_thread(jobs.entries, conversion_id, 'results', results_since, results_end),
+        errors=await asyncio.to_thread(jobs.entries, conversion_id, 'errors', errors_since, errors_end),
+        next_cursor=f"{max(results_end, results_since)}:{max(errors_end, errors_since)}",
+        has_more=results_end < results_count or errors_end < errors_count
+    )
+
+def notify_status(conversion_id: str):
+    """Wake every progress stream waiting on this conversion"""
+    event = status_changes.pop(conversion_id, None)
+    if event is not None:
+        event.set()
+
+def status_event(conversion_id: str) -> asyncio.Event:
+    """
+    The Event the next `notify_status` for this conversion sets.
+
+    A stream takes it before reading the job, so a change that lands between
+    the read and the wait still wakes it.
+    """
+    return status_changes.setdefault(conversion_id, asyncio.Event())
+
+async def wait_for_status_change(event: asyncio.Event, timeout: float) -> bool:
+    """Wait until `event` (from `status_event`) is set; False on timeout"""
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+def format_event(event: str, data: Dict[str, Any], event_id: Optional[str] = None) -> str:
+    """One Server-Sent Events message"""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return '\n'.join(lines) + '\n\n'
+
+def new_job_counters(total_files: int, start_time: str) -> Dict[str, Any]:
+    """The aggregate part of a new conversion's status, as kept in the job store"""
+    return {
+        'status': 'queued',
+        'progress': 0.0,
+        'current_file': None,
+        'completed_files': 0,
+        'total_files': total_files,
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'image_source_bytes': 0,
+        'image_bytes': 0,
+        'start_time': start_time,
+        'end_time': None,
+    }
+
+async def conversion_events(conversion_id: str, request: Request, sent_results: int, sent_errors: int):
+    """
+    Progress of a conversion as Server-Sent Events.
+
+    Each finished file is sent once, as a `result` or `file_error` event;
+    `progress` carries the counters whenever they change and `done` ends the
+    stream. Event ids are "<results sent>:<errors sent>", so a reconnecting
+    browser (Last-Event-ID) continues where it left off.
+    """
+    jobs = app.state.job_store
+    wait = EVENT_POLL_INTERVAL if jobs.shared else EVENT_KEEPALIVE
+    idle = 0.0
+    last_counters = None
+    while True:
+        changed = status_event(conversion_id)
+        counters = await asyncio.to_thread(jobs.get, conversion_id)
+        if counters is None:
+            return
+        
+        for result in await asyncio.to_thread(jobs.entries, conversion_id, 'results', sent_results):
+            sent_results += 1
+            yield format_event('result', result, f"{sent_results}:{sent_errors}")
+        for error in await asyncio.to_thread(jobs.entries, conversion_id, 'errors', sent_errors):
+            sent_errors += 1
+            yield format_event('file_error', error, f"{sent_results}:{sent_errors}")
+        
+        # Entries that arrived while sending are picked up on the next round
+        counters = dict(counters, results_count=sent_results, errors_count=sent_errors)
+        if counters['status'] in FINISHED_STATES:
+            yield format_event('done', counters, f"{sent_results}:{sent_errors}")
+            return
+        if counters != last_counters:
+            yield format_event('progress', counters, f"{sent_results}:{sent_errors}")
+            last_counters = counters
+        
+        if await wait_for_status_change(changed, wait):
+            idle = 0.0
+            continue
+        idle += wait
+        if idle >= EVENT_KEEPALIVE:
+            idle = 0.0
+            if await request.is_disconnected():
+                return
+            yield ": keep-alive\n\n"
+
+@app.get("/api/events/{conversion_id}")
+async def stream_conversion_events(conversion_id: str, request: Request):
+    """Push conversion progress to the browser (Server-Sent Events) instead of polling /api/status"""
+    
+    if await asyncio.to_thread(app.state.job_store.get, conversion_id) is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Conversion not found"
+        )
+    
+    # Resume after a reconnect from the last event the browser received
+    sent_results, sent_errors = 0, 0
+    try:
+        sent_results, sent_errors = parse_cursor(request.headers.get('last-event-id', ''))
+    except ValueError:
+        pass
+    
+    return StreamingResponse(
+        conversion_events(conversion_id, request, sent_results, sent_errors),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/api/download/{file_id}")
 async def download_file(file_id: str):
     """Download a converted HTML file by its registered file_id"""
 
-    if file_id not in download_registry:
+    registered_path = await asyncio.to_thread(app.state.job_store.get_download, file_id)
+    if registered_path is None:
         raise HTTPException(
             status_code=404,
             detail="File not found. It may have expired or the conversion ID is invalid."
         )
 
-    file_path = Path(download_registry[file_id])
+    file_path = Path(registered_path)
 
     if not file_path.exists():
         raise HTTPException(
@@ -303,73 +712,164 @@ async def download_file(file_id: str):
     )
 
 # Background conversion processing
+async def conversion_runner(queue: asyncio.Queue):
+    """Take admitted jobs off the queue and convert them, one job at a time per runner"""
+    while True:
+        conversion_id, request = await queue.get()
+        try:
+            await process_conversion(conversion_id, request)
+        finally:
+            queue.task_done()
+
 async def process_conversion(conversion_id: str, request: ConversionRequest):
     """Process document conversion in background"""
     
-    status = active_conversions[conversion_id]
+    jobs = app.state.job_store
+    status = await asyncio.to_thread(jobs.get, conversion_id)
     
     try:
-        status.status = 'processing'
+        await asyncio.to_thread(jobs.update, conversion_id, status='processing')
+        notify_status(conversion_id)
         
-        # Get converter class
-        converter_class = CONVERTER_CLASSES[request.mode]
-        converter = converter_class()
-        
-        # Process each file
-        for i, file_path in enumerate(request.files):
-            status.current_file = Path(file_path).name
-            status.progress = i / len(request.files)
-            
+        # Resolve output paths up front; files with an invalid destination fail immediately
+        cache = app.state.conversion_cache
+        tasks = []
+        failed = False
+        for file_path in request.files:
             try:
-                # Determine output path based on option
                 output_path = determine_output_path(
                     file_path, 
                     request.output_option, 
                     request.destination_path
                 )
-                
-                # Convert file using universal converter
-                result = converter.convert_document(file_path, output_path, request.mode)
-                
-                if result['success']:
-                    file_id = str(uuid.uuid4())
-                    download_registry[file_id] = result['html_path']
-                    status.results.append({
-                        'source_file': file_path,
-                        'output_file': result['html_path'],
-                        'file_id': file_id,
-                        'status': 'success',
-                        'images_extracted': result.get('images_extracted', 0),
-                        'images_dir': result.get('images_dir')
-                    })
-                    status.completed_files += 1
-                else:
-                    status.errors.append({
-                        'source_file': file_path,
-                        'error': result['message'],
-                        'error_code': 'CONVERSION_FAILED'
-                    })
-                
+                # Uploaded files were hashed on arrival, so the cache need not read them again
+                upload_hash = await asyncio.to_thread(jobs.upload_hash, file_path)
+                tasks.append((file_path, output_path, request.mode, cache, upload_hash,
+                              'docx', request.image_format, request.responsive_images))
             except Exception as e:
-                status.errors.append({
+                failed = True
+                await asyncio.to_thread(jobs.append, conversion_id, 'errors', {
                     'source_file': file_path,
                     'error': str(e),
                     'error_code': 'PROCESSING_ERROR'
                 })
         
+        # Convert files on the shared process pool without blocking the event loop;
+        # results arrive in request order
+        pool = app.state.conversion_pool
+        batch = BatchConverter(
+            convert_document_task,
+            jobs=pool.jobs,
+            timeout=CONVERSION_TIMEOUT
+        )
+        
+        async for i, (file_path, *_), result in batch.run_async(tasks, pool.executor):
+            status['current_file'] = Path(file_path).name
+            status['progress'] = (i + 1) / len(tasks)
+            
+            # Workers hold their own copy of the cache, so count hits and misses here
+            if result.get('cache') == 'hit':
+                status['cache_hits'] += 1
+                cache.hits += 1
+            elif result.get('cache') == 'miss':
+                status['cache_misses'] += 1
+                cache.misses += 1
+            
+            if result['success']:
+                file_id = str(uuid.uuid4())
+                await asyncio.to_thread(jobs.add_download, file_id, result['html_path'], conversion_id)
+                await asyncio.to_thread(jobs.append, conversion_id, 'results', {
+                    'source_file': file_path,
+                    'output_file': result['html_path'],
+                    'file_id': file_id,
+                    'status': 'success',
+                    'images_extracted': result.get('images_extracted', 0),
+                    'images_dir': result.get('images_dir'),
+                    'image_source_bytes': result.get('image_source_bytes', 0),
+                    'image_bytes': result.get('image_output_bytes', 0),
+                    'cached': result.get('cache') == 'hit'
+                })
+                status['completed_files'] += 1
+                status['image_source_bytes'] += result.get('image_source_bytes', 0)
+                status['image_bytes'] += result.get('image_output_bytes', 0)
+            else:
+                failed = True
+                await asyncio.to_thread(jobs.append, conversion_id, 'errors', {
+                    'source_file': file_path,
+                    'error': result['message'],
+                    'error_code': result.get('error_code', 'CONVERSION_FAILED')
+                })
+            await asyncio.to_thread(jobs.update, conversion_id, **job_progress(status))
+            notify_status(conversion_id)
+        
         # Mark completion
-        status.progress = 1.0
-        status.status = 'completed' if not status.errors else 'completed_with_errors'
-        status.end_time = datetime.now().isoformat()
+        await asyncio.to_thread(
+            jobs.update,
+            conversion_id,
+            progress=1.0,
+            status='completed' if not failed else 'completed_with_errors',
+            end_time=datetime.now().isoformat()
+        )
         
     except Exception as e:
-        status.status = 'failed'
-        status.errors.append({
+        await asyncio.to_thread(jobs.append, conversion_id, 'errors', {
             'error': str(e),
             'error_code': 'SYSTEM_ERROR',
             'traceback': traceback.format_exc()
         })
-        status.end_time = datetime.now().isoformat()
+        await asyncio.to_thread(jobs.update, conversion_id, status='failed', end_time=datetime.now().isoformat())
+    finally:
+        notify_status(conversion_id)
+
+def job_progress(status: Dict[str, Any]) -> Dict[str, Any]:
+    """The counters a running conversion updates after each file"""
+    return {key: status[key] for key in ('current_file', 'progress', 'completed_files', 'cache_hits', 'cache_misses',
+                                         'image_source_bytes', 'image_bytes')}
+
+# Expiry of finished jobs, uploads and orphaned outputs
+def directory_size(directory: Path) -> int:
+    """Bytes used by the files under `directory`"""
+    if not directory.is_dir():
+        return 0
+    return sum(p.stat().st_size for p in directory.rglob('*') if p.is_file())
+
+def sweep_jobs() -> Dict[str, int]:
+    """
+    One sweep: forget expired jobs and uploads, cancel stalled resumable
+    uploads and delete files in the upload directory nothing refers to.
+    """
+    jobs = app.state.job_store
+    upload_store = app.state.upload_store
+    expired = jobs.sweep()
+    expired['resumable_uploads'] = upload_store.expire(UPLOAD_TTL)
+    swept = jobs.sweep_directory(app.state.upload_dir, keep=upload_store.part_paths())
+    return {**expired, 'swept_paths': swept['paths'], 'swept_bytes': swept['bytes']}
+
+async def flush_periodically(interval: float):
+    """Background task writing out buffered job store changes every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(app.state.job_store.flush)
+        except Exception as e:
+            print(f"⚠️  Error writing job store: {e}")
+
+async def sweep_periodically(interval: float):
+    """Background task running `sweep_jobs` every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            swept = await asyncio.to_thread(sweep_jobs)
+        except Exception as e:
+            print(f"⚠️  Error sweeping expired jobs: {e}")
+            continue
+        # Progress streams of forgotten jobs stop waiting
+        for conversion_id in list(status_changes):
+            if await asyncio.to_thread(app.state.job_store.get, conversion_id) is None:
+                notify_status(conversion_id)
+        if swept['jobs'] or swept['uploads'] or swept['swept_paths']:
+            print(f"🧹 Expired {swept['jobs']} jobs and {swept['uploads']} uploads, "
+                  f"deleted {swept['swept_paths']} files ({swept['swept_bytes']:,} bytes)")
 
 def determine_output_path(file_path: str, output_option: str, destination_path: str = None) -> str:
     """Determine output file path based on conversion options"""
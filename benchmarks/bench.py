@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT Benchmarks
+Generates benchmark documents, times the converters on them and compares runs.
+
+    python3 benchmarks/bench.py generate corpus/ -n 1000 -n 10000 -t 10 -i 5 --headers-footers sections --legacy
+    python3 benchmarks/bench.py run corpus/ -o before.json
+    python3 benchmarks/bench.py compare before.json after.json
+"""
+
+import json
+import multiprocessing
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import HEADER_FOOTER_VARIANTS, generate_corpus
+
+RESULTS_VERSION = 1
+
+MODES = ('basic', 'enhanced', 'complete')
+ENGINES = ('docx', 'fast')
+
+# Converter modules: the universal converter runs per mode and engine, the
+# command-line converters have a single mode each
+CONVERTERS = {
+    'universal': None,
+    'basic': 'giaconvert',
+    'with_images': 'giaconvert_with_images',
+    'complete': 'giaconvert_complete',
+}
+
+
+def _peak_rss_kb() -> Optional[int]:
+    """Peak resident set size of this process in KiB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _output_bytes(html_path: Path) -> int:
+    """Size of the HTML page plus its images folder"""
+    size = html_path.stat().st_size if html_path.exists() else 0
+    images_dir = html_path.parent / f'{html_path.stem}_images'
+    if images_dir.is_dir():
+        size += sum(p.stat().st_size for p in images_dir.iterdir() if p.is_file())
+    return size
+
+
+def measure(document: str, converter: str, mode: str, engine: str) -> Dict[str, Any]:
+    """
+    Convert `document` once and report wall time, peak RSS and output size.
+
+    Runs in a fresh worker process (see `run_case`), so the peak RSS belongs
+    to this conversion alone; `baseline_rss_kb` is the peak after importing
+    the converter, before converting.
+    """
+    if converter == 'universal':
+        from giaconvert_universal import UniversalDocumentConverter
+        instance = UniversalDocumentConverter()
+        convert = lambda source, html: instance.convert_document(source, html, mode, engine=engine)['success']
+    else:
+        module = __import__(CONVERTERS[converter])
+        instance = module.WordToHTMLConverter()
+        convert = lambda source, html: bool(instance.convert_docx_to_html(Path(source), Path(html)))
+
+    baseline = _peak_rss_kb()
+    output_dir = Path(tempfile.mkdtemp(prefix='giaconvert-bench-'))
+    try:
+        html_path = output_dir / f'{Path(document).stem}.html'
+        start = time.perf_counter()
+        success = convert(document, str(html_path))
+        wall_time = time.perf_counter() - start
+        return {
+            'success': success,
+            'wall_time': wall_time,
+            'peak_rss_kb': _peak_rss_kb(),
+            'baseline_rss_kb': baseline,
+            'output_bytes': _output_bytes(html_path),
+        }
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def run_case(document: Path, converter: str, mode: str, engine: str, repeat: int) -> Dict[str, Any]:
+    """Measure one case `repeat` times, each in a new process; keeps the best time and worst memory"""
+    context = multiprocessing.get_context('spawn')
+    runs = []
+    for _ in range(repeat):
+        with context.Pool(1) as pool:
+            runs.append(pool.apply(measure, (str(document), converter, mode, engine)))
+    rss = [r['peak_rss_kb'] for r in runs if r['peak_rss_kb'] is not None]
+    return {
+        'document': document.name,
+        'document_bytes': document.stat().st_size,
+        'converter': converter,
+        'mode': mode,
+        'engine': engine,
+        'success': all(r['success'] for r in runs),
+        'wall_time': min(r['wall_time'] for r in runs),
+        'times': [r['wall_time'] for r in runs],
+        'peak_rss_kb': max(rss) if rss else None,
+        'baseline_rss_kb': runs[0]['baseline_rss_kb'],
+        'output_bytes': runs[-1]['output_bytes'],
+    }
+
+
+def iter_cases(documents: List[Path], converters: List[str], modes: List[str], engines: List[str]):
+    """(document, converter, mode, engine) for every applicable combination"""
+    for document in documents:
+        legacy = document.suffix.lower() == '.doc'
+        for converter in converters:
+            if converter == 'universal':
+                for mode in modes:
+                    # .doc files do not go through an engine
+                    for engine in (['docx'] if legacy else engines):
+                        yield document, converter, mode, engine
+            elif not legacy:
+                yield document, converter, converter, 'docx'
+
+
+def case_key(result: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    return result['document'], result['converter'], result['mode'], result['engine']
+
+
+def compare_results(old: Dict[str, Any], new: Dict[str, Any], time_threshold: float,
+                    memory_threshold: float, min_time: float) -> List[Dict[str, Any]]:
+    """
+    Pair the cases of two runs and flag regressions.
+
+    A case regresses when it got slower by more than `time_threshold`
+    (a fraction) and by more than `min_time` seconds, when its peak RSS grew
+    by more than `memory_threshold`, or when it stopped succeeding.
+    """
+    old_cases = {case_key(r): r for r in old['results']}
+    rows = []
+    for result in new['results']:
+        before = old_cases.get(case_key(result))
+        if before is None:
+            continue
+        problems = []
+        time_ratio = result['wall_time'] / before['wall_time'] if before['wall_time'] else 1.0
+        if time_ratio > 1 + time_threshold and result['wall_time'] - before['wall_time'] > min_time:
+            problems.append('time')
+        rss_ratio = None
+        if before.get('peak_rss_kb') and result.get('peak_rss_kb'):
+            rss_ratio = result['peak_rss_kb'] / before['peak_rss_kb']
+            if rss_ratio > 1 + memory_threshold:
+                problems.append('memory')
+        if before['success'] and not result['success']:
+            problems.append('failed')
+        rows.append({
+            'key': case_key(result),
+            'old_time': before['wall_time'],
+            'new_time': result['wall_time'],
+            'time_ratio': time_ratio,
+            'rss_ratio': rss_ratio,
+            'regressions': problems,
+        })
+    return rows
+
+
+@click.group()
+def cli():
+    """GIACONVERT benchmark suite"""
+
+
+@cli.command()
+@click.argument('output_dir', type=click.Path(file_okay=False, dir_okay=True))
+@click.option('--paragraphs', '-n', type=click.IntRange(min=0), multiple=True, default=[1000], show_default=True,
+              help='Paragraphs per document (repeat for several sizes)')
+@click.option('--tables', '-t', type=click.IntRange(min=0), multiple=True, default=[0], show_default=True,
+              help='Tables per document (repeatable)')
+@click.option('--images', '-i', type=click.IntRange(min=0), multiple=True, default=[0], show_default=True,
+              help='Distinct images per document (repeatable)')
+@click.option('--headers-footers', type=click.Choice(HEADER_FOOTER_VARIANTS), multiple=True, default=['none'],
+              show_default=True, help='Header/footer variant (repeatable)')
+@click.option('--legacy', is_flag=True, help='Also write a .doc copy of every document')
+@click.option('--seed', type=int, default=0, show_default=True, help='Seed for the generated text')
+def generate(output_dir, paragraphs, tables, images, headers_footers, legacy, seed):
+    """Generate a corpus with one document per parameter combination"""
+    documents = generate_corpus(Path(output_dir), list(paragraphs), list(tables), list(images),
+                                list(headers_footers), legacy=legacy, seed=seed)
+    for path in documents:
+        click.echo(f"📄 {path.name} ({path.stat().st_size:,} bytes)")
+    click.echo(f"✅ Generated {len(documents)} documents in {output_dir}")
+
+
+@cli.command()
+@click.argument('corpus_dir', type=click.Path(exists=True, file_okay=False, dir_okay=True))
+@click.option('--output', '-o', type=click.Path(dir_okay=False), required=True, help='JSON file for the results')
+@click.option('--converter', 'converters', type=click.Choice(list(CONVERTERS)), multiple=True,
+              default=list(CONVERTERS), show_default=True, help='Converter modules to time (repeatable)')
+@click.option('--mode', 'modes', type=click.Choice(MODES), multiple=True, default=list(MODES), show_default=True,
+              help='Universal converter modes (repeatable)')
+@click.option('--engine', 'engines', type=click.Choice(ENGINES), multiple=True, default=list(ENGINES),
+              show_default=True, help='Universal converter .docx engines (repeatable)')
+@click.option('--repeat', '-r', type=click.IntRange(min=1), default=3, show_default=True,
+              help='Runs per case; the fastest is kept')
+def run(corpus_dir, output, converters, modes, engines, repeat):
+    """Time every converter/mode/engine on the documents in CORPUS_DIR"""
+    documents = sorted(p for p in Path(corpus_dir).iterdir() if p.suffix.lower() in ('.docx', '.doc'))
+    if not documents:
+        raise click.ClickException(f"No .doc or .docx files in {corpus_dir}")
+
+    results = []
+    for document, converter, mode, engine in iter_cases(documents, list(converters), list(modes), list(engines)):
+        result = run_case(document, converter, mode, engine, repeat)
+        results.append(result)
+        status = '✅' if result['success'] else '❌'
+        rss = f"{result['peak_rss_kb'] / 1024:.0f} MB" if result['peak_rss_kb'] else 'n/a'
+        click.echo(f"{status} {document.name} {converter}/{mode}/{engine}: "
+                   f"{result['wall_time']:.3f}s, peak RSS {rss}, output {result['output_bytes']:,} bytes")
+
+    report = {
+        'version': RESULTS_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+    Path(output).write_text(json.dumps(report, indent=2), encoding='utf-8')
+    click.echo(f"📊 {len(results)} cases written to {output}")
+
+
+@cli.command()
+@click.argument('baseline', type=click.Path(exists=True, dir_okay=False))
+@click.argument('candidate', type=click.Path(exists=True, dir_okay=False))
+@click.option('--threshold', type=click.FloatRange(min=0), default=10.0, show_default=True,
+              help='Slowdown (percent) reported as a regression')
+@click.option('--memory-threshold', type=click.FloatRange(min=0), default=10.0, show_default=True,
+              help='Peak RSS growth (percent) reported as a regression')
+@click.option('--min-time', type=click.FloatRange(min=0), default=0.05, show_default=True,
+              help='Ignore slowdowns smaller than this many seconds')
+def compare(baseline, candidate, threshold, memory_threshold, min_time):
+    """Compare two runs; exits with status 1 when CANDIDATE regressed"""
+    old = json.loads(Path(baseline).read_text(encoding='utf-8'))
+    new = json.loads(Path(candidate).read_text(encoding='utf-8'))
+    rows = compare_results(old, new, threshold / 100, memory_threshold / 100, min_time)
+    if not rows:
+        raise click.ClickException("The two runs have no cases in common")
+
+    regressions = 0
+    for row in rows:
+        document, converter, mode, engine = row['key']
+        rss = f", RSS x{row['rss_ratio']:.2f}" if row['rss_ratio'] is not None else ''
+        flag = '⚠️  REGRESSION (' + ', '.join(row['regressions']) + ')' if row['regressions'] else ''
+        click.echo(f"{document} {converter}/{mode}/{engine}: {row['old_time']:.3f}s -> {row['new_time']:.3f}s "
+                   f"(x{row['time_ratio']:.2f}{rss}) {flag}".rstrip())
+        regressions += bool(row['regressions'])
+
+    if regressions:
+        click.echo(f"❌ {regressions} of {len(rows)} cases regressed")
+        sys.exit(1)
+    click.echo(f"✅ No regressions in {len(rows)} cases")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT Benchmark Corpus
+Generates synthetic Word documents of a chosen size for the benchmark suite.
+"""
+
+import io
+import random
+from pathlib import Path
+from typing import List, Optional
+
+from docx import Document
+from docx.enum.section import WD_SECTION
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.shared import Inches, Pt, RGBColor
+from PIL import Image
+
+from word97 import write_word97
+
+HEADER_FOOTER_VARIANTS = ('none', 'simple', 'sections')
+
+# Paragraphs per section in the 'sections' header/footer variant
+SECTION_LENGTH = 200
+
+_WORDS = (
+    "agreement party clause term payment service delivery notice schedule period "
+    "obligation invoice contract supplier customer liability warranty report annex "
+    "the of and to in for with on by under each any all such shall may"
+).split()
+
+_FONTS = ('Arial', 'Calibri', 'Times New Roman', 'Courier New')
+
+
+def document_name(paragraphs: int, tables: int, images: int, headers_footers: str) -> str:
+    """File stem encoding the corpus parameters, e.g. p1000_t10_i5_simple"""
+    return f"p{paragraphs}_t{tables}_i{images}_{headers_footers}"
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = ' '.join(rng.choice(_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + '.'
+
+
+def _image_bytes(rng: random.Random, index: int) -> bytes:
+    """A distinct PNG with some structure, so it does not compress to nothing"""
+    width, height = 320, 200
+    image = Image.new('RGB', (width, height), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    pixels = image.load()
+    for x in range(0, width, 4):
+        for y in range(0, height, 4):
+            pixels[x, y] = ((x * index) % 256, (y * 7) % 256, (x + y + index * 31) % 256)
+    output = io.BytesIO()
+    image.save(output, format='PNG')
+    return output.getvalue()
+
+
+def _add_formatted_paragraph(doc, rng: random.Random, index: int):
+    if index % 25 == 0:
+        doc.add_heading(_sentence(rng, 4), level=1 + (index // 25) % 3)
+        return
+    style = 'List Bullet' if index % 11 == 0 else None
+    p = doc.add_paragraph(style=style)
+    if index % 7 == 0:
+        p.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+    for _ in range(rng.randint(2, 5)):
+        run = p.add_run(_sentence(rng, rng.randint(4, 14)) + ' ')
+        kind = rng.randrange(6)
+        if kind == 1:
+            run.bold = True
+        elif kind == 2:
+            run.italic = True
+        elif kind == 3:
+            run.font.color.rgb = RGBColor(rng.randrange(256), 0, rng.randrange(256))
+        elif kind == 4:
+            run.font.size = Pt(rng.choice((9, 10, 12, 14)))
+            run.font.name = rng.choice(_FONTS)
+
+
+def _add_table(doc, rng: random.Random, rows: int = 8, cols: int = 4):
+    table = doc.add_table(rows=rows, cols=cols)
+    table.style = 'Table Grid'
+    for i, row in enumerate(table.rows):
+        for j, cell in enumerate(row.cells):
+            cell.text = f'Column {j + 1}' if i == 0 else _sentence(rng, rng.randint(1, 5))
+    if rows > 2 and cols > 1:
+        table.cell(1, 0).merge(table.cell(2, 0))
+
+
+def _set_header_footer(section, rng: random.Random, label: str, logo: Optional[bytes]):
+    section.header.is_linked_to_previous = False
+    section.footer.is_linked_to_previous = False
+    header = section.header.paragraphs[0]
+    header.text = f'{label} — {_sentence(rng, 3)}'
+    if logo is not None:
+        header.add_run().add_picture(io.BytesIO(logo), width=Inches(0.5))
+    section.footer.paragraphs[0].text = f'{label} footer'
+
+
+def generate_document(path: Path, paragraphs: int, tables: int = 0, images: int = 0,
+                      headers_footers: str = 'none', seed: int = 0) -> Path:
+    """
+    Write a synthetic .docx with `paragraphs` formatted paragraphs and
+    headings, `tables` tables and `images` distinct pictures spread evenly
+    through the body. `headers_footers` is 'none', 'simple' (one header and
+    footer) or 'sections' (a new section with its own header, footer and
+    logo every SECTION_LENGTH paragraphs). The same arguments always give
+    the same document.
+    """
+    if headers_footers not in HEADER_FOOTER_VARIANTS:
+        raise ValueError(f"Unknown header/footer variant: {headers_footers}")
+
+    rng = random.Random(f'{seed}:{paragraphs}:{tables}:{images}:{headers_footers}')
+    doc = Document()
+    logo = _image_bytes(rng, 0) if headers_footers == 'sections' else None
+    if headers_footers != 'none':
+        _set_header_footer(doc.sections[0], rng, 'Section 1', logo)
+
+    table_at = {(i + 1) * paragraphs // (tables + 1) for i in range(tables)}
+    image_at = {(i + 1) * paragraphs // (images + 1) for i in range(images)}
+    tables_left, images_left = tables, images
+
+    doc.add_heading(f'Benchmark document {document_name(paragraphs, tables, images, headers_footers)}', 0)
+    for index in range(paragraphs):
+        if headers_footers == 'sections' and index and index % SECTION_LENGTH == 0:
+            section = doc.add_section(WD_SECTION.NEW_PAGE)
+            _set_header_footer(section, rng, f'Section {index // SECTION_LENGTH + 1}', logo)
+        _add_formatted_paragraph(doc, rng, index)
+        if index in table_at:
+            _add_table(doc, rng)
+            tables_left -= 1
+        if index in image_at:
+            doc.add_paragraph().add_run().add_picture(io.BytesIO(_image_bytes(rng, images_left)), width=Inches(3))
+            images_left -= 1
+
+    # Fewer paragraphs than tables/images: append the rest
+    for _ in range(tables_left):
+        _add_table(doc, rng)
+    for i in range(images_left):
+        doc.add_paragraph().add_run().add_picture(io.BytesIO(_image_bytes(rng, i + 1)), width=Inches(3))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doc.save(str(path))
+    return path
+
+
+def generate_corpus(output_dir: Path, paragraphs: List[int], tables: List[int], images: List[int],
+                    headers_footers: List[str], legacy: bool = False, seed: int = 0) -> List[Path]:
+    """
+    Generate one document per combination of the parameter lists.
+
+    With `legacy` each document is also saved as a Word 97-2003 .doc
+    with the same content, which exercises the universal converter's .doc
+    reader.
+    """
+    output_dir = Path(output_dir)
+    documents = []
+    for n in paragraphs:
+        for m in tables:
+            for k in images:
+                for variant in headers_footers:
+                    path = output_dir / f'{document_name(n, m, k, variant)}.docx'
+                    generate_document(path, n, m, k, variant, seed)
+                    documents.append(path)
+                    if legacy:
+                        documents.append(write_word97(Document(str(path)), path.with_suffix('.doc')))
+    return documents
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT Word 97 Writer
+Saves a python-docx Document as a Word 97-2003 binary .doc, for the benchmark
+corpus and the .doc reader tests.
+"""
+
+import hashlib
+import io
+import struct
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.oxml.ns import qn
+from docx.table import Table
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from giaconvert_blocks import iter_block_items
+from giaconvert_doc import (
+    NFIB_WORD97, SPRM_C_CV, SPRM_C_F_BOLD, SPRM_C_F_ITALIC, SPRM_C_F_SPEC, SPRM_C_HPS, SPRM_C_KUL,
+    SPRM_C_PIC_LOCATION, SPRM_C_RG_FTC0, SPRM_P_F_IN_TABLE, SPRM_P_F_TTP, SPRM_P_JC80, SPRM_T_DEF_TABLE,
+    WORD_IDENT
+)
+from giaconvert_images import get_image_part, iter_image_rel_ids
+
+SECTOR_SIZE = 512
+FKP_SIZE = 512
+# Streams are padded to this size so they live in regular sectors, without a mini stream
+MINI_STREAM_CUTOFF = 4096
+_FREESECT, _ENDOFCHAIN, _FATSECT, _DIFSECT, _NOSTREAM = 0xFFFFFFFF, 0xFFFFFFFE, 0xFFFFFFFD, 0xFFFFFFFC, 0xFFFFFFFF
+_HEADER_DIFAT = 109
+
+# Text starts after the FIB
+_TEXT_FC = 0x400
+_FIB_RG_FC_LCB = 0x5D
+_DOP_SIZE = 500
+
+# Maximum runs per FKP page
+_CHPX_FKP_RUNS = 0x65
+_PAPX_FKP_RUNS = 0x1D
+
+_ALIGNMENTS = {
+    WD_PARAGRAPH_ALIGNMENT.LEFT: 0,
+    WD_PARAGRAPH_ALIGNMENT.CENTER: 1,
+    WD_PARAGRAPH_ALIGNMENT.RIGHT: 2,
+    WD_PARAGRAPH_ALIGNMENT.JUSTIFY: 3,
+}
+
+# istd 0 is Normal, 1-9 the built-in headings, 10 Default Paragraph Font
+_STYLES = [('Normal', 0)] + [(f'Heading {level}', level) for level in range(1, 10)]
+_DEFAULT_PARAGRAPH_FONT = ('Default Paragraph Font', 65)
+
+
+def _sprm(sprm: int, operand: bytes) -> bytes:
+    return struct.pack('<H', sprm) + operand
+
+
+class _Builder:
+    """Text, properties and pictures of the document, collected in CP order"""
+
+    def __init__(self):
+        self.text: List[str] = []
+        self.cp = 0
+        self.chpx: List[Tuple[int, int, bytes]] = []   # (cp start, cp end, grpprl)
+        self.papx: List[Tuple[int, int, bytes]] = []   # (cp start, cp end, istd + grpprl)
+        self.paragraph_start = 0
+        self.fonts: List[str] = ['Times New Roman']
+        self.data = bytearray()
+        self.pictures: Dict[bytes, int] = {}
+
+    def add(self, text: str, grpprl: bytes = b''):
+        if not text:
+            return
+        self.text.append(text)
+        if self.chpx and self.chpx[-1][2] == grpprl and self.chpx[-1][1] == self.cp:
+            start = self.chpx.pop()[0]
+        else:
+            start = self.cp
+        self.cp += len(text)
+        self.chpx.append((start, self.cp, grpprl))
+
+    def end_paragraph(self, mark: str = '\r', istd: int = 0, grpprl: bytes = b''):
+        self.add(mark)
+        self.papx.append((self.paragraph_start, self.cp, struct.pack('<H', istd) + grpprl))
+        self.paragraph_start = self.cp
+
+    def font(self, name: str) -> int:
+        if name not in self.fonts:
+            self.fonts.append(name)
+        return self.fonts.index(name)
+
+    def run_grpprl(self, run) -> bytes:
+        """CHPX of a python-docx run's direct formatting"""
+        grpprl = b''
+        if run.bold:
+            grpprl += _sprm(SPRM_C_F_BOLD, b'\x01')
+        if run.italic:
+            grpprl += _sprm(SPRM_C_F_ITALIC, b'\x01')
+        if run.underline:
+            grpprl += _sprm(SPRM_C_KUL, b'\x01')
+        if run.font.color is not None and run.font.color.type is not None and run.font.color.rgb is not None:
+            rgb = run.font.color.rgb
+            grpprl += _sprm(SPRM_C_CV, bytes((rgb[0], rgb[1], rgb[2], 0)))
+        if run.font.size:
+            grpprl += _sprm(SPRM_C_HPS, struct.pack('<H', int(run.font.size.pt * 2)))
+        if run.font.name:
+            grpprl += _sprm(SPRM_C_RG_FTC0, struct.pack('<H', self.font(run.font.name)))
+        return grpprl
+
+    def picture(self, image: bytes) -> int:
+        """Data stream offset of a PICF with the image as its BLIP (each image stored once)"""
+        offset = self.pictures.get(image)
+        if offset is not None:
+            return offset
+        offset = self.pictures[image] = len(self.data)
+        self.data += _picture_record(image, len(self.pictures))
+        return offset
+
+    def paragraph(self, paragraph, mark: str = '\r', table_grpprl: bytes = b''):
+        for run in paragraph.runs:
+            text = run.text.replace('\n', '\x0b')
+            self.add(text, self.run_grpprl(run))
+            for drawing in run._element.iter(qn('w:drawing')):
+                for rel_id in iter_image_rel_ids(drawing):
+                    part = get_image_part(paragraph, rel_id)
+                    if part is not None:
+                        location = struct.pack('<I', self.picture(part.blob))
+                        self.add('\x01', _sprm(SPRM_C_F_SPEC, b'\x01') + _sprm(SPRM_C_PIC_LOCATION, location))
+
+        style = paragraph.style.name if paragraph.style is not None else 'Normal'
+        istd = next((i for i, (name, _) in enumerate(_STYLES) if name == style), 0)
+        grpprl = table_grpprl
+        if paragraph.alignment in _ALIGNMENTS:
+            grpprl += _sprm(SPRM_P_JC80, bytes((_ALIGNMENTS[paragraph.alignment],)))
+        # A paragraph that ends a section (it holds the section's w:sectPr) ends with a section mark
+        if mark == '\r' and paragraph._p.pPr is not None and paragraph._p.pPr.sectPr is not None:
+            mark = '\x0c'
+        self.end_paragraph(mark, istd, grpprl)
+
+    def table(self, table: Table):
+        in_table = _sprm(SPRM_P_F_IN_TABLE, b'\x01')
+        for row in table.rows:
+            cells = row.cells
+            for cell in cells:
+                paragraphs = cell.paragraphs
+                for i, paragraph in enumerate(paragraphs):
+                    self.paragraph(paragraph, '\x07' if i == len(paragraphs) - 1 else '\r', in_table)
+                if not paragraphs:
+                    self.end_paragraph('\x07', 0, in_table)
+            # Row end mark, carrying the row's cell layout
+            width = 9000 // max(1, len(cells))
+            centers = b''.join(struct.pack('<h', i * width) for i in range(len(cells) + 1))
+            layout = bytes((len(cells),)) + centers + b'\x00' * (20 * len(cells))
+            definition = _sprm(SPRM_T_DEF_TABLE, struct.pack('<H', len(layout) + 1) + layout)
+            self.end_paragraph('\x07', 0, in_table + _sprm(SPRM_P_F_TTP, b'\x01') + definition)
+
+    def blocks(self, parent):
+        for block in iter_block_items(parent):
+            if isinstance(block, Table):
+                self.table(block)
+            else:
+                self.paragraph(block)
+
+
+def _picture_record(image: bytes, index: int) -> bytes:
+    """PICF followed by an OfficeArt inline shape container holding the image as a BLIP"""
+    with Image.open(io.BytesIO(image)) as img:
+        width, height, kind = img.width, img.height, img.format
+    uid = hashlib.md5(image).digest()
+    if kind == 'JPEG':
+        blip_type, instance, bse_type = 0xF01D, 0x46A, 5
+    else:
+        blip_type, instance, bse_type = 0xF01E, 0x6E0, 6
+    blip = struct.pack('<HHI', instance << 4, blip_type, 17 + len(image)) + uid + b'\xff' + image
+    fbse = (struct.pack('<HHI', 2 | bse_type << 4, 0xF007, 36 + len(blip))
+            + bytes((bse_type, bse_type)) + uid + struct.pack('<HIIIBBBB', 0xFF, len(blip), 1, 0, 0, 0, 0, 0)
+            + blip)
+    fsp = struct.pack('<HHI', 2 | 75 << 4, 0xF00A, 8) + struct.pack('<II', 1024 + index, 0x0A00)
+    fopt = struct.pack('<HHI', 3 | 1 << 4, 0xF00B, 6) + struct.pack('<HI', 0x4104, index)
+    container = struct.pack('<HHI', 0xF, 0xF004, len(fsp) + len(fopt)) + fsp + fopt
+    picf = bytearray(0x44)
+    struct.pack_into('<IHh', picf, 0, 0x44 + len(container) + len(fbse), 0x44, 0x64)
+    struct.pack_into('<hhHH', picf, 28, width * 15, height * 15, 1000, 1000)
+    record = bytes(picf) + container + fbse
+    return record + b'\x00' * (len(record) % 2)
+
+
+def _plc(cps: List[int], data: List[bytes] = ()) -> bytes:
+    return struct.pack(f'<{len(cps)}I', *cps) + b''.join(data)
+
+
+def _fkp_pages(runs: List[Tuple[int, int, bytes]], paragraphs: bool) -> Tuple[List[bytes], List[int]]:
+    """
+    Pack (fc start, fc end, property bytes) runs into CHPX or PAPX FKP pages.
+    Returns the pages and the first fc of each page followed by the last end.
+    """
+    pages, first_fcs = [], []
+    entry_size = 13 if paragraphs else 1
+    max_runs = _PAPX_FKP_RUNS if paragraphs else _CHPX_FKP_RUNS
+
+    def stored(payload: bytes) -> bytes:
+        if not paragraphs:
+            return bytes((len(payload),)) + payload
+        if len(payload) % 2:
+            return bytes(((len(payload) + 1) // 2,)) + payload
+        return bytes((0, len(payload) // 2)) + payload
+
+    def flush(page_runs, placed):
+        page = bytearray(FKP_SIZE)
+        crun = len(page_runs)
+        fcs = [run[0] for run in page_runs] + [page_runs[-1][1]]
+        struct.pack_into(f'<{crun + 1}I', page, 0, *fcs)
+        for i, run in enumerate(page_runs):
+            offset = placed.get(run[2], (0, b''))[0]
+            page[4 * (crun + 1) + entry_size * i] = offset // 2
+        for offset, data in placed.values():
+            page[offset:offset + len(data)] = data
+        page[FKP_SIZE - 1] = crun
+        pages.append(bytes(page))
+        first_fcs.append(fcs[0])
+
+    page_runs, placed, top = [], {}, FKP_SIZE - 1
+    for run in runs:
+        payload = run[2]
+        new_top = top
+        if payload and payload not in placed:
+            new_top = (top - len(stored(payload))) & ~1
+        if page_runs and (len(page_runs) == max_runs
+                          or 4 * (len(page_runs) + 2) + entry_size * (len(page_runs) + 1) > new_top):
+            flush(page_runs, placed)
+            page_runs, placed, top = [], {}, FKP_SIZE - 1
+            new_top = (top - len(stored(payload))) & ~1 if payload else top
+        if payload and payload not in placed:
+            placed[payload] = (new_top, stored(payload))
+            top = new_top
+        page_runs.append(run)
+    if page_runs:
+        flush(page_runs, placed)
+    return pages, first_fcs + [runs[-1][1]]
+
+
+def _style_sheet() -> bytes:
+    """STSH with Normal, the nine headings and Default Paragraph Font"""
+    styles = []
+    for istd, (name, sti) in enumerate(_STYLES + [_DEFAULT_PARAGRAPH_FONT]):
+        paragraph_style = sti != 65
+        base = 0x0FFF if istd in (0, 10) else 0
+        upx = b''
+        if paragraph_style:
+            chpx = _sprm(SPRM_C_F_BOLD, b'\x01') if sti else b''
+            upx += struct.pack('<HH', 2, istd)
+            upx += struct.pack('<H', len(chpx)) + chpx + b'\x00' * (len(chpx) % 2)
+            cupx, stk = 2, 1
+        else:
+            upx += struct.pack('<H', 0)
+            cupx, stk = 1, 2
+        std = (struct.pack('<HHHHH', sti, stk | base << 4, cupx | (0 if sti else istd) << 4, 0, 0)
+               + struct.pack('<H', len(name)) + name.encode('utf-16-le') + b'\x00\x00' + upx)
+        std += b'\x00' * (len(std) % 2)
+        styles.append(struct.pack('<H', len(std)) + std)
+    stshi = struct.pack('<HHHHHH', len(styles), 10, 1, 0x5B, 15, 0) + struct.pack('<HHH', 0, 1, 0)
+    return struct.pack('<H', len(stshi)) + stshi + b''.join(styles)
+
+
+def _font_table(fonts: List[str]) -> bytes:
+    entries = []
+    for name in fonts:
+        ffn = b'\x00' + struct.pack('<H', 400) + b'\x00\x00' + b'\x00' * 10 + b'\x00' * 24
+        ffn += name.encode('utf-16-le') + b'\x00\x00'
+        entries.append(bytes((len(ffn),)) + ffn)
+    return struct.pack('<HH', len(fonts), 0) + b''.join(entries)
+
+
+def _fib(fc_lcb: Dict[int, Tuple[int, int]], ccp: Tuple[int, int, int], cb_mac: int) -> bytes:
+    fib = bytearray(_TEXT_FC)
+    # FibBase: 1Table holds the table stream
+    struct.pack_into('<HHHHH', fib, 0, WORD_IDENT, NFIB_WORD97, 0, 0x0409, 0)
+    struct.pack_into('<HH', fib, 0x0A, 0x0200, 0x00BF)
+    pos = 32
+    struct.pack_into('<H', fib, pos, 14)
+    pos += 2 + 28
+    lw = [0] * 22
+    lw[0] = cb_mac
+    lw[3], lw[4], lw[5] = ccp
+    struct.pack_into('<H22i', fib, pos, 22, *lw)
+    pos += 2 + 88
+    pairs = [0] * (2 * _FIB_RG_FC_LCB)
+    for index, (fc, lcb) in fc_lcb.items():
+        pairs[2 * index], pairs[2 * index + 1] = fc, lcb
+    struct.pack_into(f'<H{len(pairs)}I', fib, pos, _FIB_RG_FC_LCB, *pairs)
+    return bytes(fib)
+
+
+def write_word97(doc, path) -> Path:
+    """
+    Write python-docx Document `doc` as a Word 97-2003 .doc: paragraphs with
+    their heading styles, alignment and direct run formatting (bold,
+    italic, underline, color, size, font), tables, inline pictures, and the
+    header and footer of each section.
+    """
+    builder = _Builder()
+    sections = list(doc.sections)
+    builder.blocks(doc)
+    if not builder.papx or builder.text[-1] not in '\r\x0c':
+        builder.end_paragraph()
+    ccp_text = builder.cp
+
+    # Header document: six separator stories, then even/odd header, even/odd footer, first header/footer
+    story_starts = [0] * 6
+    for section in sections:
+        for part in (None, section.header, None, section.footer, None, None):
+            story_starts.append(builder.cp - ccp_text)
+            if part is not None:
+                # Only the paragraphs, which is what the converters read from headers and footers
+                for paragraph in part.paragraphs:
+                    if paragraph.runs:
+                        builder.paragraph(paragraph)
+    ccp_hdd = builder.cp - ccp_text
+    hdd_cps = story_starts + [ccp_hdd] if ccp_hdd else []
+    if ccp_hdd:
+        builder.end_paragraph()
+
+    text = ''.join(builder.text)
+    fc = lambda cp: _TEXT_FC + 2 * cp
+    word = bytearray(_TEXT_FC) + text.encode('utf-16-le')
+    word += b'\x00' * (-len(word) % FKP_SIZE)
+
+    bins = {}
+    for index, runs, paragraphs in ((12, builder.chpx, False), (13, builder.papx, True)):
+        pages, fcs = _fkp_pages([(fc(s), fc(e), data) for s, e, data in runs], paragraphs)
+        first_pn = len(word) // FKP_SIZE
+        for page in pages:
+            word += page
+        bins[index] = _plc(fcs, [struct.pack('<I', first_pn + i) for i in range(len(pages))])
+
+    # Section table: every section ends at its section mark, the last one at the end of the text
+    marks = [e for s, e, _ in builder.papx if e <= ccp_text and text[e - 1] == '\x0c']
+    section_cps = [0] + marks[:len(sections) - 1] + [ccp_text]
+    plcf_sed = _plc(section_cps, [struct.pack('<HIHI', 0, 0xFFFFFFFF, 0, 0xFFFFFFFF)] * (len(section_cps) - 1))
+
+    pcd = struct.pack('<HIH', 0, fc(0), 0)
+    plc_pcd = _plc([0, builder.cp], [pcd])
+    clx = b'\x02' + struct.pack('<I', len(plc_pcd)) + plc_pcd
+
+    table = bytearray()
+    fc_lcb = {}
+    for index, data in ((1, _style_sheet()), (6, plcf_sed), (11, _plc(hdd_cps) if hdd_cps else b''),
+                        (12, bins[12]), (13, bins[13]), (15, _font_table(builder.fonts)),
+                        (31, b'\x00' * _DOP_SIZE), (33, clx)):
+        if data:
+            fc_lcb[index] = (len(table), len(data))
+            table += data
+    fc_lcb[0] = fc_lcb[1]
+    word[:_TEXT_FC] = _fib(fc_lcb, (ccp_text, 0, ccp_hdd), len(word))
+
+    streams = [('WordDocument', bytes(word)), ('1Table', bytes(table))]
+    if builder.data:
+        streams.append(('Data', bytes(builder.data)))
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(compound_file(streams))
+    return path
+
+
+def _directory_entry(name: str, kind: int, left=_NOSTREAM, right=_NOSTREAM, child=_NOSTREAM,
+                     start=_ENDOFCHAIN, size=0) -> bytes:
+    encoded = name.encode('utf-16-le') + b'\x00\x00'
+    return (encoded.ljust(64, b'\x00') + struct.pack('<HBB3I', len(encoded), kind, 1, left, right, child)
+            + b'\x00' * 36 + struct.pack('<IQ', start, size))
+
+
+def _sibling_tree(ids: List[int], order: List[str]) -> Tuple[int, Dict[int, Tuple[int, int]]]:
+    """Balanced binary tree of directory entries: (root id, id -> (left, right))"""
+    ids = sorted(ids, key=lambda i: (len(order[i]), order[i].upper()))
+    links = {}
+
+    def build(items):
+        if not items:
+            return _NOSTREAM
+        middle = len(items) // 2
+        links[items[middle]] = (build(items[:middle]), build(items[middle + 1:]))
+        return items[middle]
+
+    return build(ids), links
+
+
+def compound_file(streams: List[Tuple[str, bytes]]) -> bytes:
+    """An OLE2 compound file (version 3, 512-byte sectors) with `streams` in its root storage"""
+    sectors = []
+    fat_chain: List[int] = []
+    entries = []
+    for name, data in streams:
+        data = data + b'\x00' * (max(MINI_STREAM_CUTOFF, len(data)) - len(data))
+        data += b'\x00' * (-len(data) % SECTOR_SIZE)
+        start = len(fat_chain)
+        count = len(data) // SECTOR_SIZE
+        fat_chain.extend(start + i + 1 for i in range(count - 1))
+        fat_chain.append(_ENDOFCHAIN)
+        sectors.append(data)
+        entries.append((name, start, len(data)))
+
+    names = ['Root Entry'] + [name for name, _, _ in entries]
+    root_child, links = _sibling_tree(list(range(1, len(names))), names)
+    directory = _directory_entry('Root Entry', 5, child=root_child)
+    for i, (name, start, size) in enumerate(entries, 1):
+        left, right = links[i]
+        directory += _directory_entry(name, 2, left, right, start=start, size=size)
+    directory += b'\x00' * (-len(directory) % SECTOR_SIZE)
+    dir_start = len(fat_chain)
+    dir_count = len(directory) // SECTOR_SIZE
+    fat_chain.extend(dir_start + i + 1 for i in range(dir_count - 1))
+    fat_chain.append(_ENDOFCHAIN)
+    sectors.append(directory)
+
+    # FAT sectors (and DIFAT sectors past the 109 listed in the header) follow the data
+    used = len(fat_chain)
+    fat_count = difat_count = 0
+    while True:
+        needed = -(-(used + fat_count + difat_count) // (SECTOR_SIZE // 4))
+        difat_needed = max(0, -(-(needed - _HEADER_DIFAT) // (SECTOR_SIZE // 4 - 1)))
+        if (needed, difat_needed) == (fat_count, difat_count):
+            break
+        fat_count, difat_count = needed, difat_needed
+    fat_sectors = list(range(used, used + fat_count))
+    difat_sectors = list(range(used + fat_count, used + fat_count + difat_count))
+    fat_chain.extend([_FATSECT] * fat_count + [_DIFSECT] * difat_count)
+    fat_chain.extend([_FREESECT] * (fat_count * SECTOR_SIZE // 4 - len(fat_chain)))
+    fat = struct.pack(f'<{len(fat_chain)}I', *fat_chain)
+
+    difat = b''
+    rest = fat_sectors[_HEADER_DIFAT:]
+    for i, sector in enumerate(difat_sectors):
+        chunk = rest[i * 127:(i + 1) * 127]
+        chunk += [_FREESECT] * (127 - len(chunk))
+        following = difat_sectors[i + 1] if i + 1 < len(difat_sectors) else _ENDOFCHAIN
+        difat += struct.pack('<128I', *chunk, following)
+
+    header_difat = fat_sectors[:_HEADER_DIFAT]
+    header_difat += [_FREESECT] * (_HEADER_DIFAT - len(header_difat))
+    header = (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\x00' * 16
+              + struct.pack('<HHHHH6sIIIIIIIII', 0x3E, 3, 0xFFFE, 9, 6, b'\x00' * 6, 0, fat_count, dir_start, 0,
+                            MINI_STREAM_CUTOFF, _ENDOFCHAIN, 0,
+                            difat_sectors[0] if difat_sectors else _ENDOFCHAIN, difat_count)
+              + struct.pack(f'<{_HEADER_DIFAT}I', *header_difat))
+    return header + b''.join(sectors) + fat + difat
@@ -14,15 +14,39 @@ from pathlib import Path
 from docx import Document
 from docx.shared import RGBColor
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.text.paragraph import Paragraph
 from docx.oxml.ns import qn
 import xml.etree.ElementTree as ET
 
+from giaconvert_batch import BatchConverter, convert_docx_task, resolve_jobs
+from giaconvert_blocks import iter_block_items
+from giaconvert_cache import DEFAULT_CACHE_SIZE, ConversionCache
+from giaconvert_manifest import ConversionManifest
+from giaconvert_styles import RunStyleCache
+from giaconvert_writer import open_html_output
+
+__version__ = "1.0.0"
+
 
 class WordToHTMLConverter:
-    def __init__(self):
+    def __init__(self, jobs=1, timeout=None, cache=None, incremental=False, css_classes=False):
         self.converted_count = 0
         self.error_count = 0
         self.errors = []
+        self.jobs = resolve_jobs(jobs)  # worker processes for convert_directory
+        self.timeout = timeout  # per-file time limit in seconds
+        self.cache = cache  # optional ConversionCache shared by convert_directory
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.incremental = incremental  # skip documents whose HTML is already up to date
+        self.skipped_count = 0
+        self.removed_count = 0
+        self.css_classes = css_classes  # shared CSS classes instead of inline run styles
+        self.run_styles = RunStyleCache(self.get_run_style, use_classes=css_classes)
+
+    def converter_options(self):
+        """Options needed to rebuild an equivalent single-file converter in a worker process"""
+        return {'css_classes': self.css_classes}
 
     def convert_paragraph_alignment(self, alignment):
         """Convert docx alignment to CSS text-align"""
@@ -94,13 +118,8 @@ class WordToHTMLConverter:
             # Escape HTML characters
             text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
             
-            # Get run styling
-            style = self.get_run_style(run)
-            
-            if style:
-                html_content.append(f'<span style="{style}">{text}</span>')
-            else:
-                html_content.append(text)
+            # Wrap in a span carrying the run styling (memoized per distinct format)
+            html_content.append(self.run_styles.wrap(run, text))
         
         # Wrap in paragraph tag with alignment
         content = ''.join(html_content)
@@ -132,44 +151,36 @@ class WordToHTMLConverter:
         """Convert a single docx file to HTML"""
         try:
             doc = Document(docx_path)
+            self.run_styles.start_document()
             
-            # Start building HTML
-            html_parts = [
-                '<!DOCTYPE html>',
-                '<html>',
-                '<head>',
-                '<meta charset="UTF-8">',
-                '<meta name="viewport" content="width=device-width, initial-scale=1.0">',
-                f'<title>{Path(docx_path).stem}</title>',
-                '<style>',
-                'body { font-family: Arial, sans-serif; line-height: 1.6; margin: 40px; }',
-                'table { margin: 20px 0; width: 100%; }',
-                'p { margin: 10px 0; }',
-                '</style>',
-                '</head>',
-                '<body>',
-            ]
-            
-            # Convert document content
-            for element in doc.element.body:
-                if element.tag.endswith('p'):  # Paragraph
-                    # Find corresponding paragraph object
-                    for para in doc.paragraphs:
-                        if para._element == element:
-                            html_parts.append(self.convert_paragraph_to_html(para))
-                            break
-                elif element.tag.endswith('tbl'):  # Table
-                    # Find corresponding table object
-                    for table in doc.tables:
-                        if table._element == element:
-                            html_parts.append(self.convert_table_to_html(table))
-                            break
-            
-            html_parts.extend(['</body>', '</html>'])
-            
-            # Write HTML file
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(html_parts))
+            # Stream the page to disk element by element
+            with open_html_output(html_path) as html:
+                html.extend([
+                    '<!DOCTYPE html>',
+                    '<html>',
+                    '<head>',
+                    '<meta charset="UTF-8">',
+                    '<meta name="viewport" content="width=device-width, initial-scale=1.0">',
+                    f'<title>{Path(docx_path).stem}</title>',
+                    '<style>',
+                    'body { font-family: Arial, sans-serif; line-height: 1.6; margin: 40px; }',
+                    'table { margin: 20px 0; width: 100%; }',
+                    'p { margin: 10px 0; }',
+                    '</style>',
+                ])
+                if self.css_classes:
+                    # Shared run styles (--css-classes), filled in once the body is written
+                    html.defer(self.run_styles.style_element)
+                html.extend(['</head>', '<body>'])
+                
+                # Convert document content in a single pass over the body
+                for block in iter_block_items(doc):
+                    if isinstance(block, Paragraph):
+                        html.write(self.convert_paragraph_to_html(block))
+                    else:
+                        html.write(self.convert_table_to_html(block))
+                
+                html.extend(['</body>', '</html>'])
             
             return True
             
@@ -204,32 +215,94 @@ class WordToHTMLConverter:
         # Find all Word documents
         word_files = self.find_word_documents(directory)
         
+        # Incremental mode: skip up-to-date documents and remove outputs of deleted ones
+        manifest = None
+        if self.incremental:
+            manifest = ConversionManifest(
+                directory,
+                {'converter': Path(__file__).stem, 'version': __version__, **self.converter_options()}
+            )
+            total_found = len(word_files)
+            word_files, removed = manifest.plan(word_files)
+            self.skipped_count = total_found - len(word_files)
+            self.removed_count = len(removed)
+            for path in removed:
+                click.echo(f"Removed output of deleted document: {path.relative_to(directory)}")
+            if not word_files:
+                manifest.save()
+                if total_found:
+                    click.echo(f"All {total_found} Word document(s) are up to date.")
+                    return True
+            if self.skipped_count:
+                click.echo(f"Skipping {self.skipped_count} up-to-date document(s).")
+        
         if not word_files:
             click.echo(f"No Word documents (.docx) found in '{directory}' and its subdirectories.")
             return True
         
         click.echo(f"Found {len(word_files)} Word document(s) to convert...")
         
-        # Convert each file
-        for docx_path in word_files:
-            html_path = docx_path.with_suffix('.html')
-            
+        if self.jobs > 1:
+            click.echo(f"Parallel workers: {self.jobs}")
+        
+        # Convert each file (on a process pool when jobs > 1); results are reported in order
+        tasks = [
+            (type(self), self.converter_options(), docx_path, docx_path.with_suffix('.html'), self.cache)
+            for docx_path in word_files
+        ]
+        batch = BatchConverter(convert_docx_task, jobs=self.jobs, timeout=self.timeout)
+        
+        for index, (_, _, docx_path, html_path, _), result in batch.run(tasks):
             click.echo(f"Converting: {docx_path.relative_to(directory)}")
             
-            if self.convert_docx_to_html(docx_path, html_path):
+            if result.get('cache') == 'hit':
+                self.cache_hits += 1
+            elif result.get('cache') == 'miss':
+                self.cache_misses += 1
+            
+            if 'errors' in result:
+                self.errors.extend(result['errors'])
+            else:
+                self.errors.append(f"Error converting {docx_path}: {result['error']}")
+            
+            if manifest is not None:
+                if result['success']:
+                    manifest.record(docx_path, html_path)
+                else:
+                    manifest.forget(docx_path)
+                if index % 500 == 499:
+                    manifest.save()
+            
+            if result['success']:
                 self.converted_count += 1
-                click.echo(f"  ✓ Converted to: {html_path.relative_to(directory)}")
+                cached = " (from cache)" if result.get('cache') == 'hit' else ""
+                click.echo(f"  ✓ Converted to: {html_path.relative_to(directory)}{cached}")
             else:
                 self.error_count += 1
                 click.echo(f"  ✗ Failed to convert", err=True)
         
+        if manifest is not None:
+            manifest.save()
+        
         return True
 
 
 @click.command()
 @click.argument('directory', type=click.Path(exists=True, file_okay=False, dir_okay=True, readable=True))
 @click.option('--verbose', '-v', is_flag=True, help='Show detailed output')
-def main(directory, verbose):
+@click.option('--jobs', '-j', type=click.IntRange(min=0), default=1, show_default=True,
+              help='Number of parallel worker processes (0 = one per CPU core)')
+@click.option('--timeout', type=click.FloatRange(min=0, min_open=True), default=None,
+              help='Per-file time limit in seconds (default: no limit)')
+@click.option('--cache-dir', type=click.Path(file_okay=False, dir_okay=True), default=None,
+              help='Reuse earlier conversions of unchanged documents from this cache directory')
+@click.option('--cache-size', type=click.IntRange(min=1), default=DEFAULT_CACHE_SIZE // (1024 * 1024),
+              show_default=True, help='Maximum cache size in MB (least recently used entries are evicted)')
+@click.option('--incremental', is_flag=True,
+              help='Only convert new or changed documents and remove outputs of deleted ones')
+@click.option('--css-classes', is_flag=True,
+              help='Write text formatting as shared CSS classes instead of inline styles (smaller files)')
+def main(directory, verbose, jobs, timeout, cache_dir, cache_size, incremental, css_classes):
     """
     Convert Word documents (.docx) to HTML format.
     
@@ -239,7 +312,10 @@ def main(directory, verbose):
     click.echo("🔄 GIACONVERT - Word to HTML Converter")
     click.echo("=" * 40)
     
-    converter = WordToHTMLConverter()
+    cache = ConversionCache(cache_dir, max_bytes=cache_size * 1024 * 1024) if cache_dir else None
+    
+    converter = WordToHTMLConverter(jobs=jobs, timeout=timeout, cache=cache, incremental=incremental,
+                                    css_classes=css_classes)
     
     # Convert documents
     success = converter.convert_directory(directory)
@@ -252,6 +328,11 @@ def main(directory, verbose):
     click.echo("📊 Conversion Summary:")
     click.echo(f"  ✅ Successfully converted: {converter.converted_count}")
     click.echo(f"  ❌ Failed conversions: {converter.error_count}")
+    if cache:
+        click.echo(f"  💾 Cache hits: {converter.cache_hits}, misses: {converter.cache_misses}")
+    if incremental:
+        click.echo(f"  ⏭️  Up to date (skipped): {converter.skipped_count}")
+        click.echo(f"  🧹 Outputs of deleted documents removed: {converter.removed_count}")
     
     if converter.errors and (verbose or converter.error_count > 0):
         click.echo("\n🚨 Errors encountered:")
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT Batch Engine
+Converts many documents on a process pool with per-file timeouts and ordered results.
+"""
+
+import asyncio
+import inspect
+import os
+import signal
+import sys
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+
+class ConversionTimeout(Exception):
+    """Raised inside a worker when a single file exceeds its time budget"""
+
+
+def resolve_jobs(jobs: Optional[int]) -> int:
+    """Normalise a worker count: None or 0 means one worker per CPU core"""
+    if not jobs or jobs < 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def _raise_timeout(signum, frame):
+    raise ConversionTimeout()
+
+
+def call_with_timeout(func: Callable, args: Sequence, timeout: Optional[float]):
+    """
+    Call func(*args), raising ConversionTimeout once `timeout` seconds have passed.
+
+    The timer uses SIGALRM, so it is only armed on POSIX systems and in the main
+    thread of a process (which is where pool workers run tasks). Elsewhere the
+    call simply runs without a limit.
+    """
+    if (not timeout or not hasattr(signal, 'SIGALRM')
+            or threading.current_thread() is not threading.main_thread()):
+        return func(*args)
+
+    previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+def _worker_failure(error: Exception) -> Dict[str, Any]:
+    """Result for a task whose worker process died (e.g. killed or out of memory)"""
+    reason = str(error) or type(error).__name__
+    return {
+        'success': False,
+        'error': reason,
+        'error_code': 'WORKER_ERROR',
+        'message': f'Worker process failed: {reason}'
+    }
+
+
+def run_task(func: Callable, args: Sequence, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Run one conversion task and always return a result dictionary.
+
+    Exceptions and timeouts are turned into failed results so that one bad
+    document never takes down the batch.
+    """
+    try:
+        return call_with_timeout(func, args, timeout)
+    except ConversionTimeout:
+        return {
+            'success': False,
+            'error': f'Conversion timed out after {timeout:g} seconds',
+            'error_code': 'TIMEOUT',
+            'message': f'Conversion timed out after {timeout:g} seconds'
+        }
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'error_code': 'PROCESSING_ERROR',
+            'message': f'Conversion failed: {str(e)}'
+        }
+
+
+class BatchConverter:
+    """Runs a picklable task function over many inputs on a process pool"""
+
+    def __init__(self, func: Callable, jobs: Optional[int] = 1, timeout: Optional[float] = None):
+        """
+        Args:
+            func: Module-level function called as func(*task) in the workers
+            jobs: Number of worker processes (None or 0 = one per CPU core, 1 = run inline)
+            timeout: Per-file time limit in seconds (None = no limit)
+        """
+        self.func = func
+        self.jobs = resolve_jobs(jobs)
+        self.timeout = timeout
+
+    def run(self, tasks: Iterable[Tuple]) -> Iterator[Tuple[int, Tuple, Dict[str, Any]]]:
+        """
+        Convert all tasks and yield (index, task, result) in input order.
+
+        All tasks are submitted up front so the pool stays busy; results are
+        reported in the order the tasks were given, regardless of which worker
+        finishes first.
+        """
+        tasks = list(tasks)
+
+        if self.jobs <= 1 or len(tasks) <= 1:
+            for index, task in enumerate(tasks):
+                yield index, task, run_task(self.func, task, self.timeout)
+            return
+
+        executor = ProcessPoolExecutor(max_workers=min(self.jobs, len(tasks)))
+        try:
+            futures = [executor.submit(run_task, self.func, task, self.timeout) for task in tasks]
+            for index, (task, future) in enumerate(zip(tasks, futures)):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = _worker_failure(e)
+                yield index, task, result
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    async def run_async(self, tasks: Iterable[Tuple], executor: Executor):
+        """
+        Async variant of run() for the web server.
+
+        Tasks run on a shared, long-lived `executor` and are awaited without
+        blocking the event loop. Results are yielded as (index, task, result) in
+        input order. At most `jobs` tasks of this batch are in flight at once, so
+        several batches sharing one executor interleave rather than queue behind
+        each other.
+        """
+        loop = asyncio.get_running_loop()
+        in_flight = deque()
+
+        async def collect():
+            index, task, future = in_flight.popleft()
+            try:
+                result = await future
+            except Exception as e:
+                result = _worker_failure(e)
+            return index, task, result
+
+        try:
+            for index, task in enumerate(tasks):
+                future = loop.run_in_executor(executor, run_task, self.func, task, self.timeout)
+                in_flight.append((index, task, future))
+                if len(in_flight) >= self.jobs:
+                    yield await collect()
+            while in_flight:
+                yield await collect()
+        finally:
+            for _, _, future in in_flight:
+                future.cancel()
+
+
+class WorkerPool:
+    """Long-lived process pool for servers that replaces itself if a worker dies"""
+
+    def __init__(self, jobs: Optional[int] = None):
+        self.jobs = resolve_jobs(jobs)
+        self._executor = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """The current executor, recreated when a crashed worker has broken the old one"""
+        if self._executor is None or getattr(self._executor, '_broken', False):
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs)
+        return self._executor
+
+    def shutdown(self):
+        """Stop the workers, dropping any conversions that have not started yet"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+def convert_docx_task(converter_class, options: Dict[str, Any], docx_path, html_path,
+                      cache=None, extra_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Worker entry point for the command-line converters.
+
+    Builds a fresh `converter_class(**options)` in the worker and converts one
+    .docx file with its `convert_docx_to_html` method, going through the
+    conversion cache when one is given. `extra_options` are further
+    constructor arguments that do not change the output (such as an image
+    cache), so they are left out of the conversion cache key.
+    """
+    converter = converter_class(**options, **(extra_options or {}))
+
+    def convert():
+        success = converter.convert_docx_to_html(docx_path, html_path)
+        result = {
+            'success': bool(success),
+            'html_path': str(html_path),
+            'images_processed': getattr(converter, 'image_counter', 0),
+            'errors': list(converter.errors),
+        }
+        registry = getattr(converter, 'image_registry', None)
+        if registry is not None:
+            result.update(registry.stats())
+        optimizer = getattr(converter, 'image_optimizer', None)
+        if optimizer is not None and optimizer.cache is not None:
+            result.update(optimizer.stats())
+        assets = getattr(converter, 'asset_store', None)
+        if assets is not None:
+            result.update(assets.stats())
+        return result
+
+    if cache is None:
+        return convert()
+
+    module = sys.modules[converter_class.__module__]
+    return cache.convert(
+        docx_path,
+        html_path,
+        mode=Path(inspect.getfile(converter_class)).stem,
+        options=options,
+        version=getattr(module, '__version__', ''),
+        convert=convert
+    )
+
+
+def convert_document_task(input_path: str, output_path: str, mode: str,
+                          cache=None, source_hash: Optional[str] = None,
+                          engine: str = 'docx', image_format: Optional[str] = None,
+                          responsive_images: bool = False) -> Dict[str, Any]:
+    """Worker entry point for the web backend: one file through the universal converter"""
+    from giaconvert_universal import UniversalDocumentConverter
+
+    converter = UniversalDocumentConverter(cache=cache, image_format=image_format,
+                                           responsive_images=responsive_images)
+    return converter.convert_document(input_path, output_path, mode, source_hash=source_hash, engine=engine)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT Block Walker
+Single-pass iteration over the paragraphs and tables of a .docx body, shared by all converters.
+"""
+
+from docx.document import Document as DocumentType
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+_P_TAG = qn('w:p')
+_TBL_TAG = qn('w:tbl')
+
+
+def iter_block_items(parent):
+    """
+    Yield each paragraph and table of `parent` in document order.
+
+    `parent` is a Document or any block container (table cell, header, footer).
+    Every `w:p`/`w:tbl` child is wrapped directly into its proxy, so walking the
+    body is linear in the number of elements. Looking elements up through
+    `doc.paragraphs` / `doc.tables` rebuilds those proxy lists on every access
+    and is quadratic for large documents.
+    """
+    if isinstance(parent, DocumentType):
+        container = parent._body
+        parent_element = parent.element.body
+    else:
+        container = parent
+        parent_element = parent._element
+
+    for child in parent_element.iterchildren():
+        if child.tag == _P_TAG:
+            yield Paragraph(child, container)
+        elif child.tag == _TBL_TAG:
+            yield Table(child, container)
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT Conversion Cache
+Content-addressed on-disk caches of converted HTML pages (with their image
+folders) and of optimized images.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from html import escape as html_escape
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from giaconvert_writer import open_atomic
+
+# Bump when the layout of cache entries changes
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024  # 1 GB
+
+# Bump when the image optimizer changes the bytes it produces
+IMAGE_CACHE_VERSION = 1
+
+DEFAULT_IMAGE_CACHE_SIZE = 256 * 1024 * 1024  # 256 MB
+
+ENTRY_FILE = 'entry.json'
+PAGE_FILE = 'page.html'
+IMAGES_FOLDER = 'images'
+
+
+def hash_file(path, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# src and srcset values on <img> (not data-src and the like)
+IMAGE_URL_ATTRIBUTE = re.compile(r'(\s(?:src|srcset)=")([^"]*)')
+
+
+def _replace_once(text: str, old: str, new: str) -> str:
+    return text.replace(old, new, 1) if old in text else text
+
+
+class ConversionCache:
+    """
+    Cache of conversion outputs keyed by (SHA-256 of the input, mode, options, version).
+
+    Each entry stores the HTML page and its `<stem>_images` folder. On a hit
+    the page is copied and the images are hard-linked (or copied across file
+    systems) into place instead of re-parsing the document. Entries are evicted
+    least-recently-used first once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir, max_bytes: int = DEFAULT_CACHE_SIZE, link: bool = True):
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.max_bytes = max_bytes
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None  # measured lazily on the first store
+
+    def key(self, source_hash: str, mode: str, options: Dict[str, Any], version: str) -> str:
+        """Cache key for one input document converted with the given settings"""
+        payload = json.dumps({
+            'format': CACHE_FORMAT_VERSION,
+            'source': source_hash,
+            'mode': mode,
+            'options': options,
+            'version': version,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def convert(self, source_path, html_path, mode: str, options: Dict[str, Any], version: str,
+                convert: Callable[[], Dict[str, Any]], title: Optional[str] = None,
+                source_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Return the cached conversion of `source_path` into `html_path`, or run `convert()`.
+
+        `convert` performs the real conversion and returns the converter's result
+        dictionary; successful results are stored for next time. `title` is the
+        document title written into the page (defaults to the source file stem)
+        and `source_hash` may be passed when the SHA-256 is already known.
+        The returned result carries `cache` = 'hit' or 'miss'.
+        """
+        source_path = Path(source_path)
+        html_path = Path(html_path)
+        title = title if title is not None else source_path.stem
+        key = self.key(source_hash or hash_file(source_path), mode, options, version)
+
+        result = self.restore(key, html_path, title)
+        if result is not None:
+            return result
+
+        self._clear_images(html_path)
+        result = dict(convert())
+        if result.get('success'):
+            try:
+                self.store(key, html_path, title, result)
+            except OSError as e:
+                print(f"Warning: Could not store conversion in cache: {e}")
+        result['cache'] = 'miss'
+        return result
+
+    def restore(self, key: str, html_path: Path, title: str) -> Optional[Dict[str, Any]]:
+        """Materialise a cached entry at `html_path`; returns its result dict or None on a miss"""
+        entry = self._entry_dir(key)
+        try:
+            meta = json.loads((entry / ENTRY_FILE).read_text(encoding='utf-8'))
+            html_path.parent.mkdir(parents=True, exist_ok=True)
+
+            images_name = f"{html_path.stem}_images"
+            page = entry / PAGE_FILE
+            if meta['title'] == title and meta['images_name'] == images_name:
+                shutil.copyfile(page, html_path)
+            else:
+                html = page.read_text(encoding='utf-8')
+                html = self._retarget(html, meta, title, images_name)
+                html_path.write_text(html, encoding='utf-8')
+
+            cached_images = entry / IMAGES_FOLDER
+            images_dir = None
+            self._clear_images(html_path)
+            if cached_images.is_dir():
+                images_dir = html_path.parent / images_name
+                images_dir.mkdir()
+                for cached in cached_images.iterdir():
+                    self._place(cached, images_dir / cached.name)
+
+            # Touch the entry so eviction sees it as recently used
+            os.utime(entry / ENTRY_FILE)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        result = dict(meta['result'])
+        result['html_path'] = str(html_path)
+        if result.get('images_dir'):
+            result['images_dir'] = str(images_dir)
+        result['cache'] = 'hit'
+        return result
+
+    def store(self, key: str, html_path: Path, title: str, result: Dict[str, Any]):
+        """Copy a fresh conversion output into the cache, then evict old entries if needed"""
+        entry = self._entry_dir(key)
+        if entry.exists():
+            return
+
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix='.staging-', dir=entry.parent))
+        try:
+            size = 0
+            shutil.copyfile(html_path, staging / PAGE_FILE)
+            size += (staging / PAGE_FILE).stat().st_size
+
+            images_name = f"{html_path.stem}_images"
+            images_dir = html_path.parent / images_name
+            if images_dir.is_dir():
+                (staging / IMAGES_FOLDER).mkdir()
+                for image in images_dir.iterdir():
+                    if image.is_file():
+                        self._place(image, staging / IMAGES_FOLDER / image.name)
+                        size += image.stat().st_size
+
+            # Image cache and shared asset counters describe this run only
+            stored_result = {
+                k: v for k, v in result.items()
+                if k not in ('html_path', 'cache') and not k.startswith(('image_cache_', 'assets_'))
+            }
+            (staging / ENTRY_FILE).write_text(json.dumps({
+                'title': title,
+                'images_name': images_name,
+                'size': size,
+                'result': stored_result,
+            }), encoding='utf-8')
+
+            # Publish atomically; another process may have stored the same entry meanwhile
+            os.rename(staging, entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not entry.exists():
+                raise
+            return
+
+        if self._total_bytes is None:
+            self._total_bytes = self._measure()
+        else:
+            self._total_bytes += size
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits in `max_bytes`"""
+        entries = []
+        for meta_file in self.cache_dir.glob(f'*/*/{ENTRY_FILE}'):
+            try:
+                size = json.loads(meta_file.read_text(encoding='utf-8'))['size']
+                entries.append((meta_file.stat().st_mtime, size, meta_file.parent))
+            except (OSError, ValueError, KeyError):
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+        self._total_bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus the current size of the cache"""
+        entries = list(self.cache_dir.glob(f'*/*/{ENTRY_FILE}'))
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entries),
+            'size_bytes': self._measure(),
+            'max_bytes': self.max_bytes,
+        }
+
+    def _measure(self) -> int:
+        total = 0
+        for meta_file in self.cache_dir.glob(f'*/*/{ENTRY_FILE}'):
+            try:
+                total += json.loads(meta_file.read_text(encoding='utf-8'))['size']
+            except (OSError, ValueError, KeyError):
+                continue
+        return total
+
+    def _place(self, source: Path, target: Path):
+        """Hard-link `source` to `target` when allowed and possible, otherwise copy it"""
+        if target.exists():
+            target.unlink()
+        if self.link:
+            try:
+                os.link(source, target)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(source, target)
+
+    def _clear_images(self, html_path: Path):
+        """
+        Delete the output image folder before a page is restored or reconverted.
+
+        Files left by an earlier conversion of another version of the document
+        would otherwise sit next to the new page (and be stored with it on a
+        miss), and converters rewriting hard-linked files in place would also
+        overwrite the cache entry they are linked to.
+        """
+        shutil.rmtree(html_path.parent / f"{html_path.stem}_images", ignore_errors=True)
+
+    @staticmethod
+    def _retarget(html: str, meta: Dict[str, Any], title: str, images_name: str) -> str:
+        """Rewrite the title and image folder references of a page cached under other names"""
+        old_title = meta['title']
+        if old_title != title:
+            for old, new in ((old_title, title), (html_escape(old_title), html_escape(title))):
+                html = _replace_once(html, f'<title>{old}</title>', f'<title>{new}</title>')
+                html = _replace_once(html, f'<h1>{old}</h1>', f'<h1>{new}</h1>')
+        if meta['images_name'] != images_name:
+            # Only links into the folder, never the same words in the text
+            folder = re.compile(r'(^|,\s*)' + re.escape(f"{meta['images_name']}/"))
+            html = IMAGE_URL_ATTRIBUTE.sub(
+                lambda m: m.group(1) + folder.sub(lambda u: f"{u.group(1)}{images_name}/", m.group(2)), html)
+            html = _replace_once(html, f"<code>{meta['images_name']}/</code>", f"<code>{images_name}/</code>")
+        return html
+
+
+class ImageCache:
+    """
+    Cache of optimized images keyed by (SHA-256 of the image, max width,
+    max height, quality, output format).
+
+    Logos and stock pictures that appear in many documents are optimized
+    once; later documents, in this run or a later one, read the stored bytes
+    without touching Pillow. Each entry is a single file whose modification
+    time marks its last use, and the least recently used entries are
+    evicted once the cache grows past `max_bytes`. Safe to share between
+    the threads of an ImageOptimizer and between processes.
+    """
+
+    def __init__(self, cache_dir, max_bytes: int = DEFAULT_IMAGE_CACHE_SIZE):
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0  # source image bytes that did not have to be decoded and re-encoded
+        self._total_bytes = None  # measured lazily on the first store
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Sent to worker processes without the lock
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def key(self, image_hash: str, max_width: int, max_height: int, quality: int, output_format: str) -> str:
+        payload = f'{IMAGE_CACHE_VERSION}:{image_hash}:{max_width}:{max_height}:{quality}:{output_format.lower()}'
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def get(self, key: str, source_size: int = 0) -> Optional[bytes]:
+        """Stored bytes for `key`, or None on a miss; `source_size` counts towards `bytes_saved` on a hit"""
+        path = self._entry_path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += source_size
+        return data
+
+    def put(self, key: str, data: bytes):
+        """Store optimized bytes, then evict old entries if the cache is over its size"""
+        path = self._entry_path(key)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open_atomic(path, 'wb') as f:
+                f.write(data)
+        except OSError as e:
+            print(f"Warning: Could not store image in cache: {e}")
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._measure()
+            else:
+                self._total_bytes += len(data)
+            over = self._total_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self):
+        """Delete least-recently-used images until the cache fits in `max_bytes`"""
+        entries = []
+        for path in self.cache_dir.glob('*/*'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.is_file() and not path.name.startswith('.'):
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        with self._lock:
+            self._total_bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus the current size of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'bytes_saved': self.bytes_saved,
+            'size_bytes': self._measure(),
+            'max_bytes': self.max_bytes,
+        }
+
+    def _measure(self) -> int:
+        total = 0
+        for path in self.cache_dir.glob('*/*'):
+            try:
+                if path.is_file() and not path.name.startswith('.'):
+                    total += path.stat().st_size
+            except OSError:
+                continue
+        return total
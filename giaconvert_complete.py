@@ -8,26 +8,91 @@ import os
 import sys
 import click
 import base64
+import hashlib
 from pathlib import Path
 from docx import Document
 from docx.shared import RGBColor
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.text.paragraph import Paragraph
 from docx.oxml.ns import qn
 from docx.document import Document as DocumentType
 import xml.etree.ElementTree as ET
-from PIL import Image
-import io
+
+from giaconvert_batch import BatchConverter, convert_docx_task, resolve_jobs
+from giaconvert_blocks import iter_block_items
+from giaconvert_cache import DEFAULT_CACHE_SIZE, DEFAULT_IMAGE_CACHE_SIZE, ConversionCache, ImageCache
+from giaconvert_images import (
+    DEDUPE_SCOPES, IMAGE_FORMATS, OPTIMIZE_MAX_HEIGHT, OPTIMIZE_MAX_WIDTH, OPTIMIZE_QUALITY, AssetStore, ImageOptimizer,
+    get_image_part, image_registry, iter_image_rel_ids, optimize_image, responsive_attributes, write_image
+)
+from giaconvert_manifest import ConversionManifest
+from giaconvert_styles import RunStyleCache
+from giaconvert_writer import InlineImages, open_html_output
+
+__version__ = "1.1.0"
 
 
 class WordToHTMLConverter:
-    def __init__(self, image_mode='external', optimize_images=False, headers_footers='include'):
+    def __init__(self, image_mode='external', optimize_images=False, headers_footers='include',
+                 jobs=1, timeout=None, cache=None, incremental=False,
+                 dedupe_images='document', css_classes=False,
+                 image_threads=0, image_cache=None, image_format='jpeg',
+                 responsive_images=False, inline_max_size=None, assets_dir=None):
         self.converted_count = 0
         self.error_count = 0
         self.errors = []
+        self.jobs = resolve_jobs(jobs)  # worker processes for convert_directory
+        self.timeout = timeout  # per-file time limit in seconds
+        self.cache = cache  # optional ConversionCache shared by convert_directory
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.incremental = incremental  # skip documents whose HTML is already up to date
+        self.skipped_count = 0
+        self.removed_count = 0
+        self.css_classes = css_classes  # shared CSS classes instead of inline run styles
+        self.run_styles = RunStyleCache(self.get_run_style, use_classes=css_classes)
         self.image_mode = image_mode  # 'external', 'inline', or 'skip'
         self.optimize_images = optimize_images
+        self.image_format = image_format  # output format of optimized images, one of IMAGE_FORMATS
+        self.responsive_images = responsive_images  # dimensions, lazy loading and srcset variants on <img>
+        self.inline_max_size = inline_max_size  # inline images larger than this (bytes) are saved as files
+        self.inline_images = InlineImages()  # base64 streamed into the page as it is written
+        self.html_path = None
         self.headers_footers = headers_footers  # 'include', 'skip', or 'print-only'
         self.image_counter = 0
+        self.dedupe_images = dedupe_images  # 'document' or 'batch'
+        self.image_registry = image_registry(dedupe_images, image_mode, optimize_images, image_format)
+        # Optimizes a document's images on worker threads while its body is converted
+        # (0 = one thread per CPU core, up to MAX_IMAGE_THREADS)
+        self.image_optimizer = (
+            ImageOptimizer(self.optimize_image, image_threads, cache=image_cache,
+                           settings=(OPTIMIZE_MAX_WIDTH, OPTIMIZE_MAX_HEIGHT, OPTIMIZE_QUALITY, image_format))
+            if optimize_images else None
+        )
+        self.image_bytes_saved = 0
+        self.image_source_bytes = 0  # image bytes in the documents, and in the pages made from them
+        self.image_output_bytes = 0
+        self.image_cache = image_cache  # optional ImageCache of optimized images, shared by all documents
+        self.image_cache_hits = 0
+        self.image_cache_misses = 0
+        self.image_cache_bytes_saved = 0
+        self.assets_dir = assets_dir  # shared content-addressed image store, hard-linked into image folders
+        self.asset_store = AssetStore(assets_dir) if assets_dir else None
+        self.assets_written = 0
+        self.assets_reused = 0
+
+    def converter_options(self):
+        """Options needed to rebuild an equivalent single-file converter in a worker process"""
+        return {
+            'image_mode': self.image_mode,
+            'optimize_images': self.optimize_images,
+            'image_format': self.image_format,
+            'responsive_images': self.responsive_images,
+            'inline_max_size': self.inline_max_size,
+            'dedupe_images': self.dedupe_images,
+            'css_classes': self.css_classes,
+            'headers_footers': self.headers_footers,
+        }
 
     def convert_paragraph_alignment(self, alignment):
         """Convert docx alignment to CSS text-align"""
@@ -82,29 +147,10 @@ class WordToHTMLConverter:
         images_dir.mkdir(exist_ok=True)
         return images_dir
 
-    def optimize_image(self, image_data, max_width=1200, max_height=800, quality=85):
-        """Optimize image size and quality"""
-        try:
-            img = Image.open(io.BytesIO(image_data))
-            
-            # Convert to RGB if necessary (for JPEG output)
-            if img.mode in ('RGBA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            
-            # Resize if too large
-            if img.width > max_width or img.height > max_height:
-                img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-            
-            # Save optimized image
-            output = io.BytesIO()
-            img.save(output, format='JPEG', quality=quality, optimize=True)
-            return output.getvalue()
-            
-        except Exception as e:
-            # If optimization fails, return original
-            return image_data
+    def optimize_image(self, image_data, max_width=OPTIMIZE_MAX_WIDTH, max_height=OPTIMIZE_MAX_HEIGHT,
+                       quality=OPTIMIZE_QUALITY):
+        """Optimize image size and quality, in the converter's image format"""
+        return optimize_image(image_data, max_width, max_height, quality, self.image_format)
 
     def extract_image_data(self, doc, image_rel_id):
         """Extract image data from document relationships"""
@@ -125,13 +171,25 @@ class WordToHTMLConverter:
             return 'gif'
         elif image_data.startswith(b'BM'):
             return 'bmp'
+        elif image_data[:4] == b'RIFF' and image_data[8:12] == b'WEBP':
+            return 'webp'
+        elif image_data[4:12] in (b'ftypavif', b'ftypavis'):
+            return 'avif'
         else:
             return 'png'  # Default fallback
 
-    def convert_image_to_base64(self, image_data):
-        """Convert image data to base64 string"""
+    def convert_image_to_base64(self, image_data, key=None):
+        """
+        Convert image data to a base64 data URI.
+
+        With a `key` (unique per image of the page), the URI holds a
+        placeholder instead, and the base64 is streamed into the page when
+        it is written.
+        """
         extension = self.get_image_extension(image_data)
         mime_type = f"image/{extension.replace('jpg', 'jpeg')}"
+        if key is not None:
+            return f"data:{mime_type};base64,{self.inline_images.placeholder(key, image_data)}"
         b64_data = base64.b64encode(image_data).decode('utf-8')
         return f"data:{mime_type};base64,{b64_data}"
 
@@ -148,51 +206,81 @@ class WordToHTMLConverter:
             for drawing in run._element.xpath('.//w:drawing'):
                 try:
                     # Find image relationships
-                    blips = drawing.xpath('.//a:blip[@r:embed]', 
-                                        namespaces={'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
-                                                  'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'})
-                    
-                    for blip in blips:
-                        rel_id = blip.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed')
-                        if rel_id:
-                            image_data = self.extract_image_data(paragraph._parent, rel_id)
-                            if image_data:
-                                self.image_counter += 1
-                                
-                                if self.image_mode == 'external':
-                                    # Save as external file
-                                    if self.optimize_images:
-                                        image_data = self.optimize_image(image_data)
-                                    
-                                    extension = self.get_image_extension(image_data)
-                                    image_filename = f"image_{self.image_counter:03d}.{extension}"
-                                    image_path = images_dir / image_filename
-                                    
-                                    with open(image_path, 'wb') as f:
-                                        f.write(image_data)
-                                    
-                                    # Relative path from HTML to image
-                                    relative_path = f"{images_dir.name}/{image_filename}"
-                                    html_parts.append(f'<img src="{relative_path}" alt="Image {self.image_counter}" style="max-width: 100%; height: auto;"/>')
-                                
-                                elif self.image_mode == 'inline':
-                                    # Embed as base64
-                                    if self.optimize_images:
-                                        image_data = self.optimize_image(image_data)
-                                    
-                                    base64_src = self.convert_image_to_base64(image_data)
-                                    html_parts.append(f'<img src="{base64_src}" alt="Image {self.image_counter}" style="max-width: 100%; height: auto;"/>')
+                    for rel_id in iter_image_rel_ids(drawing):
+                        image_part = get_image_part(paragraph, rel_id)
+                        if image_part is None:
+                            continue
+                        
+                        # Each unique image is written once; later references reuse its HTML
+                        image_html, digest = self.image_registry.lookup(image_part)
+                        if image_html is None:
+                            image_html = self.emit_image(image_part.blob, images_dir, digest)
+                        html_parts.append(image_html)
                 
                 except Exception as e:
                     self.errors.append(f"Error processing image: {str(e)}")
         
         return ''.join(html_parts)
 
+    def emit_image(self, image_data, images_dir, digest):
+        """Save or embed a newly seen image and return its HTML"""
+        self.image_counter += 1
+        image_path = None
+        source_data = image_data
+        source_size = len(image_data)
+        attributes = ''
+        existing = None
+        
+        if self.image_mode == 'inline':
+            if self.image_optimizer:
+                image_data = self.image_optimizer.result(digest, image_data)
+            if self.inline_max_size is not None and len(image_data) > self.inline_max_size:
+                # Too large to embed: saved as an external file instead
+                images_dir = self.create_images_directory(self.html_path)
+        
+        if images_dir is not None:
+            # Save as external file, linking the copy of an earlier document when there is one
+            if self.image_mode == 'external':
+                existing = self.image_registry.batch_file(digest)
+            if existing is not None:
+                extension = existing.suffix.lstrip('.')
+            else:
+                if self.image_optimizer and self.image_mode == 'external':
+                    image_data = self.image_optimizer.result(digest, image_data)
+                extension = self.get_image_extension(image_data)
+            
+            image_filename = f"image_{self.image_counter:03d}.{extension}"
+            image_path = images_dir / image_filename
+            if existing is not None:
+                self.image_registry.place(existing, image_path)
+            elif self.asset_store is not None:
+                # Unchanged images are named after the digest the registry already took
+                content_digest = digest if image_data is source_data else hashlib.sha256(image_data).hexdigest()
+                self.asset_store.place(self.asset_store.put(content_digest, extension, image_data), image_path)
+            else:
+                write_image(image_path, image_data)
+            
+            # Relative path from HTML to image
+            src = f"{images_dir.name}/{image_filename}"
+            if self.responsive_images:
+                saved = image_path.read_bytes() if existing is not None else image_data
+                attributes = responsive_attributes(saved, image_path, src)
+        else:
+            # Embed as base64, encoded straight into the page when it is written
+            src = self.convert_image_to_base64(image_data, digest)
+            if self.responsive_images:
+                attributes = responsive_attributes(image_data)
+        
+        image_html = (f'<img src="{src}" alt="Image {self.image_counter}"{attributes} '
+                      f'style="max-width: 100%; height: auto;"/>')
+        self.image_registry.add(digest, image_html, image_path, source_size, len(image_data))
+        return image_html
+
     def convert_paragraph_to_html(self, paragraph, html_path=None, images_dir=None):
         """Convert a docx paragraph to HTML with image support"""
         # First, check for images
         image_html = ""
-        if html_path and images_dir:
+        if html_path and (images_dir or self.image_mode == 'inline'):
             image_html = self.process_paragraph_images(paragraph, html_path, images_dir)
         
         # If paragraph is empty but has images, return just the images
@@ -217,13 +305,8 @@ class WordToHTMLConverter:
             # Escape HTML characters
             text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
             
-            # Get run styling
-            style = self.get_run_style(run)
-            
-            if style:
-                html_content.append(f'<span style="{style}">{text}</span>')
-            else:
-                html_content.append(text)
+            # Wrap in a span carrying the run styling (memoized per distinct format)
+            html_content.append(self.run_styles.wrap(run, text))
         
         # Combine text and images
         content = ''.join(html_content)
@@ -354,9 +437,17 @@ class WordToHTMLConverter:
         try:
             doc = Document(docx_path)
             self.image_counter = 0  # Reset counter for each document
+            self.image_registry.start_document()
+            self.run_styles.start_document()
+            if self.asset_store:
+                self.asset_store.start_document()
+            if self.image_optimizer and self.image_mode != 'skip':
+                self.image_optimizer.start_document(doc, self.image_registry)
             
             # Ensure html_path is a Path object
             html_path = Path(html_path)
+            self.html_path = html_path
+            self.inline_images.clear()
             
             # Create images directory if using external mode
             images_dir = None
@@ -366,67 +457,64 @@ class WordToHTMLConverter:
             # Extract headers and footers
             headers_footers = self.extract_headers_footers(doc)
             
-            # Start building HTML
-            html_parts = [
-                '<!DOCTYPE html>',
-                '<html>',
-                '<head>',
-                '<meta charset="UTF-8">',
-                '<meta name="viewport" content="width=device-width, initial-scale=1.0">',
-                f'<title>{Path(docx_path).stem}</title>',
-                '<style>',
-                'body { font-family: Arial, sans-serif; line-height: 1.6; margin: 40px; }',
-                'table { margin: 20px 0; width: 100%; }',
-                'p { margin: 10px 0; }',
-                'img { margin: 10px 0; display: block; }',
-                self.generate_header_footer_css(),
-                '</style>',
-                '</head>',
-                '<body>',
-            ]
+            # Stream the page to disk element by element
+            with open_html_output(html_path, inline_images=self.inline_images) as html:
+                html.extend([
+                    '<!DOCTYPE html>',
+                    '<html>',
+                    '<head>',
+                    '<meta charset="UTF-8">',
+                    '<meta name="viewport" content="width=device-width, initial-scale=1.0">',
+                    f'<title>{Path(docx_path).stem}</title>',
+                    '<style>',
+                    'body { font-family: Arial, sans-serif; line-height: 1.6; margin: 40px; }',
+                    'table { margin: 20px 0; width: 100%; }',
+                    'p { margin: 10px 0; }',
+                    'img { margin: 10px 0; display: block; }',
+                    self.generate_header_footer_css(),
+                    '</style>',
+                ])
+                if self.css_classes:
+                    # Shared run styles (--css-classes), filled in once the body is written
+                    html.defer(self.run_styles.style_element)
+                html.extend(['</head>', '<body>'])
             
-            # Add header if present and not skipped
-            if headers_footers['headers'] and self.headers_footers != 'skip':
-                html_parts.append('<header class="document-header">')
-                html_parts.extend(headers_footers['headers'])
-                html_parts.append('</header>')
+                # Add header if present and not skipped
+                if headers_footers['headers'] and self.headers_footers != 'skip':
+                    html.write('<header class="document-header">')
+                    html.extend(headers_footers['headers'])
+                    html.write('</header>')
             
-            # Add main content wrapper
-            html_parts.append('<main class="document-content">')
+                # Add main content wrapper
+                html.write('<main class="document-content">')
             
-            # Convert document content
-            for element in doc.element.body:
-                if element.tag.endswith('p'):  # Paragraph
-                    for para in doc.paragraphs:
-                        if para._element == element:
-                            html_parts.append(self.convert_paragraph_to_html(para, html_path, images_dir))
-                            break
-                elif element.tag.endswith('tbl'):  # Table
-                    for table in doc.tables:
-                        if table._element == element:
-                            html_parts.append(self.convert_table_to_html(table))
-                            break
+                # Convert document content in a single pass over the body
+                for block in iter_block_items(doc):
+                    if isinstance(block, Paragraph):
+                        html.write(self.convert_paragraph_to_html(block, html_path, images_dir))
+                    else:
+                        html.write(self.convert_table_to_html(block))
             
-            # Close main content wrapper
-            html_parts.append('</main>')
+                # Close main content wrapper
+                html.write('</main>')
             
-            # Add footer if present and not skipped
-            if headers_footers['footers'] and self.headers_footers != 'skip':
-                html_parts.append('<footer class="document-footer">')
-                html_parts.extend(headers_footers['footers'])
-                html_parts.append('</footer>')
+                # Add footer if present and not skipped
+                if headers_footers['footers'] and self.headers_footers != 'skip':
+                    html.write('<footer class="document-footer">')
+                    html.extend(headers_footers['footers'])
+                    html.write('</footer>')
             
-            html_parts.extend(['</body>', '</html>'])
-            
-            # Write HTML file
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(html_parts))
+                html.extend(['</body>', '</html>'])
             
             return True
             
         except Exception as e:
             self.errors.append(f"Error converting {docx_path}: {str(e)}")
             return False
+        finally:
+            self.inline_images.clear()
+            if self.image_optimizer:
+                self.image_optimizer.close()
 
     def find_word_documents(self, directory):
         """Find all .docx files in directory and subdirectories"""
@@ -453,6 +541,27 @@ class WordToHTMLConverter:
         
         word_files = self.find_word_documents(directory)
         
+        # Incremental mode: skip up-to-date documents and remove outputs of deleted ones
+        manifest = None
+        if self.incremental:
+            manifest = ConversionManifest(
+                directory,
+                {'converter': Path(__file__).stem, 'version': __version__, **self.converter_options()}
+            )
+            total_found = len(word_files)
+            word_files, removed = manifest.plan(word_files)
+            self.skipped_count = total_found - len(word_files)
+            self.removed_count = len(removed)
+            for path in removed:
+                click.echo(f"Removed output of deleted document: {path.relative_to(directory)}")
+            if not word_files:
+                manifest.save()
+                if total_found:
+                    click.echo(f"All {total_found} Word document(s) are up to date.")
+                    return True
+            if self.skipped_count:
+                click.echo(f"Skipping {self.skipped_count} up-to-date document(s).")
+        
         if not word_files:
             click.echo(f"No Word documents (.docx) found in '{directory}' and its subdirectories.")
             return True
@@ -462,20 +571,62 @@ class WordToHTMLConverter:
             click.echo(f"Image handling: {self.image_mode}")
         click.echo(f"Headers/Footers: {self.headers_footers}")
         
-        for docx_path in word_files:
-            html_path = docx_path.with_suffix('.html')
-            
+        if self.jobs > 1:
+            click.echo(f"Parallel workers: {self.jobs}")
+        
+        # Convert each file (on a process pool when jobs > 1); results are reported in order
+        tasks = [
+            (type(self), self.converter_options(), docx_path, docx_path.with_suffix('.html'), self.cache,
+             {'image_cache': self.image_cache, 'assets_dir': self.assets_dir})
+            for docx_path in word_files
+        ]
+        batch = BatchConverter(convert_docx_task, jobs=self.jobs, timeout=self.timeout)
+        
+        for index, (_, _, docx_path, html_path, *_), result in batch.run(tasks):
             click.echo(f"Converting: {docx_path.relative_to(directory)}")
             
-            if self.convert_docx_to_html(docx_path, html_path):
+            if result.get('cache') == 'hit':
+                self.cache_hits += 1
+            elif result.get('cache') == 'miss':
+                self.cache_misses += 1
+            
+            if 'errors' in result:
+                self.errors.extend(result['errors'])
+            else:
+                self.errors.append(f"Error converting {docx_path}: {result['error']}")
+            
+            if manifest is not None:
+                if result['success']:
+                    manifest.record(docx_path, html_path)
+                else:
+                    manifest.forget(docx_path)
+                if index % 500 == 499:
+                    manifest.save()
+            
+            if result['success']:
                 self.converted_count += 1
-                click.echo(f"  ✓ Converted to: {html_path.relative_to(directory)}")
-                if self.image_counter > 0 and self.image_mode != 'skip':
-                    click.echo(f"  📷 Images processed: {self.image_counter}")
+                cached = " (from cache)" if result.get('cache') == 'hit' else ""
+                click.echo(f"  ✓ Converted to: {html_path.relative_to(directory)}{cached}")
+                images_processed = result.get('images_processed', 0)
+                if images_processed > 0 and self.image_mode != 'skip':
+                    click.echo(f"  📷 Images processed: {images_processed}")
+                if result.get('images_deduplicated'):
+                    click.echo(f"  ♻️  Repeated images reused: {result['images_deduplicated']}")
+                self.image_bytes_saved += result.get('image_bytes_saved', 0)
+                self.image_cache_hits += result.get('image_cache_hits', 0)
+                self.image_cache_misses += result.get('image_cache_misses', 0)
+                self.image_cache_bytes_saved += result.get('image_cache_bytes_saved', 0)
+                self.image_source_bytes += result.get('image_source_bytes', 0)
+                self.image_output_bytes += result.get('image_output_bytes', 0)
+                self.assets_written += result.get('assets_written', 0)
+                self.assets_reused += result.get('assets_reused', 0)
             else:
                 self.error_count += 1
                 click.echo(f"  ✗ Failed to convert", err=True)
         
+        if manifest is not None:
+            manifest.save()
+        
         return True
 
 
@@ -485,9 +636,35 @@ class WordToHTMLConverter:
 @click.option('--images', type=click.Choice(['external', 'inline', 'skip']), default='external',
               help='How to handle images: external (separate files), inline (base64), skip (ignore)')
 @click.option('--optimize-images', is_flag=True, help='Optimize images for web (resize and compress)')
+@click.option('--image-format', type=click.Choice(IMAGE_FORMATS), default='jpeg', show_default=True,
+              help='Format of optimized images: jpeg, webp, avif or png, or auto for the smallest per image')
+@click.option('--responsive-images', is_flag=True,
+              help='Give images their dimensions, lazy loading and smaller srcset variants (external images)')
+@click.option('--inline-max-size', type=click.IntRange(min=1), default=None,
+              help='With --images inline, save images larger than this many KB as separate files instead')
+@click.option('--dedupe-images', type=click.Choice(DEDUPE_SCOPES), default='document', show_default=True,
+              help='Store repeated images once per document, or also share files between documents (batch)')
 @click.option('--headers-footers', type=click.Choice(['include', 'skip', 'print-only']), default='include',
               help='How to handle headers and footers: include (show on screen and print), skip (ignore), print-only (only for print)')
-def main(directory, verbose, images, optimize_images, headers_footers):
+@click.option('--jobs', '-j', type=click.IntRange(min=0), default=1, show_default=True,
+              help='Number of parallel worker processes (0 = one per CPU core)')
+@click.option('--timeout', type=click.FloatRange(min=0, min_open=True), default=None,
+              help='Per-file time limit in seconds (default: no limit)')
+@click.option('--cache-dir', type=click.Path(file_okay=False, dir_okay=True), default=None,
+              help='Reuse earlier conversions of unchanged documents from this cache directory')
+@click.option('--cache-size', type=click.IntRange(min=1), default=DEFAULT_CACHE_SIZE // (1024 * 1024),
+              show_default=True, help='Maximum cache size in MB (least recently used entries are evicted)')
+@click.option('--incremental', is_flag=True,
+              help='Only convert new or changed documents and remove outputs of deleted ones')
+@click.option('--css-classes', is_flag=True,
+              help='Write text formatting as shared CSS classes instead of inline styles (smaller files)')
+@click.option('--assets-dir', type=click.Path(file_okay=False, dir_okay=True), default=None,
+              help='Store each distinct image once in this directory and hard-link it into the image folders')
+@click.option('--image-cache-dir', type=click.Path(file_okay=False, dir_okay=True), default=None,
+              help='Keep optimized images in this directory and reuse them across documents and runs')
+@click.option('--image-cache-size', type=click.IntRange(min=1), default=DEFAULT_IMAGE_CACHE_SIZE // (1024 * 1024),
+              show_default=True, help='Maximum image cache size in MB (least recently used images are evicted)')
+def main(directory, verbose, images, optimize_images, image_format, responsive_images, inline_max_size, dedupe_images, headers_footers, jobs, timeout, cache_dir, cache_size, incremental, css_classes, assets_dir, image_cache_dir, image_cache_size):
     """
     Convert Word documents (.docx) to HTML format with full support for images, headers, and footers.
     
@@ -497,10 +674,28 @@ def main(directory, verbose, images, optimize_images, headers_footers):
     click.echo("🔄 GIACONVERT - Complete Word to HTML Converter")
     click.echo("=" * 55)
     
+    cache = ConversionCache(cache_dir, max_bytes=cache_size * 1024 * 1024) if cache_dir else None
+    image_cache = ImageCache(image_cache_dir, max_bytes=image_cache_size * 1024 * 1024) if image_cache_dir else None
+    if image_cache and not optimize_images:
+        click.echo("Note: --image-cache-dir only takes effect with --optimize-images")
+    if image_format != 'jpeg' and not optimize_images:
+        click.echo("Note: --image-format only takes effect with --optimize-images")
+    
     converter = WordToHTMLConverter(
         image_mode=images, 
         optimize_images=optimize_images,
-        headers_footers=headers_footers
+        image_format=image_format,
+        responsive_images=responsive_images,
+        inline_max_size=inline_max_size * 1024 if inline_max_size else None,
+        dedupe_images=dedupe_images,
+        headers_footers=headers_footers,
+        jobs=jobs,
+        timeout=timeout,
+        cache=cache,
+        incremental=incremental,
+        css_classes=css_classes,
+        image_cache=image_cache,
+        assets_dir=assets_dir
     )
     
     success = converter.convert_directory(directory)
@@ -513,6 +708,25 @@ def main(directory, verbose, images, optimize_images, headers_footers):
     click.echo("📊 Conversion Summary:")
     click.echo(f"  ✅ Successfully converted: {converter.converted_count}")
     click.echo(f"  ❌ Failed conversions: {converter.error_count}")
+    if cache:
+        click.echo(f"  💾 Cache hits: {converter.cache_hits}, misses: {converter.cache_misses}")
+    if converter.image_bytes_saved:
+        click.echo(f"  ♻️  Duplicate image bytes saved: {converter.image_bytes_saved}")
+    if converter.image_source_bytes and images != 'skip':
+        saving = 1 - converter.image_output_bytes / converter.image_source_bytes
+        click.echo(f"  🖼️  Image bytes: {converter.image_output_bytes} "
+                   f"(from {converter.image_source_bytes} in the documents, "
+                   f"{abs(saving):.0%} {'smaller' if saving >= 0 else 'larger'})")
+    if converter.asset_store and images == 'external':
+        click.echo(f"  🗃️  Shared assets: {converter.assets_written} written, {converter.assets_reused} reused")
+    image_lookups = converter.image_cache_hits + converter.image_cache_misses
+    if image_cache and image_lookups:
+        click.echo(f"  🖼️  Image cache hits: {converter.image_cache_hits}, misses: {converter.image_cache_misses} "
+                   f"({converter.image_cache_hits / image_lookups:.0%} hit rate, "
+                   f"{converter.image_cache_bytes_saved} image bytes not reprocessed)")
+    if incremental:
+        click.echo(f"  ⏭️  Up to date (skipped): {converter.skipped_count}")
+        click.echo(f"  🧹 Outputs of deleted documents removed: {converter.removed_count}")
     
     if converter.errors and (verbose or converter.error_count > 0):
         click.echo("\n🚨 Errors encountered:")
@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT Word 97 Reader
+Reads Word 97-2003 .doc files (OLE2 compound files) with olefile: text runs,
+paragraph properties, tables, inline pictures, headers and footers.
+"""
+
+import io
+import re
+import struct
+from bisect import bisect_right
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import olefile
+from PIL import Image
+
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+
+# FibBase
+WORD_IDENT = 0xA5EC
+NFIB_WORD97 = 0x00C1
+_F_ENCRYPTED = 0x0100
+_F_WHICH_TBL_STM = 0x0200
+
+# Indexes of the (fc, lcb) pairs in FibRgFcLcb
+_FC_STSHF = 1
+_FC_PLCF_HDD = 11
+_FC_PLCF_BTE_CHPX = 12
+_FC_PLCF_BTE_PAPX = 13
+_FC_STTBF_FFN = 15
+_FC_CLX = 33
+
+# Indexes in FibRgLw
+_LW_CCP_TEXT = 3
+_LW_CCP_FTN = 4
+_LW_CCP_HDD = 5
+
+FKP_SIZE = 512
+
+# Character sprms
+SPRM_C_F_RMARK_DEL = 0x0800
+SPRM_C_F_DATA = 0x0806
+SPRM_C_F_OLE2 = 0x080A
+SPRM_C_F_BOLD = 0x0835
+SPRM_C_F_ITALIC = 0x0836
+SPRM_C_F_SPEC = 0x0855
+SPRM_C_KUL = 0x2A3E
+SPRM_C_ICO = 0x2A42
+SPRM_C_HPS = 0x4A43
+SPRM_C_RG_FTC0 = 0x4A4F
+SPRM_C_PIC_LOCATION = 0x6A03
+SPRM_C_CV = 0x6870
+
+# Paragraph and table sprms
+SPRM_P_JC80 = 0x2403
+SPRM_P_F_IN_TABLE = 0x2416
+SPRM_P_F_TTP = 0x2417
+SPRM_P_F_INNER_TTP = 0x244C
+SPRM_P_JC = 0x2461
+SPRM_P_ITAP = 0x6649
+SPRM_T_DEF_TABLE = 0xD608
+SPRM_T_DEF_TABLE10 = 0xD606
+
+# Operand size by sprm.spra (6 is variable, the first operand byte gives the size)
+_SPRA_SIZES = (1, 1, 2, 4, 2, 2, None, 3)
+
+# sprmCIco palette
+_ICO_COLORS = {
+    1: (0, 0, 0), 2: (0, 0, 255), 3: (0, 255, 255), 4: (0, 255, 0), 5: (255, 0, 255), 6: (255, 0, 0),
+    7: (255, 255, 0), 8: (255, 255, 255), 9: (0, 0, 128), 10: (0, 128, 128), 11: (0, 128, 0),
+    12: (128, 0, 128), 13: (128, 0, 0), 14: (128, 128, 0), 15: (128, 128, 128), 16: (192, 192, 192),
+}
+
+_JUSTIFICATION = {
+    0: WD_PARAGRAPH_ALIGNMENT.LEFT,
+    1: WD_PARAGRAPH_ALIGNMENT.CENTER,
+    2: WD_PARAGRAPH_ALIGNMENT.RIGHT,
+    3: WD_PARAGRAPH_ALIGNMENT.JUSTIFY,
+}
+
+# OfficeArt records of an inline picture
+_OFFICEART_SP_CONTAINER = 0xF004
+_OFFICEART_FBSE = 0xF007
+_FBSE_HEADER_SIZE = 36
+_MM_SHAPEFILE = 0x66
+# BLIP record type -> stored format; metafiles (EMF, WMF, PICT) are not supported
+_BLIP_TYPES = {0xF01D: 'jpeg', 0xF02A: 'jpeg', 0xF01E: 'png', 0xF01F: 'dib', 0xF029: 'tiff'}
+
+# Characters with a meaning beyond their text (tabs are kept as they are)
+_SPECIAL_CHARS = re.compile('[\x00-\x08\x0b-\x1f]')
+_FIELD_BEGIN, _FIELD_SEPARATOR, _FIELD_END = '\x13', '\x14', '\x15'
+
+# Headers and footers: six separator stories, then six stories per section
+_HDD_SEPARATOR_STORIES = 6
+_HDD_STORIES = {'header': 1, 'footer': 3}  # odd-page header and footer
+
+# Formatting read from a run's direct properties, as the .docx converters read `w:rPr`
+CharFormat = namedtuple('CharFormat', 'bold italic underline color size font')
+
+# Properties of special characters (pictures, deleted revisions)
+_CharSpecial = namedtuple('_CharSpecial', 'special picture deleted')
+_NO_SPECIAL = _CharSpecial(False, None, False)
+
+# style name, alignment, in table, table row end
+_ParagraphProperties = namedtuple('_ParagraphProperties', 'style_name alignment in_table row_end')
+
+
+class DocFormatError(ValueError):
+    """A file this reader cannot convert (not Word 97-2003, encrypted or damaged)"""
+
+
+def is_word97_document(path) -> bool:
+    """True if `path` is an OLE2 compound file with a WordDocument stream"""
+    try:
+        if not olefile.isOleFile(str(path)):
+            return False
+        with olefile.OleFileIO(str(path)) as ole:
+            return ole.exists('WordDocument')
+    except OSError:
+        return False
+
+
+def iter_sprms(grpprl: bytes) -> Iterator[Tuple[int, bytes]]:
+    """(sprm, operand) of each Prl in a grpprl"""
+    pos, end = 0, len(grpprl)
+    while pos + 2 <= end:
+        sprm = grpprl[pos] | grpprl[pos + 1] << 8
+        pos += 2
+        if sprm in (SPRM_T_DEF_TABLE, SPRM_T_DEF_TABLE10):
+            if pos + 2 > end:
+                return
+            size = (grpprl[pos] | grpprl[pos + 1] << 8) + 1
+        else:
+            size = _SPRA_SIZES[sprm >> 13]
+            if size is None:
+                if pos >= end:
+                    return
+                size = grpprl[pos] + 1
+        yield sprm, grpprl[pos:pos + size]
+        pos += size
+
+
+def _u16(data: bytes, pos: int) -> int:
+    return struct.unpack_from('<H', data, pos)[0]
+
+
+def _u32(data: bytes, pos: int) -> int:
+    return struct.unpack_from('<I', data, pos)[0]
+
+
+def _dib_to_png(dib: bytes) -> bytes:
+    """A device-independent bitmap (BMP without its file header) as PNG"""
+    header_size, = struct.unpack_from('<I', dib, 0)
+    bit_count, compression = struct.unpack_from('<HI', dib, 14)
+    colors_used, = struct.unpack_from('<I', dib, 32) if header_size >= 36 else (0,)
+    if bit_count <= 8:
+        palette = (colors_used or 1 << bit_count) * 4
+    else:
+        palette = colors_used * 4 + (12 if compression == 3 and header_size == 40 else 0)
+    offset = 14 + header_size + palette
+    bmp = b'BM' + struct.pack('<IHHI', 14 + len(dib), 0, 0, offset) + dib
+    return _to_png(bmp)
+
+
+def _to_png(data: bytes) -> bytes:
+    """Re-encode an image browsers do not display (BMP from a DIB, TIFF) as PNG"""
+    output = io.BytesIO()
+    with Image.open(io.BytesIO(data)) as image:
+        image.save(output, format='PNG')
+    return output.getvalue()
+
+
+class DocPicture:
+    """
+    An inline picture, stored in the Data stream at `offset`.
+
+    Exposes `partname` and `blob` like a python-docx Part, so it can be
+    handed to the image registry; `blob` is None for pictures that cannot
+    be shown (metafiles).
+    """
+
+    _UNREAD = object()
+
+    def __init__(self, reader: 'Word97Reader', offset: int):
+        self.reader = reader
+        self.offset = offset
+        self.partname = f'/Data/{offset}'
+        self._blob = self._UNREAD
+
+    @property
+    def blob(self) -> Optional[bytes]:
+        if self._blob is self._UNREAD:
+            self._blob = self.reader.picture_data(self.offset)
+        return self._blob
+
+
+class DocParagraph:
+    """
+    A paragraph: `runs` holds [text, CharFormat] pairs and DocPicture
+    objects in document order.
+    """
+
+    __slots__ = ('runs', 'style_name', 'alignment', 'in_table', 'row_end', 'cell_end')
+
+    def __init__(self, runs: List, properties: _ParagraphProperties, cell_end: bool):
+        self.runs = runs
+        self.style_name, self.alignment, self.in_table, self.row_end = properties
+        self.cell_end = cell_end
+
+    @property
+    def text(self) -> str:
+        return ''.join(run[0] for run in self.runs if not isinstance(run, DocPicture))
+
+
+class DocTable:
+    """A table: rows of cells, each cell a list of DocParagraphs"""
+
+    __slots__ = ('rows',)
+
+    def __init__(self, rows: List[List[List[DocParagraph]]]):
+        self.rows = rows
+
+
+class Word97Reader:
+    """
+    A Word 97-2003 binary document (MS-DOC), read with olefile.
+
+    The text is walked once through the piece table; character and
+    paragraph properties are looked up in the formatted disk pages (FKPs)
+    as the walk reaches them, and each distinct property set is decoded
+    once. `iter_blocks` hands out paragraphs and tables one at a time, so
+    the converter can write each to the page before the next is read.
+    Formatting is read from the runs' and paragraphs' direct properties,
+    the same properties the .docx converters read, so both formats
+    produce the same HTML.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        try:
+            self.ole = olefile.OleFileIO(str(path))
+        except OSError as e:
+            raise DocFormatError(f"Not an OLE2 compound file: {e}") from e
+        try:
+            self._read()
+        except DocFormatError:
+            self.ole.close()
+            raise
+        except (OSError, struct.error, IndexError, ValueError) as e:
+            self.ole.close()
+            raise DocFormatError(f"Damaged Word document: {e}") from e
+
+    def close(self):
+        self.ole.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _stream(self, name: str) -> bytes:
+        with self.ole.openstream(name) as stream:
+            return stream.read()
+
+    def _read(self):
+        if not self.ole.exists('WordDocument'):
+            raise DocFormatError("No WordDocument stream: not a Word document")
+        self.word = word = self._stream('WordDocument')
+        ident, nfib = struct.unpack_from('<HH', word, 0)
+        if ident != WORD_IDENT:
+            raise DocFormatError("Not a Word document")
+        if nfib < NFIB_WORD97:
+            raise DocFormatError("Word 6/95 documents are not supported")
+        flags = _u16(word, 0x0A)
+        if flags & _F_ENCRYPTED:
+            raise DocFormatError("Encrypted Word documents are not supported")
+
+        table_name = '1Table' if flags & _F_WHICH_TBL_STM else '0Table'
+        if not self.ole.exists(table_name):
+            raise DocFormatError(f"Missing {table_name} stream")
+        self.table = self._stream(table_name)
+        self.data = self._stream('Data') if self.ole.exists('Data') else b''
+
+        # FibRgW is skipped; FibRgLw holds the text lengths, FibRgFcLcb the table stream structures
+        pos = 32
+        pos += 2 + _u16(word, pos) * 2
+        cslw = _u16(word, pos)
+        rglw = struct.unpack_from(f'<{cslw}i', word, pos + 2)
+        pos += 2 + cslw * 4
+        cb_fc_lcb = _u16(word, pos)
+        self._fc_lcb = struct.unpack_from(f'<{cb_fc_lcb * 2}I', word, pos + 2)
+        self.ccp_text = rglw[_LW_CCP_TEXT]
+        self.ccp_ftn = rglw[_LW_CCP_FTN]
+        self.ccp_hdd = rglw[_LW_CCP_HDD]
+
+        self._read_pieces(self._table_bytes(_FC_CLX))
+        self.style_names = self._read_styles(self._table_bytes(_FC_STSHF))
+        self.fonts = self._read_fonts(self._table_bytes(_FC_STTBF_FFN))
+        self._chpx_bins = self._read_bin_table(self._table_bytes(_FC_PLCF_BTE_CHPX))
+        self._papx_bins = self._read_bin_table(self._table_bytes(_FC_PLCF_BTE_PAPX))
+        self._chpx_pages: Dict[int, Tuple[Tuple[int, ...], List[bytes]]] = {}
+        self._papx_pages: Dict[int, Tuple[Tuple[int, ...], List[Tuple[int, bytes]]]] = {}
+        self._char_formats: Dict[bytes, Tuple[CharFormat, _CharSpecial]] = {}
+        self._paragraph_properties: Dict[Tuple[int, bytes], _ParagraphProperties] = {}
+
+    def _table_bytes(self, index: int) -> bytes:
+        """The table stream structure at FibRgFcLcb pair `index` (b'' if absent)"""
+        if 2 * index + 1 >= len(self._fc_lcb):
+            return b''
+        fc, lcb = self._fc_lcb[2 * index], self._fc_lcb[2 * index + 1]
+        return self.table[fc:fc + lcb] if lcb else b''
+
+    # Document structure
+
+    def _read_pieces(self, clx: bytes):
+        """Piece table: (cp start, cp end, fc, compressed) of each run of stored text"""
+        pos = 0
+        while pos < len(clx) and clx[pos] == 0x01:  # Prc, property modifiers of fast-saved files
+            pos += 3 + _u16(clx, pos + 1)
+        if pos >= len(clx) or clx[pos] != 0x02:
+            raise DocFormatError("Missing piece table")
+        lcb = _u32(clx, pos + 1)
+        plc = clx[pos + 5:pos + 5 + lcb]
+        count = (lcb - 4) // 12
+        cps = struct.unpack_from(f'<{count + 1}I', plc, 0)
+        self.pieces = []
+        for i in range(count):
+            fc = _u32(plc, 4 * (count + 1) + 8 * i + 2)
+            compressed = bool(fc & 0x40000000)
+            fc &= 0x3FFFFFFF
+            self.pieces.append((cps[i], cps[i + 1], fc // 2 if compressed else fc, compressed))
+
+    def _read_styles(self, stsh: bytes) -> Dict[int, str]:
+        """Style sheet: istd -> style name; built-in headings get their English names"""
+        names = {}
+        if len(stsh) < 6:
+            return names
+        cb_stshi = _u16(stsh, 0)
+        cstd, cb_base = struct.unpack_from('<HH', stsh, 2)
+        pos = 2 + cb_stshi
+        for istd in range(cstd):
+            if pos + 2 > len(stsh):
+                break
+            cb_std = _u16(stsh, pos)
+            pos += 2
+            if cb_std:
+                std = stsh[pos:pos + cb_std]
+                sti = _u16(std, 0) & 0x0FFF
+                if 1 <= sti <= 9:
+                    names[istd] = f'Heading {sti}'
+                elif len(std) >= cb_base + 2:
+                    cch = _u16(std, cb_base)
+                    names[istd] = std[cb_base + 2:cb_base + 2 + 2 * cch].decode('utf-16-le', 'replace')
+            pos += cb_std
+        return names
+
+    def _read_fonts(self, sttbf: bytes) -> List[str]:
+        """Font table: names by font index"""
+        fonts = []
+        if len(sttbf) < 4:
+            return fonts
+        count = _u16(sttbf, 0)
+        pos = 4
+        for _ in range(count):
+            if pos >= len(sttbf):
+                break
+            cb = sttbf[pos]
+            name = sttbf[pos + 40:pos + 1 + cb].decode('utf-16-le', 'replace')
+            fonts.append(name.split('\x00', 1)[0])
+            pos += 1 + cb
+        return fonts
+
+    @staticmethod
+    def _read_bin_table(plcf: bytes) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        """PlcfBteChpx/PlcfBtePapx: (first fc of each FKP plus the end, FKP page numbers)"""
+        count = (len(plcf) - 4) // 8
+        if count <= 0:
+            return (), ()
+        fcs = struct.unpack_from(f'<{count + 1}I', plcf, 0)
+        pns = tuple(pn & 0x3FFFFF for pn in struct.unpack_from(f'<{count}I', plcf, 4 * (count + 1)))
+        return fcs, pns
+
+    def _fkp(self, pn: int) -> Tuple[bytes, int, Tuple[int, ...]]:
+        """An FKP page: (bytes, crun, rgfc)"""
+        page = self.word[pn * FKP_SIZE:(pn + 1) * FKP_SIZE]
+        crun = page[FKP_SIZE - 1]
+        return page, crun, struct.unpack_from(f'<{crun + 1}I', page, 0)
+
+    def _chpx_page(self, index: int):
+        page_entry = self._chpx_pages.get(index)
+        if page_entry is None:
+            page, crun, rgfc = self._fkp(self._chpx_bins[1][index])
+            grpprls = []
+            for offset in page[4 * (crun + 1):4 * (crun + 1) + crun]:
+                grpprls.append(page[2 * offset + 1:2 * offset + 1 + page[2 * offset]] if offset else b'')
+            if len(self._chpx_pages) >= 64:
+                self._chpx_pages.clear()
+            page_entry = self._chpx_pages[index] = (rgfc, grpprls)
+        return page_entry
+
+    def _papx_page(self, index: int):
+        page_entry = self._papx_pages.get(index)
+        if page_entry is None:
+            page, crun, rgfc = self._fkp(self._papx_bins[1][index])
+            entries = []
+            for i in range(crun):
+                offset = 2 * page[4 * (crun + 1) + 13 * i]
+                cb = page[offset]
+                if cb:
+                    start, size = offset + 1, 2 * cb - 1
+                else:
+                    start, size = offset + 2, 2 * page[offset + 1]
+                papx = page[start:start + size]
+                entries.append((_u16(papx, 0) if len(papx) >= 2 else 0, papx[2:]))
+            if len(self._papx_pages) >= 64:
+                self._papx_pages.clear()
+            page_entry = self._papx_pages[index] = (rgfc, entries)
+        return page_entry
+
+    @staticmethod
+    def _lookup(bins, page_of, fc: int, default):
+        """(end fc of the run containing `fc`, its entry) from FKP bins; end is None past the last run"""
+        fcs, pns = bins
+        i = bisect_right(fcs, fc) - 1
+        if i < 0:
+            return (fcs[0] if fcs else None), default
+        if i >= len(pns):
+            return None, default
+        rgfc, entries = page_of(i)
+        j = bisect_right(rgfc, fc) - 1
+        if j < 0:
+            return rgfc[0], default
+        if j >= len(entries):
+            return (fcs[i + 1] if i + 1 < len(fcs) and fcs[i + 1] > fc else None), default
+        return rgfc[j + 1], entries[j]
+
+    def _char_format(self, grpprl: bytes) -> Tuple[CharFormat, _CharSpecial]:
+        """Formatting and special-character properties of a CHPX, decoded once per distinct CHPX"""
+        cached = self._char_formats.get(grpprl)
+        if cached is not None:
+            return cached
+        bold = italic = underline = special = deleted = data = ole2 = False
+        color = size = font = picture = None
+        for sprm, operand in iter_sprms(grpprl):
+            if not operand:
+                continue
+            if sprm == SPRM_C_F_BOLD:
+                bold = operand[0] in (1, 0x81)
+            elif sprm == SPRM_C_F_ITALIC:
+                italic = operand[0] in (1, 0x81)
+            elif sprm == SPRM_C_KUL:
+                underline = operand[0] != 0
+            elif sprm == SPRM_C_HPS and len(operand) == 2:
+                size = _u16(operand, 0) / 2
+            elif sprm == SPRM_C_ICO:
+                color = _ICO_COLORS.get(operand[0])
+            elif sprm == SPRM_C_CV and len(operand) == 4:
+                color = None if operand[3] == 0xFF else tuple(operand[:3])
+            elif sprm == SPRM_C_RG_FTC0 and len(operand) == 2:
+                index = _u16(operand, 0)
+                font = self.fonts[index] if index < len(self.fonts) else None
+            elif sprm == SPRM_C_F_SPEC:
+                special = operand[0] == 1
+            elif sprm == SPRM_C_PIC_LOCATION and len(operand) == 4:
+                picture = _u32(operand, 0)
+            elif sprm == SPRM_C_F_DATA:
+                data = operand[0] == 1
+            elif sprm == SPRM_C_F_OLE2:
+                ole2 = operand[0] == 1
+            elif sprm == SPRM_C_F_RMARK_DEL:
+                deleted = operand[0] == 1
+        if data or ole2:
+            picture = None  # form field data or an embedded object, not a picture
+        cached = self._char_formats[grpprl] = (
+            CharFormat(bold, italic, underline, color, size, font),
+            _CharSpecial(special, picture, deleted) if special or deleted else _NO_SPECIAL,
+        )
+        return cached
+
+    def _paragraph_properties_at(self, fc: int) -> _ParagraphProperties:
+        """Properties of the paragraph whose mark is at `fc`"""
+        _, (istd, grpprl) = self._lookup(self._papx_bins, self._papx_page, fc, (0, b''))
+        key = (istd, grpprl)
+        cached = self._paragraph_properties.get(key)
+        if cached is not None:
+            return cached
+        alignment = None
+        in_table = row_end = False
+        depth = 1
+        for sprm, operand in iter_sprms(grpprl):
+            if not operand:
+                continue
+            if sprm in (SPRM_P_JC80, SPRM_P_JC):
+                alignment = _JUSTIFICATION.get(operand[0])
+            elif sprm == SPRM_P_F_IN_TABLE:
+                in_table = operand[0] == 1
+            elif sprm == SPRM_P_F_TTP:
+                row_end = operand[0] == 1
+            elif sprm == SPRM_P_ITAP and len(operand) == 4:
+                depth = _u32(operand, 0)
+            elif sprm == SPRM_P_F_INNER_TTP:
+                row_end = row_end or operand[0] == 1
+        if depth > 1:
+            # Nested tables are flattened into the cell of the outer table that contains them
+            in_table, row_end = True, False
+        cached = self._paragraph_properties[key] = _ParagraphProperties(
+            self.style_names.get(istd, 'Normal'), alignment, in_table, row_end
+        )
+        return cached
+
+    def _paragraph_ends_after(self, fc: int, step: int) -> bool:
+        """True if a paragraph run ends right after the character at `fc` (section marks)"""
+        end, _ = self._lookup(self._papx_bins, self._papx_page, fc, None)
+        return end == fc + step
+
+    # Text
+
+    def _iter_text(self, cp_start: int, cp_end: int) -> Iterator[Tuple[str, int, int]]:
+        """(text, fc of its first character, bytes per character) for the pieces in a CP range"""
+        for piece_start, piece_end, fc, compressed in self.pieces:
+            start, end = max(cp_start, piece_start), min(cp_end, piece_end)
+            if start >= end:
+                continue
+            step = 1 if compressed else 2
+            fc_start = fc + (start - piece_start) * step
+            raw = self.word[fc_start:fc_start + (end - start) * step]
+            yield raw.decode('cp1252' if compressed else 'utf-16-le', 'replace'), fc_start, step
+
+    def iter_paragraphs(self, cp_start: int, cp_end: int) -> Iterator[DocParagraph]:
+        """Paragraphs of a CP range, with field codes hidden behind their results"""
+        runs: List = []
+        fields: List[bool] = []  # open fields, True once their result is reached
+
+        def add_text(text: str, fmt: CharFormat):
+            if runs and not isinstance(runs[-1], DocPicture) and runs[-1][1] == fmt:
+                runs[-1][0] += text
+            else:
+                runs.append([text, fmt])
+
+        for text, fc, step in self._iter_text(cp_start, cp_end):
+            i = 0
+            while i < len(text):
+                run_fc = fc + i * step
+                end_fc, grpprl = self._lookup(self._chpx_bins, self._chpx_page, run_fc, b'')
+                count = len(text) - i if end_fc is None else max(1, (end_fc - run_fc) // step)
+                chunk = text[i:i + count]
+                fmt, special = self._char_format(grpprl)
+                pos = 0
+                for match in _SPECIAL_CHARS.finditer(chunk):
+                    if match.start() > pos and all(fields) and not special.deleted:
+                        add_text(chunk[pos:match.start()], fmt)
+                    pos = match.end()
+                    char = match.group()
+                    if char == _FIELD_BEGIN:
+                        fields.append(False)
+                    elif char == _FIELD_SEPARATOR:
+                        if fields:
+                            fields[-1] = True
+                    elif char == _FIELD_END:
+                        if fields:
+                            fields.pop()
+                    elif char in '\r\x07' or (char == '\x0c' and self._paragraph_ends_after(
+                            run_fc + match.start() * step, step)):
+                        mark_fc = run_fc + match.start() * step
+                        yield DocParagraph(runs, self._paragraph_properties_at(mark_fc), char == '\x07')
+                        runs = []
+                    elif not all(fields) or special.deleted:
+                        continue
+                    elif char == '\x0b':
+                        add_text('\n', fmt)
+                    elif char == '\x1e':
+                        add_text('-', fmt)
+                    elif char == '\x01' and special.special and special.picture is not None:
+                        runs.append(DocPicture(self, special.picture))
+                if pos < len(chunk) and all(fields) and not special.deleted:
+                    add_text(chunk[pos:], fmt)
+                i += len(chunk)
+
+        if runs:
+            yield DocParagraph(runs, _ParagraphProperties('Normal', None, False, False), False)
+
+    def iter_blocks(self, cp_start: int = 0, cp_end: Optional[int] = None) -> Iterator:
+        """DocParagraphs and DocTables of a CP range (the main document by default), in order"""
+        if cp_end is None:
+            cp_end = self.ccp_text
+        rows, row, cell = [], [], []
+        for paragraph in self.iter_paragraphs(cp_start, cp_end):
+            if not paragraph.in_table:
+                if cell:
+                    row.append(cell)
+                if row:
+                    rows.append(row)
+                if rows:
+                    yield DocTable(rows)
+                    rows, row, cell = [], [], []
+                yield paragraph
+            elif paragraph.row_end:
+                # The row end mark holds the row's properties, not content
+                if cell:
+                    row.append(cell)
+                rows.append(row)
+                row, cell = [], []
+            else:
+                cell.append(paragraph)
+                if paragraph.cell_end:
+                    row.append(cell)
+                    cell = []
+        if cell:
+            row.append(cell)
+        if row:
+            rows.append(row)
+        if rows:
+            yield DocTable(rows)
+
+    def header_footer_paragraphs(self, kind: str) -> Iterator[List[DocParagraph]]:
+        """
+        Paragraphs of the header or footer (`kind`) of each section. A
+        section without its own uses the previous section's, as in Word.
+        """
+        plcf = self._table_bytes(_FC_PLCF_HDD)
+        if not self.ccp_hdd or len(plcf) < 8:
+            return
+        cps = struct.unpack_from(f'<{len(plcf) // 4}I', plcf, 0)
+        base = self.ccp_text + self.ccp_ftn
+        sections = (len(cps) - 1 - _HDD_SEPARATOR_STORIES) // 6
+        story = None
+        for section in range(sections):
+            index = _HDD_SEPARATOR_STORIES + 6 * section + _HDD_STORIES[kind]
+            if cps[index + 1] > cps[index]:
+                story = (base + cps[index], base + cps[index + 1])
+            if story is not None:
+                yield list(self.iter_paragraphs(*story))
+
+    # Pictures
+
+    def picture_data(self, offset: int) -> Optional[bytes]:
+        """
+        Image bytes of the picture whose PICF is at `offset` in the Data
+        stream: the BLIP of its OfficeArt container, as PNG or JPEG. None
+        for metafiles and anything unreadable.
+        """
+        data = self.data
+        try:
+            lcb, cb_header = struct.unpack_from('<IH', data, offset)
+            mm = struct.unpack_from('<h', data, offset + 6)[0]
+            pos, end = offset + cb_header, min(offset + lcb, len(data))
+            if mm == _MM_SHAPEFILE:
+                pos += 1 + data[pos]
+            while pos + 8 <= end:
+                ver_instance, rec_type, rec_len = struct.unpack_from('<HHI', data, pos)
+                if rec_type == _OFFICEART_FBSE:
+                    cb_name = data[pos + 8 + 33]
+                    image = self._blip_image(pos + 8 + _FBSE_HEADER_SIZE + cb_name)
+                    if image is not None:
+                        return image
+                elif rec_type in _BLIP_TYPES:
+                    return self._blip_image(pos)
+                elif rec_type != _OFFICEART_SP_CONTAINER:
+                    break
+                pos += 8 + rec_len
+        except (struct.error, IndexError, OSError, ValueError):
+            pass
+        return None
+
+    def _blip_image(self, pos: int) -> Optional[bytes]:
+        """Image bytes of the OfficeArt BLIP record at `pos` in the Data stream"""
+        ver_instance, rec_type, rec_len = struct.unpack_from('<HHI', self.data, pos)
+        kind = _BLIP_TYPES.get(rec_type)
+        if kind is None:
+            return None
+        # One or two 16-byte UIDs (odd instances have two), then a tag byte
+        header = 33 if (ver_instance >> 4) & 1 else 17
+        blob = self.data[pos + 8 + header:pos + 8 + rec_len]
+        if kind == 'dib':
+            return _dib_to_png(blob)
+        if kind == 'tiff':
+            return _to_png(blob)
+        return blob
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT Fast .docx Reader
+Reads a .docx package straight from the zip with lxml, without python-docx proxies.
+"""
+
+import io
+import posixpath
+import zipfile
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from lxml import etree
+
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT, WD_UNDERLINE
+from docx.opc.constants import RELATIONSHIP_TARGET_MODE as RTM
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+from docx.oxml.simpletypes import ST_HpsMeasure, ST_OnOff
+from docx.shared import RGBColor
+from docx.styles import BabelFish
+
+W_BODY = qn('w:body')
+W_P = qn('w:p')
+W_TBL = qn('w:tbl')
+W_R = qn('w:r')
+W_HYPERLINK = qn('w:hyperlink')
+W_PPR = qn('w:pPr')
+W_RPR = qn('w:rPr')
+W_SECTPR = qn('w:sectPr')
+W_TR = qn('w:tr')
+W_TC = qn('w:tc')
+W_DRAWING = qn('w:drawing')
+W_VAL = qn('w:val')
+W_TYPE = qn('w:type')
+
+_PACKAGE_RELS = '_rels/.rels'
+_REL_TAG = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+
+# Same parser settings python-docx uses, so whitespace-only text is treated alike
+_PARSER_OPTIONS = {'remove_blank_text': True, 'resolve_entities': False}
+_PARSER = etree.XMLParser(**_PARSER_OPTIONS)
+
+# Run content elements with a text equivalent (w:t and w:br are handled separately)
+_RUN_TEXT = {qn('w:tab'): '\t', qn('w:ptab'): '\t', qn('w:cr'): '\n', qn('w:noBreakHyphen'): '-'}
+_W_T = qn('w:t')
+_W_BR = qn('w:br')
+
+
+class PackagePart:
+    """
+    One part of the package, read from the zip on first use.
+
+    Exposes `partname` and `blob` like a python-docx Part, so it can be
+    handed to the image registry. `open` and `size` give access to the
+    bytes without reading them all, for images copied unchanged.
+    """
+
+    def __init__(self, package: 'FastDocxReader', partname: str):
+        self.package = package
+        self.partname = partname
+        self._blob: Optional[bytes] = None
+        self._root = None
+        self._rels: Optional[Dict[str, Tuple[str, bool, str]]] = None
+
+    @property
+    def blob(self) -> bytes:
+        if self._blob is None:
+            self._blob = self.package.read(self.partname)
+        return self._blob
+
+    def open(self) -> IO[bytes]:
+        """Stream the part's bytes, decompressed from the zip as they are read"""
+        if self._blob is not None:
+            return io.BytesIO(self._blob)
+        return self.package.zip.open(self.partname.lstrip('/'))
+
+    @property
+    def size(self) -> int:
+        """Size of the part's bytes (uncompressed)"""
+        if self._blob is not None:
+            return len(self._blob)
+        return self.package.zip.getinfo(self.partname.lstrip('/')).file_size
+
+    @property
+    def root(self):
+        """Parsed XML of the part (headers, footers, styles)"""
+        if self._root is None:
+            self._root = etree.fromstring(self.blob, _PARSER)
+        return self._root
+
+    @property
+    def rels(self) -> Dict[str, Tuple[str, bool, str]]:
+        """Relationship id -> (target partname or URL, is external, relationship type)"""
+        if self._rels is None:
+            directory, name = posixpath.split(self.partname)
+            self._rels = self.package.read_rels(f'{directory}/_rels/{name}.rels', directory)
+        return self._rels
+
+    def related(self, rel_id: str) -> 'PackagePart':
+        """Part behind relationship `rel_id`; KeyError if there is none"""
+        target, external, _ = self.rels[rel_id]
+        if external:
+            raise ValueError("target_part property on _Relationship is undefined when target mode is External")
+        return self.package.part(target)
+
+    def related_by_type(self, reltype: str) -> Optional['PackagePart']:
+        """First internal part related by `reltype`, or None"""
+        return self.package.related_by_type(self.rels, reltype)
+
+
+class FastDocxReader:
+    """
+    A .docx package read directly with lxml.
+
+    The main document is streamed with `iterparse`, so body elements are
+    handed out one at a time and freed once converted; styles and
+    relationships are read once per document. Property lookups mirror the
+    python-docx semantics the converters rely on, so both engines produce
+    the same HTML.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.zip = zipfile.ZipFile(self.path)
+        self._parts: Dict[str, PackagePart] = {}
+        self._sections: Optional[List[Dict[str, Optional[str]]]] = None
+
+        self.document = self.related_by_type(self.read_rels(_PACKAGE_RELS, '/'), RT.OFFICE_DOCUMENT)
+        if self.document is None:
+            raise ValueError(f"file '{self.path}' is not a Word file")
+
+        self._styles: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        self._default_style: Optional[str] = None
+        self._style_names: Dict[Optional[str], Optional[str]] = {}
+        self._read_styles()
+
+    def close(self):
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def read(self, partname: str) -> bytes:
+        return self.zip.read(partname.lstrip('/'))
+
+    def part(self, partname: str) -> PackagePart:
+        part = self._parts.get(partname)
+        if part is None:
+            part = self._parts[partname] = PackagePart(self, partname)
+        return part
+
+    def related_by_type(self, rels: Dict[str, Tuple[str, bool, str]], reltype: str) -> Optional[PackagePart]:
+        """First internal part in `rels` with relationship type `reltype`, or None"""
+        for target, external, rel_type in rels.values():
+            if not external and rel_type == reltype:
+                return self.part(target)
+        return None
+
+    def read_rels(self, rels_name: str, base: str) -> Dict[str, Tuple[str, bool, str]]:
+        """Relationships in `rels_name`, with internal targets resolved against `base`"""
+        try:
+            root = etree.fromstring(self.zip.read(rels_name.lstrip('/')), _PARSER)
+        except KeyError:
+            return {}
+        rels = {}
+        for rel in root.iterchildren(_REL_TAG):
+            rel_id, target = rel.get('Id'), rel.get('Target')
+            external = rel.get('TargetMode') == RTM.EXTERNAL
+            if not external:
+                target = posixpath.abspath(posixpath.join(base, target))
+            rels[rel_id] = (target, external, rel.get('Type'))
+        return rels
+
+    # Styles
+
+    def _read_styles(self):
+        styles_part = self.document.related_by_type(RT.STYLES)
+        if styles_part is None:
+            # python-docx substitutes its default template, whose default paragraph style is Normal
+            self._default_style = 'Normal'
+            return
+        for style in styles_part.root.iterchildren(qn('w:style')):
+            style_type = style.get(W_TYPE)
+            name_element = style.find(qn('w:name'))
+            name = name_element.get(W_VAL) if name_element is not None else None
+            name = BabelFish.internal2ui(name) if name is not None else None
+            self._styles.setdefault(style.get(qn('w:styleId')), (style_type, name))
+            default = style.get(qn('w:default'))
+            if style_type == 'paragraph' and default is not None and ST_OnOff.convert_from_xml(default):
+                self._default_style = name
+
+    def paragraph_style_name(self, p) -> str:
+        """UI name of the paragraph's style, falling back to the default paragraph style"""
+        pPr = p.find(W_PPR)
+        pStyle = pPr.find(qn('w:pStyle')) if pPr is not None else None
+        style_id = pStyle.get(W_VAL) if pStyle is not None else None
+        try:
+            name = self._style_names[style_id]
+        except KeyError:
+            style_type, name = self._styles.get(style_id, (None, None)) if style_id is not None else (None, None)
+            if style_type != 'paragraph':
+                name = self._default_style
+            self._style_names[style_id] = name
+        if name is None:
+            raise AttributeError("'NoneType' object has no attribute 'name'")
+        return name
+
+    # Body
+
+    def iter_body_blocks(self) -> Iterator:
+        """
+        Yield the `w:p` and `w:tbl` children of the body in document order.
+
+        Each element is cleared, with everything before it, once the caller
+        moves on, so memory stays flat however long the document is.
+        """
+        with self.zip.open(self.document.partname.lstrip('/')) as stream:
+            for _, element in etree.iterparse(stream, events=('end',), tag=(W_P, W_TBL), **_PARSER_OPTIONS):
+                parent = element.getparent()
+                if parent is None or parent.tag != W_BODY:
+                    continue
+                yield element
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+
+    # Sections
+
+    def _read_sections(self) -> List[Dict[str, Optional[str]]]:
+        """Default header/footer relationship ids of each section, in document order"""
+        sections = []
+        with self.zip.open(self.document.partname.lstrip('/')) as stream:
+            for _, element in etree.iterparse(stream, events=('end',), tag=(W_SECTPR, W_P, W_TBL), **_PARSER_OPTIONS):
+                parent = element.getparent()
+                if element.tag == W_SECTPR:
+                    if _is_body_section(element):
+                        sections.append({
+                            kind: _default_reference(element, qn(f'w:{kind}Reference'))
+                            for kind in ('header', 'footer')
+                        })
+                elif parent is not None and parent.tag == W_BODY:
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del parent[0]
+        return sections
+
+    def header_footer_parts(self, kind: str) -> Iterator[Optional[PackagePart]]:
+        """
+        Header or footer part of each section ('header' or 'footer').
+
+        A section without its own definition inherits the previous one; the
+        first section without one has none (yields None).
+        """
+        if self._sections is None:
+            self._sections = self._read_sections()
+        prior = None
+        for section in self._sections:
+            rel_id = section[kind]
+            part = self.document.related(rel_id) if rel_id is not None else prior
+            prior = part
+            yield part
+
+
+def _is_body_section(sectPr) -> bool:
+    """True for `w:body/w:sectPr` and `w:body/w:p/w:pPr/w:sectPr`"""
+    parent = sectPr.getparent()
+    if parent is None:
+        return False
+    if parent.tag == W_BODY:
+        return True
+    if parent.tag != W_PPR:
+        return False
+    p = parent.getparent()
+    return p is not None and p.tag == W_P and p.getparent() is not None and p.getparent().tag == W_BODY
+
+
+def _default_reference(sectPr, tag: str) -> Optional[str]:
+    for reference in sectPr.iterchildren(tag):
+        if reference.get(W_TYPE) == 'default':
+            return reference.get(qn('r:id'))
+    return None
+
+
+# Runs and paragraphs
+
+def run_properties(r):
+    """The `w:rPr` element of a `w:r` element, or None"""
+    return r.find(W_RPR)
+
+
+def run_text(r) -> str:
+    """Text of a `w:r`, with tabs, breaks and hyphens translated like python-docx"""
+    parts = []
+    for child in r:
+        tag = child.tag
+        if tag == _W_T:
+            parts.append(child.text or '')
+        elif tag == _W_BR:
+            if child.get(W_TYPE, 'textWrapping') == 'textWrapping':
+                parts.append('\n')
+        else:
+            text = _RUN_TEXT.get(tag)
+            if text:
+                parts.append(text)
+    return ''.join(parts)
+
+
+def paragraph_text(p) -> str:
+    """Text of the runs of a `w:p`, including runs inside hyperlinks"""
+    parts = []
+    for child in p:
+        if child.tag == W_R:
+            parts.append(run_text(child))
+        elif child.tag == W_HYPERLINK:
+            parts.extend(run_text(r) for r in child.iterchildren(W_R))
+    return ''.join(parts)
+
+
+def paragraph_alignment(p) -> Optional[WD_PARAGRAPH_ALIGNMENT]:
+    pPr = p.find(W_PPR)
+    jc = pPr.find(qn('w:jc')) if pPr is not None else None
+    if jc is None:
+        return None
+    return WD_PARAGRAPH_ALIGNMENT.from_xml(jc.get(W_VAL))
+
+
+def _on_off(rPr, tag: str) -> Optional[bool]:
+    element = rPr.find(tag)
+    if element is None:
+        return None
+    value = element.get(W_VAL)
+    return True if value is None else ST_OnOff.convert_from_xml(value)
+
+
+def run_format(rPr) -> Dict[str, object]:
+    """
+    Direct formatting of a run from its `w:rPr`: bold, italic, underline,
+    color (RGBColor or None), size (Length or None) and font name.
+    """
+    if rPr is None:
+        return {'bold': None, 'italic': None, 'underline': None, 'color': None, 'size': None, 'font': None}
+
+    underline = None
+    u = rPr.find(qn('w:u'))
+    if u is not None and u.get(W_VAL) is not None:
+        value = WD_UNDERLINE.from_xml(u.get(W_VAL))
+        underline = True if value == WD_UNDERLINE.SINGLE else False if value == WD_UNDERLINE.NONE else value
+
+    color = None
+    color_element = rPr.find(qn('w:color'))
+    if color_element is not None and color_element.get(W_VAL) != 'auto':
+        color = RGBColor.from_string(color_element.get(W_VAL))
+
+    size = None
+    sz = rPr.find(qn('w:sz'))
+    if sz is not None:
+        size = ST_HpsMeasure.convert_from_xml(sz.get(W_VAL))
+
+    rFonts = rPr.find(qn('w:rFonts'))
+    return {
+        'bold': _on_off(rPr, qn('w:b')),
+        'italic': _on_off(rPr, qn('w:i')),
+        'underline': underline,
+        'color': color,
+        'size': size,
+        'font': rFonts.get(qn('w:ascii')) if rFonts is not None else None,
+    }
+
+
+# Tables
+
+def _tc_property(tc, tag: str):
+    tcPr = tc.find(qn('w:tcPr'))
+    return tcPr.find(tag) if tcPr is not None else None
+
+
+def _grid_span(tc) -> int:
+    gridSpan = _tc_property(tc, qn('w:gridSpan'))
+    return int(gridSpan.get(W_VAL)) if gridSpan is not None else 1
+
+
+def _v_merge(tc) -> Optional[str]:
+    vMerge = _tc_property(tc, qn('w:vMerge'))
+    return vMerge.get(W_VAL, 'continue') if vMerge is not None else None
+
+
+def _grid_before(tr) -> int:
+    trPr = tr.find(qn('w:trPr'))
+    gridBefore = trPr.find(qn('w:gridBefore')) if trPr is not None else None
+    return int(gridBefore.get(W_VAL)) if gridBefore is not None else 0
+
+
+def _grid_offset(tc) -> int:
+    return _grid_before(tc.getparent()) + sum(_grid_span(cell) for cell in tc.itersiblings(W_TC, preceding=True))
+
+
+def _tc_at_grid_offset(tr, grid_offset: int):
+    remaining = grid_offset - _grid_before(tr)
+    for tc in tr.iterchildren(W_TC):
+        if remaining < 0:
+            break
+        if remaining == 0:
+            return tc
+        remaining -= _grid_span(tc)
+    raise ValueError(f"no `tc` element at grid_offset={grid_offset}")
+
+
+def iter_table_rows(tbl) -> Iterator[List]:
+    """
+    `w:tc` elements of each row, as python-docx `_Row.cells` lists them:
+    a cell spanning columns repeats once per column, and a vertically merged
+    cell resolves to the cell that starts the merge.
+    """
+    rows = list(tbl.iterchildren(W_TR))
+    for index, tr in enumerate(rows):
+        cells = []
+        for tc in tr.iterchildren(W_TC):
+            row = index
+            while _v_merge(tc) == 'continue':
+                if row == 0:
+                    raise ValueError("no tr above topmost tr in w:tbl")
+                row -= 1
+                tc = _tc_at_grid_offset(rows[row], _grid_offset(tc))
+            cells.extend([tc] * _grid_span(tc))
+        yield cells
@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT Image Registry
+Deduplicates images during extraction so each unique image is stored once,
+and optimizes them on a thread pool while the document is converted.
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+from PIL import Image, features
+
+from giaconvert_writer import open_atomic
+
+DEDUPE_SCOPES = ('document', 'batch')
+
+# Upper bound on images remembered across documents by the batch registry
+BATCH_REGISTRY_SIZE = 10000
+
+R_EMBED = qn('r:embed')
+W_P, W_R, W_DRAWING = qn('w:p'), qn('w:r'), qn('w:drawing')
+
+# Chunk size for hashing and copying image parts that are streamed rather than read whole
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Leading bytes that identify an image format
+IMAGE_HEADER_SIZE = 16
+
+# Threads optimizing images (Pillow releases the GIL while decoding, resizing and encoding)
+MAX_IMAGE_THREADS = 4
+
+# Images optimized ahead of the walk, per thread: results wait in memory until the walk takes them
+IMAGE_PREFETCH_PER_THREAD = 2
+
+# Output formats of image optimisation: 'jpeg' flattens everything to JPEG, 'webp', 'avif'
+# and 'png' force that format (keeping transparency), 'auto' keeps the smallest acceptable encoding
+IMAGE_FORMATS = ('jpeg', 'webp', 'avif', 'png', 'auto')
+
+# What image optimisation produces by default: bounding box, lossy quality and format
+OPTIMIZE_MAX_WIDTH = 1200
+OPTIMIZE_MAX_HEIGHT = 800
+OPTIMIZE_QUALITY = 85
+OPTIMIZE_FORMAT = 'jpeg'
+
+# Images with at most this many colours are flat graphics (screenshots, diagrams, line art):
+# they are stored losslessly, as a palette PNG or lossless WebP
+FLAT_MAX_COLORS = 256
+
+# Formats a browser shows as they are, so 'auto' may keep an image that needs no resizing
+WEB_FORMATS = ('PNG', 'JPEG', 'GIF', 'WEBP')
+
+# Widths of the narrower copies written for srcset by responsive output, and the
+# formats they are made for (GIFs may be animated, BMPs are left as they are)
+RESPONSIVE_WIDTHS = (480, 960)
+RESPONSIVE_FORMATS = {'JPEG': 'jpeg', 'PNG': 'png', 'WEBP': 'webp', 'AVIF': 'avif'}
+
+
+def avif_supported() -> bool:
+    """Whether this Pillow build can write AVIF ('avif' falls back to WebP without it)"""
+    try:
+        return bool(features.check('avif'))
+    except Exception:
+        return False
+
+
+def iter_image_rel_ids(element):
+    """Relationship ids of all embedded pictures (a:blip r:embed) below `element`"""
+    for blip in element.iter(qn('a:blip')):
+        rel_id = blip.get(R_EMBED)
+        if rel_id:
+            yield rel_id
+
+
+def get_image_part(paragraph, rel_id):
+    """
+    Image part behind relationship `rel_id` of `paragraph`, or None.
+
+    Relationships are looked up on the part that owns the paragraph, so
+    pictures in headers and footers resolve against their own part.
+    """
+    try:
+        return paragraph.part.rels[rel_id].target_part
+    except (KeyError, AttributeError):
+        return None
+
+
+def iter_body_image_parts(doc) -> Iterator:
+    """
+    Image parts of the pictures in the body's top-level paragraphs, in document order.
+
+    These are the pictures ImageOptimizer optimizes ahead of the converters'
+    walk, in the order it reaches them. Pictures in table cells, headers and
+    footers are converted as well, but not prefetched: they are optimized
+    when the walk reaches them.
+    """
+    rels = doc.part.rels
+    for p in doc.element.body.iterchildren(W_P):
+        for r in p.iterchildren(W_R):
+            for drawing in r.iter(W_DRAWING):
+                for rel_id in iter_image_rel_ids(drawing):
+                    rel = rels.get(rel_id)
+                    if rel is not None and rel.reltype == RT.IMAGE and not rel.is_external:
+                        yield rel.target_part
+
+
+def optimize_image(image_data: bytes, max_width: int = OPTIMIZE_MAX_WIDTH, max_height: int = OPTIMIZE_MAX_HEIGHT,
+                   quality: int = OPTIMIZE_QUALITY, output_format: str = OPTIMIZE_FORMAT) -> bytes:
+    """
+    Re-encode an image so that it fits in max_width x max_height.
+
+    `output_format` is one of IMAGE_FORMATS. Large JPEGs are decoded at a
+    reduced scale (Pillow's draft mode) close to the target size before the
+    final LANCZOS resize, which skips most of the decoding work. Returns the
+    original bytes when the image cannot be read.
+    """
+    if output_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format: {output_format}")
+    try:
+        img = Image.open(io.BytesIO(image_data))
+        source_format = img.format
+        
+        # Let the JPEG decoder downscale by 1/2, 1/4 or 1/8 while staying above the final size
+        scale = min(max_width / img.width, max_height / img.height)
+        if scale < 1:
+            img.draft('RGB', (max(1, int(img.width * scale)), max(1, int(img.height * scale))))
+        
+        if output_format == 'jpeg':
+            # Convert to RGB if necessary (for JPEG output)
+            if img.mode in ('RGBA', 'P'):
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+                img = background
+        else:
+            # Keep transparency for the formats that have it
+            has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+            img = img.convert('RGBA' if has_alpha else 'RGB')
+        
+        # Resize if too large
+        resized = img.width > max_width or img.height > max_height
+        if resized:
+            img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+        
+        if output_format == 'jpeg':
+            return _encode(img, 'jpeg', quality)
+        
+        flat = img.getcolors(FLAT_MAX_COLORS) is not None
+        if output_format == 'auto':
+            candidates = ['png', 'webp'] if flat else ['webp', 'avif', 'jpeg']
+        else:
+            candidates = [output_format]
+        encoded = []
+        for fmt in candidates:
+            if fmt == 'avif' and not avif_supported():
+                fmt = 'webp'
+            if fmt == 'jpeg' and img.mode == 'RGBA':
+                continue
+            try:
+                encoded.append(_encode(img, fmt, quality, lossless=flat))
+            except Exception:
+                continue
+        # An image already small enough and in a web format may be smallest as it is
+        if output_format == 'auto' and not resized and source_format in WEB_FORMATS:
+            encoded.append(image_data)
+        return min(encoded, key=len) if encoded else image_data
+        
+    except Exception:
+        # If optimization fails, return original
+        return image_data
+
+
+def _encode(img: Image.Image, output_format: str, quality: int, lossless: bool = False) -> bytes:
+    """Encode `img` in one output format; flat graphics become a palette PNG or lossless WebP"""
+    output = io.BytesIO()
+    if output_format == 'jpeg':
+        img.save(output, format='JPEG', quality=quality, optimize=True)
+    elif output_format == 'webp':
+        img.save(output, format='WEBP', quality=quality, lossless=lossless, method=4)
+    elif output_format == 'avif':
+        img.save(output, format='AVIF', quality=quality)
+    elif lossless:
+        # At most FLAT_MAX_COLORS colours: an exact palette, one byte per pixel or less
+        img.quantize(FLAT_MAX_COLORS, method=Image.Quantize.FASTOCTREE if img.mode == 'RGBA'
+                     else Image.Quantize.MEDIANCUT).save(output, format='PNG', optimize=True)
+    else:
+        img.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+def image_size(image_data: bytes) -> Optional[Tuple[int, int]]:
+    """Width and height of an image in pixels, read from its header, or None"""
+    try:
+        return Image.open(io.BytesIO(image_data)).size
+    except Exception:
+        return None
+
+
+def image_variants(image_data: bytes, widths=RESPONSIVE_WIDTHS,
+                   quality: int = OPTIMIZE_QUALITY) -> List[Tuple[int, bytes]]:
+    """Copies of an image scaled down to each of `widths` narrower than it, in the image's own format"""
+    try:
+        img = Image.open(io.BytesIO(image_data))
+        output_format = RESPONSIVE_FORMATS.get(img.format)
+        widths = [width for width in widths if width < img.width]
+        if output_format is None or not widths:
+            return []
+        has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+        img.draft('RGB', (widths[-1], max(1, img.height * widths[-1] // img.width)))
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+        variants = []
+        for width in widths:
+            height = max(1, round(img.height * width / img.width))
+            variant = img.resize((width, height), Image.Resampling.LANCZOS)
+            variants.append((width, _encode(variant, output_format, quality)))
+        return variants
+    except Exception:
+        return []
+
+
+def responsive_attributes(image_data: bytes, path: Optional[Path] = None, src: Optional[str] = None) -> str:
+    """
+    Extra <img> attributes for responsive output, with a leading space.
+
+    Gives the intrinsic width and height (so the page does not shift while
+    images load), lazy loading and async decoding. For an image saved at
+    `path` and linked as `src`, narrower copies are written next to it
+    (image_001-480w.jpg, ...) and offered to the browser with srcset.
+    """
+    size = image_size(image_data)
+    attributes = []
+    if size is not None:
+        attributes.append(f'width="{size[0]}" height="{size[1]}"')
+    attributes.append('loading="lazy" decoding="async"')
+
+    if path is not None and size is not None:
+        prefix = src[:-len(path.name)]
+        candidates = []
+        for width, data in image_variants(image_data):
+            name = f'{path.stem}-{width}w{path.suffix}'
+            write_image(path.with_name(name), data)
+            candidates.append(f'{prefix}{name} {width}w')
+        if candidates:
+            candidates.append(f'{src} {size[0]}w')
+            attributes.append(f'srcset="{", ".join(candidates)}" sizes="(max-width: {size[0]}px) 100vw, {size[0]}px"')
+    return ' ' + ' '.join(attributes)
+
+
+class ImageOptimizer:
+    """
+    Optimizes the images of a document on a thread pool, ahead of the body walk.
+
+    `start_document` queues the pictures of the body in the order the walk
+    reaches them and keeps up to IMAGE_PREFETCH_PER_THREAD of them per thread
+    in progress; when the walk reaches an image, `result` hands over the
+    optimized bytes, waiting only if that image is still being processed,
+    and queues the next one. Only that window of results is held in memory,
+    however many images the document has. The page, file names and image
+    files come out the same as optimizing each image when it is reached.
+
+    With an ImageCache (giaconvert_cache), images optimized before, by any
+    document or run, are read from the cache instead; `optimize` must then
+    produce what `settings` (max width, max height, quality, format) says.
+    """
+
+    def __init__(self, optimize: Callable[[bytes], bytes] = optimize_image, threads: int = 0, cache=None,
+                 settings: Tuple[int, int, int, str] = (OPTIMIZE_MAX_WIDTH, OPTIMIZE_MAX_HEIGHT,
+                                                        OPTIMIZE_QUALITY, OPTIMIZE_FORMAT)):
+        self.optimize = optimize
+        self.threads = threads or min(MAX_IMAGE_THREADS, os.cpu_count() or 1)
+        self.cache = cache
+        self.settings = settings
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._parts: Optional[Iterator] = None
+        self._registry: Optional['ImageRegistry'] = None
+        self._queued: set = set()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_bytes_saved = 0
+
+    def start_document(self, doc, registry: 'ImageRegistry'):
+        """Start optimizing the first pictures of `doc` that the registry will not find elsewhere"""
+        self._futures = {}
+        self._queued = set()
+        self._parts = iter_body_image_parts(doc)
+        self._registry = registry
+        self.cache_hits = self.cache_misses = self.cache_bytes_saved = 0
+        self._submit_ahead()
+
+    def _submit_ahead(self):
+        """Submit the next pictures of the document until the window is full"""
+        while self._parts is not None and len(self._futures) < self.threads * IMAGE_PREFETCH_PER_THREAD:
+            part = next(self._parts, None)
+            if part is None:
+                self._parts = None
+                break
+            digest = self._registry.digest(part)
+            if digest in self._queued or self._registry.batch_file(digest) is not None:
+                continue
+            self._queued.add(digest)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix='giaconvert-images')
+            self._futures[digest] = self._executor.submit(self._optimize, digest, part.blob)
+
+    def _optimize(self, digest: str, image_data: bytes) -> Tuple[bytes, Optional[bool]]:
+        """Optimized bytes and whether they came from the cache (None without a cache)"""
+        if self.cache is None:
+            return self.optimize(image_data), None
+        key = self.cache.key(digest, *self.settings)
+        data = self.cache.get(key, len(image_data))
+        if data is not None:
+            return data, True
+        data = self.optimize(image_data)
+        self.cache.put(key, data)
+        return data, False
+
+    def result(self, digest: str, image_data: bytes) -> bytes:
+        """Optimized bytes of an image (optimized here if it was not submitted)"""
+        future = self._futures.pop(digest, None)
+        # Reached before the window got to it: optimized here, and not queued later
+        self._queued.add(digest)
+        self._submit_ahead()
+        data, cached = future.result() if future is not None else self._optimize(digest, image_data)
+        # Counted here, on the converting thread, for the images the page actually uses
+        if cached:
+            self.cache_hits += 1
+            self.cache_bytes_saved += len(image_data)
+        elif cached is not None:
+            self.cache_misses += 1
+        return data
+
+    def stats(self) -> Dict[str, int]:
+        """Image cache counters for the current document, for the converter's result"""
+        return {
+            'image_cache_hits': self.cache_hits,
+            'image_cache_misses': self.cache_misses,
+            'image_cache_bytes_saved': self.cache_bytes_saved,
+        }
+
+    def close(self):
+        """Drop unclaimed results and stop the threads"""
+        for future in self._futures.values():
+            future.cancel()
+        self._futures = {}
+        self._parts = None
+        self._registry = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def write_image(path: Path, data: bytes):
+    """
+    Write an image file by replacing it rather than rewriting it in place.
+
+    Image files may be hard-linked into other output folders or the
+    conversion cache; replacing keeps those copies intact.
+    """
+    with open_atomic(path, 'wb') as f:
+        f.write(data)
+
+
+def copy_image(path: Path, source: IO[bytes]):
+    """Write an image file from a stream, chunk by chunk; replaced like `write_image`"""
+    with open_atomic(path, 'wb') as f:
+        shutil.copyfileobj(source, f, COPY_CHUNK_SIZE)
+
+
+def part_digest(part) -> str:
+    """
+    SHA-256 of an image part's bytes.
+
+    Parts that can be opened as a stream (the fast engine's zip members) are
+    hashed chunk by chunk, so the image is never held in memory as a whole.
+    """
+    if not hasattr(part, 'open'):
+        return hashlib.sha256(part.blob).hexdigest()
+    digest = hashlib.sha256()
+    with part.open() as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def part_header(part) -> bytes:
+    """First bytes of an image part, enough to tell its format"""
+    if not hasattr(part, 'open'):
+        return part.blob[:IMAGE_HEADER_SIZE]
+    with part.open() as f:
+        return f.read(IMAGE_HEADER_SIZE)
+
+
+class AssetStore:
+    """
+    Content-addressed image files shared by a batch: `<assets_dir>/<sha256>.<ext>`.
+
+    Each distinct image is written once, named after the SHA-256 of its
+    bytes. Pages keep their own `<stem>_images` folder, but its files are
+    hard links to the assets (copies where links are not possible). Disk use
+    and writes then grow with the distinct images rather than with every
+    reference, across worker processes and runs. The conversion cache,
+    incremental manifest and web downloads still see ordinary image folders.
+    """
+
+    def __init__(self, assets_dir, link: bool = True):
+        self.assets_dir = Path(assets_dir).expanduser()
+        self.link = link
+        self.start_document()
+
+    def start_document(self):
+        """Reset the per-document counters"""
+        self.written = 0
+        self.reused = 0
+
+    def put(self, digest: str, extension: str, data: Optional[bytes] = None,
+            source: Optional[IO[bytes]] = None) -> Path:
+        """
+        Asset holding the image whose SHA-256 is `digest`.
+
+        It is written from `data` (or streamed from `source`) only if no
+        earlier page, worker or run has stored it yet.
+        """
+        path = self.assets_dir / f'{digest}.{extension}'
+        if path.is_file():
+            self.reused += 1
+            return path
+        self.assets_dir.mkdir(parents=True, exist_ok=True)
+        # Written under a private name and linked into place: a worker that loses
+        # the race keeps the asset already there, which other pages may link to
+        staging = self.assets_dir / f'.{digest}.{os.getpid()}.{threading.get_ident()}.{extension}'
+        try:
+            if source is not None:
+                copy_image(staging, source)
+            else:
+                write_image(staging, data)
+            try:
+                os.link(staging, path)
+            except FileExistsError:
+                self.reused += 1
+                return path
+            except OSError:
+                os.replace(staging, path)
+        finally:
+            if staging.exists():
+                staging.unlink()
+        self.written += 1
+        return path
+
+    def place(self, asset: Path, target: Path):
+        """Put `asset` at `target` in a page's image folder, by hard link when possible"""
+        if target.exists() or target.is_symlink():
+            target.unlink()
+        if self.link:
+            try:
+                os.link(asset, target)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(asset, target)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for the current document, for the converter's result"""
+        return {'assets_written': self.written, 'assets_reused': self.reused}
+
+
+class ImageRegistry:
+    """
+    Remembers the images already emitted for a document (and optionally a batch).
+
+    Within a document an image is identified by the SHA-256 of its bytes,
+    so a logo repeated in every header or the same picture pasted several
+    times (even as separate package parts) is written (or base64-encoded)
+    once and its HTML reused for every later reference. The digest of each
+    package part is computed once per document and remembered by part name.
+
+    In 'batch' scope the registry also remembers which file holds each image
+    across documents; a later document hard-links that file into its own
+    images folder (copying when links are not possible) instead of writing
+    it again.
+    """
+
+    def __init__(self, scope: str = 'document', link: bool = True):
+        if scope not in DEDUPE_SCOPES:
+            raise ValueError(f"Unknown image deduplication scope: {scope}")
+        self.scope = scope
+        self.link = link
+        self._files: 'OrderedDict[str, Tuple[Path, int, int]]' = OrderedDict()
+        self.start_document()
+
+    def start_document(self):
+        """Forget the images of the previous document and reset its counters"""
+        self._by_part: Dict[str, str] = {}
+        self._by_hash: Dict[str, Tuple[str, int]] = {}
+        self.unique_images = 0
+        self.duplicate_images = 0
+        self.bytes_saved = 0
+        self.source_bytes = 0
+        self.output_bytes = 0
+
+    def lookup(self, part) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Find an image part that was already emitted for this document.
+
+        Returns (html, None) on a hit, or (None, sha256) when the image is
+        new; pass the digest on to `add` once the image has been emitted.
+        """
+        digest = self.digest(part)
+        entry = self._by_hash.get(digest)
+        if entry is None:
+            return None, digest
+
+        html, stored_bytes = entry
+        self.duplicate_images += 1
+        self.bytes_saved += stored_bytes
+        return html, None
+
+    def digest(self, part) -> str:
+        """SHA-256 of an image part, computed once per part and document"""
+        partname = str(part.partname)
+        digest = self._by_part.get(partname)
+        if digest is None:
+            digest = part_digest(part)
+            self._by_part[partname] = digest
+        return digest
+
+    def add(self, digest: str, html: str, path: Optional[Path] = None, source_size: int = 0, output_size: int = 0):
+        """
+        Record the HTML emitted for a new image, and the file it was written to if any.
+
+        `source_size` is the image's size in the document and `output_size`
+        its size in the page (the file's size when there is a file).
+        """
+        stored_bytes = 0
+        if path is not None:
+            stat = os.stat(path)
+            stored_bytes = stat.st_size
+            if self.scope == 'batch':
+                self._files[digest] = (Path(path), stat.st_size, stat.st_mtime_ns)
+                self._files.move_to_end(digest)
+                while len(self._files) > BATCH_REGISTRY_SIZE:
+                    self._files.popitem(last=False)
+        self._by_hash[digest] = (html, stored_bytes)
+        self.unique_images += 1
+        self.source_bytes += source_size
+        self.output_bytes += stored_bytes or output_size
+
+    def batch_file(self, digest: str) -> Optional[Path]:
+        """File written for the same image by an earlier document of the batch, if still intact"""
+        known = self._files.get(digest)
+        if known is None:
+            return None
+        path, size, mtime_ns = known
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        if stat is None or (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+            # Moved, deleted or rewritten since; it can no longer be trusted
+            del self._files[digest]
+            return None
+        return path
+
+    def place(self, source: Path, target: Path):
+        """Put a copy of the earlier file `source` at `target`, by hard link when possible"""
+        if target.exists() or target.is_symlink():
+            target.unlink()
+        if self.link:
+            try:
+                os.link(source, target)
+                self.bytes_saved += target.stat().st_size
+                return
+            except OSError:
+                pass
+        shutil.copyfile(source, target)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for the current document, for the converter's result"""
+        return {
+            'images_unique': self.unique_images,
+            'images_deduplicated': self.duplicate_images,
+            'image_bytes_saved': self.bytes_saved,
+            'image_source_bytes': self.source_bytes,
+            'image_output_bytes': self.output_bytes,
+        }
+
+
+_batch_registries: Dict[Tuple[str, ...], ImageRegistry] = {}
+
+
+def image_registry(scope: str = 'document', *variant) -> ImageRegistry:
+    """
+    Registry for a converter with deduplication `scope`.
+
+    'document' scope gets a private registry. 'batch' scope shares one
+    registry per process (and per `variant`, e.g. image mode and optimisation
+    settings that change the bytes written), so documents converted by the
+    same worker reuse each other's image files.
+    """
+    if scope != 'batch':
+        return ImageRegistry(scope)
+    key = tuple(str(v) for v in variant)
+    registry = _batch_registries.get(key)
+    if registry is None:
+        registry = _batch_registries[key] = ImageRegistry('batch')
+    return registry
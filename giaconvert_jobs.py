@@ -0,0 +1,602 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT Job Store
+Conversion jobs, download links and uploaded files of the web application, with expiry.
+"""
+
+import json
+import shutil
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Finished jobs (and their download links) are forgotten this many seconds after they end
+DEFAULT_JOB_TTL = 3600
+
+# Finished jobs kept at most; the oldest are evicted first (running jobs are never evicted)
+DEFAULT_MAX_JOBS = 1000
+
+# Uploaded files and outputs written next to them are deleted after this many seconds
+DEFAULT_UPLOAD_TTL = 24 * 3600
+
+# SQLite backend: per-file results are written in batches of this many entries,
+# or after this many seconds, whichever comes first
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 0.5
+
+JOB_STORE_BACKENDS = ('memory', 'sqlite')
+
+# Job states after which a job no longer changes
+FINISHED_STATES = ('completed', 'completed_with_errors', 'failed')
+
+# Per-job lists of file entries
+ENTRY_KINDS = ('results', 'errors')
+
+# Totals reported by `stats` besides the current sizes
+STORE_COUNTERS = ('evicted_jobs', 'expired_uploads', 'swept_paths', 'swept_bytes')
+
+
+def entry_size(entry: Dict[str, Any]) -> int:
+    """Approximate memory held by one result/error entry (its JSON size)"""
+    return len(json.dumps(entry, default=str))
+
+
+def path_size(path: Path) -> int:
+    """Bytes used on disk by a file or directory tree"""
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob('*') if p.is_file())
+    return path.stat().st_size
+
+
+def remove_path(path: Path):
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+class JobStore:
+    """
+    Jobs, downloads and uploads of the web app, bounded in time and size.
+
+    A job is a dict of counters (status, progress, ...) plus append-only
+    `results` and `errors` lists. Finished jobs expire `ttl` seconds after
+    they end, and only the `max_jobs` most recently finished are kept;
+    download links go with their job. Uploaded files expire `upload_ttl`
+    seconds after they were received or last used by a job. `sweep`
+    applies the expiry and `sweep_directory` deletes expired files on disk.
+
+    Backends implement the job, download and upload methods; `shared`
+    tells whether other processes see the same jobs.
+    """
+
+    backend: str = ''
+    shared = False
+    flush_interval: Optional[float] = None  # seconds between `flush` calls the owner should make
+
+    def __init__(self, ttl: float = DEFAULT_JOB_TTL, max_jobs: int = DEFAULT_MAX_JOBS,
+                 upload_ttl: float = DEFAULT_UPLOAD_TTL, clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.upload_ttl = upload_ttl
+        self.clock = clock
+
+    def flush(self):
+        """Write out buffered changes (backends that buffer writes)"""
+
+    def close(self):
+        self.flush()
+
+    def live_paths(self) -> set:
+        """Files on disk still referenced by an upload or a download link"""
+        raise NotImplementedError
+
+    def _add_counters(self, **amounts: int):
+        raise NotImplementedError
+
+    def sweep_directory(self, directory: Path, keep: Optional[set] = None) -> Dict[str, int]:
+        """
+        Delete entries of the upload `directory` that nothing refers to any more.
+
+        Expired uploads, and outputs converted next to them, are removed once
+        they are older than `upload_ttl`; `keep` names further paths to spare
+        (e.g. resumable uploads still in progress).
+        """
+        directory = Path(directory)
+        if not directory.is_dir():
+            return {'paths': 0, 'bytes': 0}
+        live = self.live_paths() | set(keep or ())
+        now = self.clock()
+        removed = removed_bytes = 0
+        for path in directory.iterdir():
+            try:
+                if str(path) in live or now - path.stat().st_mtime <= self.upload_ttl:
+                    continue
+                size = path_size(path)
+            except OSError:
+                continue
+            remove_path(path)
+            removed += 1
+            removed_bytes += size
+        self._add_counters(swept_paths=removed, swept_bytes=removed_bytes)
+        return {'paths': removed, 'bytes': removed_bytes}
+
+
+def download_paths(html_path: str) -> Tuple[str, str]:
+    """A converted page and its images folder"""
+    path = Path(html_path)
+    return str(path), str(path.parent / f'{path.stem}_images')
+
+
+class InMemoryJobStore(JobStore):
+    """Jobs held in process memory; each server process has its own"""
+
+    backend = 'memory'
+
+    def __init__(self, ttl: float = DEFAULT_JOB_TTL, max_jobs: int = DEFAULT_MAX_JOBS,
+                 upload_ttl: float = DEFAULT_UPLOAD_TTL, clock: Callable[[], float] = time.time):
+        super().__init__(ttl, max_jobs, upload_ttl, clock)
+        self._lock = threading.RLock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._entries: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        self._entry_bytes: Dict[str, int] = {}
+        self._finished: 'OrderedDict[str, float]' = OrderedDict()  # job_id -> end time, oldest first
+        self._downloads: Dict[str, Dict[str, str]] = {}
+        self._job_downloads: Dict[str, List[str]] = {}
+        self._uploads: Dict[str, Dict[str, Any]] = {}
+        self._counters = dict.fromkeys(STORE_COUNTERS, 0)
+
+    # Jobs
+
+    def create(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id] = dict(fields)
+            self._entries[job_id] = {kind: [] for kind in ENTRY_KINDS}
+            self._entry_bytes[job_id] = 0
+            self._job_downloads[job_id] = []
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job's counters plus `results_count` and `errors_count`, or None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            entries = self._entries[job_id]
+            return dict(job, results_count=len(entries['results']), errors_count=len(entries['errors']))
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            if job.get('status') in FINISHED_STATES and job_id not in self._finished:
+                self._finished[job_id] = self.clock()
+                self._evict_over_size()
+
+    def append(self, job_id: str, kind: str, entry: Dict[str, Any]):
+        """Add a per-file entry to the job's `results` or `errors`"""
+        with self._lock:
+            entries = self._entries.get(job_id)
+            if entries is None:
+                return
+            entries[kind].append(entry)
+            self._entry_bytes[job_id] += entry_size(entry)
+
+    def entries(self, job_id: str, kind: str, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = self._entries.get(job_id)
+            return list(entries[kind][start:stop]) if entries is not None else []
+
+    def delete(self, job_id: str):
+        """Forget a job and its download links"""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._entries.pop(job_id, None)
+            self._entry_bytes.pop(job_id, None)
+            self._finished.pop(job_id, None)
+            for file_id in self._job_downloads.pop(job_id, []):
+                self._downloads.pop(file_id, None)
+
+    def _evict_over_size(self):
+        while len(self._finished) > self.max_jobs:
+            job_id = next(iter(self._finished))
+            self.delete(job_id)
+            self._counters['evicted_jobs'] += 1
+
+    # Downloads
+
+    def add_download(self, file_id: str, path: str, job_id: str):
+        with self._lock:
+            self._downloads[file_id] = {'path': path, 'job_id': job_id}
+            self._job_downloads.setdefault(job_id, []).append(file_id)
+
+    def get_download(self, file_id: str) -> Optional[str]:
+        with self._lock:
+            download = self._downloads.get(file_id)
+            return download['path'] if download else None
+
+    # Uploads
+
+    def add_upload(self, path: str, sha256: str):
+        with self._lock:
+            self._uploads[path] = {'sha256': sha256, 'time': self.clock()}
+
+    def upload_hash(self, path: str) -> Optional[str]:
+        with self._lock:
+            upload = self._uploads.get(path)
+            return upload['sha256'] if upload else None
+
+    def touch_upload(self, path: str):
+        """Keep an upload alive while a job converts it"""
+        with self._lock:
+            upload = self._uploads.get(path)
+            if upload is not None:
+                upload['time'] = self.clock()
+
+    def remove_upload(self, path: str):
+        with self._lock:
+            self._uploads.pop(path, None)
+
+    # Expiry
+
+    def sweep(self) -> Dict[str, int]:
+        """Drop expired finished jobs (with their downloads) and expired uploads"""
+        now = self.clock()
+        with self._lock:
+            expired_jobs = [job_id for job_id, ended in self._finished.items() if now - ended > self.ttl]
+            for job_id in expired_jobs:
+                self.delete(job_id)
+            self._counters['evicted_jobs'] += len(expired_jobs)
+
+            expired_uploads = [path for path, upload in self._uploads.items() if now - upload['time'] > self.upload_ttl]
+            for path in expired_uploads:
+                del self._uploads[path]
+            self._counters['expired_uploads'] += len(expired_uploads)
+        return {'jobs': len(expired_jobs), 'uploads': len(expired_uploads)}
+
+    def live_paths(self) -> set:
+        with self._lock:
+            paths = set(self._uploads)
+            for download in self._downloads.values():
+                paths.update(download_paths(download['path']))
+            return paths
+
+    def _add_counters(self, **amounts: int):
+        with self._lock:
+            for name, amount in amounts.items():
+                self._counters[name] += amount
+
+    # Metrics
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'jobs': len(self._jobs),
+                'running_jobs': len(self._jobs) - len(self._finished),
+                'downloads': len(self._downloads),
+                'uploads': len(self._uploads),
+                'memory_bytes': sum(self._entry_bytes.values()) + sum(entry_size(job) for job in self._jobs.values()),
+                **self._counters,
+            }
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    counters TEXT NOT NULL,
+    finished_at REAL,
+    results_count INTEGER NOT NULL DEFAULT 0,
+    errors_count INTEGER NOT NULL DEFAULT 0,
+    entry_bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at);
+CREATE TABLE IF NOT EXISTS job_entries (
+    job_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (job_id, kind, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS downloads (
+    file_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    job_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS downloads_job_id ON downloads (job_id);
+CREATE TABLE IF NOT EXISTS uploads (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    time REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS store_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+'''
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Jobs kept in a SQLite database in WAL mode, shared by every server
+    process that opens the same file (e.g. uvicorn --workers N).
+
+    Only the process running a job writes to it. Its per-file results,
+    errors, download links and progress counters are buffered and written
+    in one transaction per `batch_size` entries or `flush_interval`
+    seconds; status changes (started, finished) are written at once.
+    Reads in the writing process see its own buffered changes without
+    writing them out; other processes see them after the next flush.
+    """
+
+    backend = 'sqlite'
+    shared = True
+
+    def __init__(self, path: Path, ttl: float = DEFAULT_JOB_TTL, max_jobs: int = DEFAULT_MAX_JOBS,
+                 upload_ttl: float = DEFAULT_UPLOAD_TTL, clock: Callable[[], float] = time.time,
+                 batch_size: int = DEFAULT_BATCH_SIZE, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        super().__init__(ttl, max_jobs, upload_ttl, clock)
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        # Autocommit; writes use explicit transactions (see `_transaction`)
+        self._db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+        self._pending_fields: Dict[str, Dict[str, Any]] = {}
+        self._pending_entries: List[Tuple[str, str, int, str]] = []
+        self._pending_downloads: List[Tuple[str, str, str]] = []
+        self._pending_since: Optional[float] = None
+        self._next_seq: Dict[Tuple[str, str], int] = {}
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def _query(self, sql: str, parameters: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._db.execute(sql, parameters).fetchall()
+
+    # Write buffer
+
+    def _buffered(self):
+        """Note a buffered change; write the batch out once it is full or old enough"""
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        if (len(self._pending_entries) + len(self._pending_downloads) >= self.batch_size
+                or time.monotonic() - self._pending_since >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if self._pending_since is None:
+                return
+            now = self.clock()
+            finished = False
+            with self._transaction() as db:
+                for job_id, fields in self._pending_fields.items():
+                    row = db.execute('SELECT counters, finished_at FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+                    if row is None:
+                        continue
+                    counters = dict(json.loads(row[0]), **fields)
+                    finished_at = row[1]
+                    if finished_at is None and counters.get('status') in FINISHED_STATES:
+                        finished_at = now
+                        finished = True
+                    db.execute('UPDATE jobs SET counters = ?, finished_at = ? WHERE job_id = ?',
+                               (json.dumps(counters), finished_at, job_id))
+
+                added: Dict[Tuple[str, str], int] = {}
+                for job_id, kind, seq, entry in self._pending_entries:
+                    db.execute('INSERT OR REPLACE INTO job_entries SELECT ?, ?, ?, ? '
+                               'WHERE EXISTS (SELECT 1 FROM jobs WHERE job_id = ?)',
+                               (job_id, kind, seq, entry, job_id))
+                    added[job_id, kind] = added.get((job_id, kind), 0) + len(entry)
+                for (job_id, kind), size in added.items():
+                    db.execute(f'UPDATE jobs SET {kind}_count = MAX({kind}_count, ?), entry_bytes = entry_bytes + ? '
+                               'WHERE job_id = ?', (self._next_seq.get((job_id, kind), 0), size, job_id))
+
+                db.executemany('INSERT OR REPLACE INTO downloads SELECT ?, ?, ? '
+                               'WHERE EXISTS (SELECT 1 FROM jobs WHERE job_id = ?)',
+                               [(file_id, path, job_id, job_id) for file_id, path, job_id in self._pending_downloads])
+                if finished:
+                    self._evict_over_size(db)
+
+            self._pending_fields.clear()
+            self._pending_entries.clear()
+            self._pending_downloads.clear()
+            self._pending_since = None
+
+    # Jobs
+
+    def create(self, job_id: str, **fields):
+        with self._transaction() as db:
+            db.execute('INSERT OR REPLACE INTO jobs (job_id, counters) VALUES (?, ?)', (job_id, json.dumps(fields)))
+        for kind in ENTRY_KINDS:
+            self._next_seq[job_id, kind] = 0
+
+    # Reads merge the write buffer over the database instead of flushing it,
+    # so polling clients do not add write transactions
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            rows = self._query('SELECT counters, results_count, errors_count FROM jobs WHERE job_id = ?', (job_id,))
+            if not rows:
+                return None
+            counters, results_count, errors_count = rows[0]
+            return dict(json.loads(counters), **self._pending_fields.get(job_id, {}),
+                        results_count=max(results_count, self._next_seq.get((job_id, 'results'), 0)),
+                        errors_count=max(errors_count, self._next_seq.get((job_id, 'errors'), 0)))
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            self._pending_fields.setdefault(job_id, {}).update(fields)
+            # Status changes are seen by the other processes right away
+            if 'status' in fields:
+                self._pending_since = self._pending_since or time.monotonic()
+                self.flush()
+            else:
+                self._buffered()
+
+    def append(self, job_id: str, kind: str, entry: Dict[str, Any]):
+        if kind not in ENTRY_KINDS:
+            raise ValueError(f"Unknown entry kind: {kind}")
+        with self._lock:
+            key = (job_id, kind)
+            if key not in self._next_seq:
+                rows = self._query(f'SELECT {kind}_count FROM jobs WHERE job_id = ?', (job_id,))
+                if not rows:
+                    return
+                self._next_seq[key] = rows[0][0]
+            self._pending_entries.append((job_id, kind, self._next_seq[key], json.dumps(entry, default=str)))
+            self._next_seq[key] += 1
+            self._buffered()
+
+    def entries(self, job_id: str, kind: str, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        stop = stop if stop is not None else 2 ** 62
+        with self._lock:
+            found = dict(self._query('SELECT seq, entry FROM job_entries WHERE job_id = ? AND kind = ? '
+                                     'AND seq >= ? AND seq < ?', (job_id, kind, start, stop)))
+            for pending_job, pending_kind, seq, entry in self._pending_entries:
+                if (pending_job, pending_kind) == (job_id, kind) and start <= seq < stop:
+                    found[seq] = entry
+        return [json.loads(found[seq]) for seq in sorted(found)]
+
+    def delete(self, job_id: str):
+        self.flush()
+        with self._transaction() as db:
+            self._delete_jobs(db, [job_id])
+
+    def _delete_jobs(self, db: sqlite3.Connection, job_ids: List[str]):
+        rows = [(job_id,) for job_id in job_ids]
+        for table in ('jobs', 'job_entries', 'downloads'):
+            db.executemany(f'DELETE FROM {table} WHERE job_id = ?', rows)
+        for job_id in job_ids:
+            for kind in ENTRY_KINDS:
+                self._next_seq.pop((job_id, kind), None)
+
+    def _evict_over_size(self, db: sqlite3.Connection):
+        finished, = db.execute('SELECT COUNT(*) FROM jobs WHERE finished_at IS NOT NULL').fetchone()
+        if finished > self.max_jobs:
+            rows = db.execute('SELECT job_id FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at LIMIT ?',
+                              (finished - self.max_jobs,)).fetchall()
+            self._delete_jobs(db, [job_id for job_id, in rows])
+            self._bump(db, evicted_jobs=len(rows))
+
+    # Downloads
+
+    def add_download(self, file_id: str, path: str, job_id: str):
+        with self._lock:
+            self._pending_downloads.append((file_id, path, job_id))
+            self._buffered()
+
+    def get_download(self, file_id: str) -> Optional[str]:
+        with self._lock:
+            for pending_id, path, _ in reversed(self._pending_downloads):
+                if pending_id == file_id:
+                    return path
+            rows = self._query('SELECT path FROM downloads WHERE file_id = ?', (file_id,))
+        return rows[0][0] if rows else None
+
+    # Uploads
+
+    def add_upload(self, path: str, sha256: str):
+        with self._transaction() as db:
+            db.execute('INSERT OR REPLACE INTO uploads VALUES (?, ?, ?)', (path, sha256, self.clock()))
+
+    def upload_hash(self, path: str) -> Optional[str]:
+        rows = self._query('SELECT sha256 FROM uploads WHERE path = ?', (path,))
+        return rows[0][0] if rows else None
+
+    def touch_upload(self, path: str):
+        with self._transaction() as db:
+            db.execute('UPDATE uploads SET time = ? WHERE path = ?', (self.clock(), path))
+
+    def remove_upload(self, path: str):
+        with self._transaction() as db:
+            db.execute('DELETE FROM uploads WHERE path = ?', (path,))
+
+    # Expiry
+
+    def sweep(self) -> Dict[str, int]:
+        self.flush()
+        now = self.clock()
+        with self._transaction() as db:
+            rows = db.execute('SELECT job_id FROM jobs WHERE finished_at < ?', (now - self.ttl,)).fetchall()
+            self._delete_jobs(db, [job_id for job_id, in rows])
+            uploads = db.execute('DELETE FROM uploads WHERE time < ?', (now - self.upload_ttl,)).rowcount
+            self._bump(db, evicted_jobs=len(rows), expired_uploads=uploads)
+        return {'jobs': len(rows), 'uploads': uploads}
+
+    def live_paths(self) -> set:
+        with self._lock:
+            paths = {path for path, in self._query('SELECT path FROM uploads')}
+            downloads = self._query('SELECT path FROM downloads') + [(path,) for _, path, _ in self._pending_downloads]
+        for path, in downloads:
+            paths.update(download_paths(path))
+        return paths
+
+    def _bump(self, db: sqlite3.Connection, **amounts: int):
+        db.executemany('INSERT INTO store_counters VALUES (?, ?) '
+                       'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+                       list(amounts.items()))
+
+    def _add_counters(self, **amounts: int):
+        with self._transaction() as db:
+            self._bump(db, **amounts)
+
+    # Metrics
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            jobs, finished, memory_bytes = self._query(
+                'SELECT COUNT(*), COUNT(finished_at), COALESCE(SUM(entry_bytes + LENGTH(counters)), 0) FROM jobs'
+            )[0]
+            memory_bytes += sum(len(entry) for *_, entry in self._pending_entries)
+            downloads = self._query('SELECT COUNT(*) FROM downloads')[0][0] + len(self._pending_downloads)
+            uploads = self._query('SELECT COUNT(*) FROM uploads')[0][0]
+            counters = dict.fromkeys(STORE_COUNTERS, 0)
+            counters.update(self._query('SELECT name, value FROM store_counters'))
+        database_bytes = sum(
+            p.stat().st_size for p in (self.path, Path(f'{self.path}-wal')) if p.exists()
+        )
+        return {
+            'backend': self.backend,
+            'jobs': jobs,
+            'running_jobs': jobs - finished,
+            'downloads': downloads,
+            'uploads': uploads,
+            'memory_bytes': memory_bytes,
+            'database_bytes': database_bytes,
+            **counters,
+        }
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._db.close()
+
+
+def create_job_store(backend: str = 'memory', path: Optional[Path] = None, **options) -> JobStore:
+    """The job store for `backend` ('memory' or 'sqlite', which needs a database `path`)"""
+    if backend == 'memory':
+        return InMemoryJobStore(**options)
+    if backend == 'sqlite':
+        if path is None:
+            raise ValueError("The sqlite job store needs a database path")
+        return SQLiteJobStore(path, **options)
+    raise ValueError(f"Unknown job store backend: {backend} (choose from {', '.join(JOB_STORE_BACKENDS)})")
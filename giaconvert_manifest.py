@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT Conversion Manifest
+Tracks which documents under a directory are already converted, for incremental runs.
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from giaconvert_cache import hash_file
+
+MANIFEST_NAME = '.giaconvert_manifest.json'
+MANIFEST_VERSION = 1
+
+
+class ConversionManifest:
+    """
+    Manifest of converted sources kept at the root of a converted directory.
+
+    For every source it records size, modification time and SHA-256 together
+    with the outputs it produced. A source is up to date when its HTML still
+    exists and its size and mtime are unchanged; when only the mtime moved
+    (e.g. the file was touched or copied) the content hash decides. Changing
+    the converter options, which include the converter's version, invalidates
+    every entry.
+    """
+
+    def __init__(self, root, options: Dict[str, Any]):
+        self.root = Path(root)
+        self.path = self.root / MANIFEST_NAME
+        self.options = json.loads(json.dumps(options, sort_keys=True, default=str))
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        if data.get('version') != MANIFEST_VERSION:
+            return
+        self.entries = data.get('entries', {})
+        if data.get('options') != self.options:
+            # Outputs were made with other settings; keep the entries for cleanup only
+            for entry in self.entries.values():
+                entry['stale'] = True
+
+    def _key(self, source: Path) -> str:
+        return Path(source).relative_to(self.root).as_posix()
+
+    def is_up_to_date(self, source: Path, html_path: Path) -> bool:
+        """True when `source` was converted with the current options and has not changed since"""
+        entry = self.entries.get(self._key(source))
+        if entry is None or entry.get('stale') or not Path(html_path).exists():
+            return False
+
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return False
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+
+        # Same size but a new timestamp: compare contents before reconverting
+        if hash_file(source) != entry['sha256']:
+            return False
+        entry['mtime_ns'] = stat.st_mtime_ns
+        return True
+
+    def record(self, source: Path, html_path: Path, sha256: Optional[str] = None):
+        """Remember a successful conversion of `source` into `html_path`"""
+        source = Path(source)
+        html_path = Path(html_path)
+        stat = os.stat(source)
+        images_dir = html_path.parent / f"{html_path.stem}_images"
+        self.entries[self._key(source)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256 or hash_file(source),
+            'html': html_path.relative_to(self.root).as_posix(),
+            'images_dir': images_dir.relative_to(self.root).as_posix() if images_dir.is_dir() else None,
+        }
+
+    def forget(self, source: Path):
+        """Drop `source` from the manifest so it is converted again next time"""
+        self.entries.pop(self._key(source), None)
+
+    def remove_deleted(self, sources: Iterable[Path]) -> List[Path]:
+        """
+        Delete the outputs of manifest entries whose source no longer exists.
+
+        Only files and folders recorded in the manifest are removed.
+        Returns the paths that were deleted.
+        """
+        current = {self._key(source) for source in sources}
+        removed = []
+        for key in [k for k in self.entries if k not in current]:
+            entry = self.entries.pop(key)
+            if (self.root / key).exists():
+                # Source still exists but was not part of this run; keep its outputs
+                continue
+            html = self.root / entry['html']
+            if html.is_file():
+                html.unlink()
+                removed.append(html)
+            if entry.get('images_dir'):
+                images_dir = self.root / entry['images_dir']
+                if images_dir.is_dir():
+                    shutil.rmtree(images_dir, ignore_errors=True)
+                    removed.append(images_dir)
+        return removed
+
+    def plan(self, sources: List[Path]) -> Tuple[List[Path], List[Path]]:
+        """
+        Prepare an incremental run over `sources` (each converted to `<source>.html`).
+
+        Removes the outputs of deleted sources and returns
+        (sources that need converting, output paths that were removed).
+        """
+        removed = self.remove_deleted(sources)
+        pending = [source for source in sources if not self.is_up_to_date(source, source.with_suffix('.html'))]
+        return pending, removed
+
+    def save(self):
+        """Write the manifest atomically next to the outputs"""
+        data = {
+            'version': MANIFEST_VERSION,
+            'options': self.options,
+            'entries': self.entries,
+        }
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        temp_path.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(temp_path, self.path)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT Run Styles
+Memoizes the CSS of runs by their formatting markup, optionally as shared CSS classes.
+"""
+
+import sys
+from typing import Callable, Dict, Hashable, List, Optional
+
+# Distinct run formats remembered before the memo is cleared
+MAX_RUN_STYLES = 4096
+
+
+def run_properties(run):
+    """The `w:rPr` element of a python-docx Run, or None"""
+    return run._element.rPr
+
+
+def run_properties_key(rPr) -> Hashable:
+    """Hashable summary of a run's direct formatting: (tag, attributes) of each `w:rPr` child"""
+    if rPr is None:
+        return ()
+    return tuple((child.tag, tuple(child.attrib.items())) for child in rPr)
+
+
+class RunStyleCache:
+    """
+    Cache of run CSS keyed on the properties in each run's `w:rPr` element.
+
+    All formatting read by the converters (bold, italic, underline, color,
+    size, font) comes from the direct children of the run's own `w:rPr`, so
+    runs with identical properties share one CSS string and the property
+    lookups run once per distinct format instead of once per run. Strings
+    are interned, so repeated styles also share memory.
+
+    With `use_classes` each distinct style becomes a CSS class (`r1`, `r2`,
+    ...) and spans reference it instead of repeating an inline `style=`;
+    `stylesheet()` returns the rules for the current document. The classes
+    are only known once the body is converted, so streamed pages defer their
+    `style_element` into `<head>` (HTMLWriter.defer).
+
+    `compute` receives whatever is passed to `css`/`wrap`; `properties` maps
+    that to its `w:rPr` element (python-docx Runs by default). Formats that
+    are not XML pass `key` instead, mapping it straight to a hashable
+    summary of the formatting.
+    """
+
+    def __init__(self, compute: Callable, use_classes: bool = False, max_entries: int = MAX_RUN_STYLES,
+                 properties: Optional[Callable] = None, key: Optional[Callable] = None):
+        self.compute = compute
+        self.properties = properties or run_properties
+        self.key = key or (lambda run: run_properties_key(self.properties(run)))
+        self.use_classes = use_classes
+        self.max_entries = max_entries
+        self._styles: Dict[Hashable, str] = {}
+        self.start_document()
+
+    def start_document(self):
+        """Forget the CSS classes handed out for the previous document"""
+        self._classes: Dict[str, str] = {}
+
+    def css(self, run) -> str:
+        """CSS declarations for `run`, computed once per distinct `w:rPr`"""
+        key = self.key(run)
+        style = self._styles.get(key)
+        if style is None:
+            if len(self._styles) >= self.max_entries:
+                self._styles.clear()
+            style = self._styles[key] = sys.intern(self.compute(run))
+        return style
+
+    def wrap(self, run, text: str) -> str:
+        """`text` (already escaped) wrapped in a span carrying the run's style, if it has one"""
+        style = self.css(run)
+        if not style:
+            return text
+        if not self.use_classes:
+            return f'<span style="{style}">{text}</span>'
+        name = self._classes.get(style)
+        if name is None:
+            name = self._classes[style] = f'r{len(self._classes) + 1}'
+        return f'<span class="{name}">{text}</span>'
+
+    def stylesheet(self) -> str:
+        """CSS rules for the classes used in the current document ('' in inline mode)"""
+        return '\n'.join(f'.{name} {{ {style} }}' for style, name in self._classes.items())
+
+    def style_element(self, indent: str = '') -> List[str]:
+        """Page parts of a `<style>` element holding `stylesheet()`, or none if it is empty"""
+        stylesheet = self.stylesheet()
+        return [f'{indent}<style>', stylesheet, f'{indent}</style>'] if stylesheet else []
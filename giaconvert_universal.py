@@ -4,11 +4,13 @@ GIACONVERT Universal Converter
 Supports both .doc and .docx files with comprehensive conversion features
 """
 
+import hashlib
 import os
 import sys
 import shutil
+import tempfile
 import zipfile
-import base64
+import io
 import re
 from pathlib import Path
 from typing import Optional, List, Dict, Any
@@ -19,10 +21,25 @@ from docx.shared import Inches
 from docx.oxml.ns import qn
 from docx.oxml import parse_xml
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.text.paragraph import Paragraph
 
 # For .doc files
 import docx2txt
 
+from giaconvert_blocks import iter_block_items
+from giaconvert_cache import ConversionCache
+from giaconvert_doc import CharFormat, DocPicture, DocTable, Word97Reader, is_word97_document
+from giaconvert_fastdocx import (
+    W_DRAWING, W_P, W_R, W_TBL, FastDocxReader, iter_table_rows, paragraph_alignment,
+    paragraph_text, run_format, run_properties, run_text
+)
+from giaconvert_images import (
+    IMAGE_FORMATS, AssetStore, copy_image, get_image_part, image_registry, iter_image_rel_ids, optimize_image, part_header,
+    responsive_attributes, write_image
+)
+from giaconvert_styles import RunStyleCache
+from giaconvert_writer import HTMLWriter, InlineImages, open_html_output
+
 # For HTML processing
 from lxml import html, etree
 try:
@@ -30,45 +47,92 @@ try:
 except ImportError:
     from cgi import escape as html_escape
 
+__version__ = "1.1.0"
+
+# .docx engines: python-docx object model, or lxml straight from the zip
+DOCX_ENGINES = ('docx', 'fast')
+
+_ALIGNMENT_CSS = {
+    WD_PARAGRAPH_ALIGNMENT.CENTER: 'center',
+    WD_PARAGRAPH_ALIGNMENT.RIGHT: 'right',
+    WD_PARAGRAPH_ALIGNMENT.JUSTIFY: 'justify',
+}
+
 
 class UniversalDocumentConverter:
     """Universal converter for both .doc and .docx files"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[ConversionCache] = None, dedupe_images: str = 'document',
+                 css_classes: bool = False, image_format: Optional[str] = None,
+                 responsive_images: bool = False, inline_max_size: Optional[int] = None,
+                 assets_dir: Optional[str] = None):
+        if image_format is not None and image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unknown image format: {image_format}")
         self.image_counter = 0
         self.extracted_images = []
+        self.image_format = image_format  # optimize images to this format (None keeps them as they are)
+        self.responsive_images = responsive_images  # dimensions, lazy loading and srcset variants on <img>
+        self.inline_max_size = inline_max_size  # embedded images larger than this (bytes) are saved as files
+        self.inline_images = InlineImages()  # base64 streamed into the page as it is written
+        self.overflow_images_dir: Optional[Path] = None  # images folder of a page without one, once needed
+        # Shared content-addressed image store, hard-linked into the image folders (see AssetStore)
+        self.asset_store = AssetStore(assets_dir) if assets_dir else None
+        self.image_registry = image_registry(dedupe_images, image_format)
+        self.css_classes = css_classes  # shared CSS classes instead of inline run styles
+        self.run_styles = RunStyleCache(self._get_run_style, use_classes=css_classes)
+        self.fast_run_styles = RunStyleCache(self._get_fast_run_style, use_classes=css_classes,
+                                             properties=run_properties)
+        self.doc_run_styles = RunStyleCache(self._get_doc_run_style, use_classes=css_classes,
+                                            key=lambda fmt: fmt)
+        self.cache = cache  # optional conversion cache consulted by convert_document
+
+    def cache_options(self) -> Dict[str, Any]:
+        """Converter settings that affect the output, used in conversion cache keys"""
+        return {'converter': 'universal', 'css_classes': self.css_classes, 'image_format': self.image_format,
+                'responsive_images': self.responsive_images, 'inline_max_size': self.inline_max_size}
     
-    def convert_doc_to_html(self, doc_path: str, html_path: str, extract_images: bool = False) -> Dict[str, Any]:
+    def convert_doc_to_html(self, doc_path: str, html_path: str, extract_images: bool = False,
+                            include_headers_footers: bool = False) -> Dict[str, Any]:
         """
-        Convert .doc file to HTML using docx2txt
+        Convert .doc file to HTML
+
+        Word 97-2003 documents are read natively (see giaconvert_doc) and go
+        through the same HTML emitter as .docx files. Any other .doc (such as
+        a .docx saved under a .doc name) falls back to a docx2txt text dump.
         
         Args:
             doc_path: Path to the .doc file
             html_path: Path where HTML file should be saved
-            extract_images: Whether to extract images (limited support for .doc)
+            extract_images: Whether to extract images
+            include_headers_footers: Whether to include headers and footers (Word 97-2003 only)
             
         Returns:
             Dictionary with conversion results
         """
+        if is_word97_document(doc_path):
+            return self._convert_word97_to_html(Path(doc_path), Path(html_path), extract_images,
+                                                include_headers_footers)
         try:
             doc_path = Path(doc_path)
             html_path = Path(html_path)
             
             # Create output directory if it doesn't exist
             html_path.parent.mkdir(parents=True, exist_ok=True)
+            self._start_document()
             
             # Extract text from .doc file
             if extract_images:
-                # Create temporary directory for images
-                temp_dir = html_path.parent / "temp_images"
-                temp_dir.mkdir(exist_ok=True)
+                # Private temporary directory next to the page (same file system, so the
+                # moves below are atomic renames); conversions running in parallel into
+                # the same folder never see or delete each other's images
+                temp_dir = Path(tempfile.mkdtemp(prefix=f'.{html_path.stem}_images.', dir=html_path.parent))
                 
                 try:
                     # Extract text and images
                     text = docx2txt.process(str(doc_path), str(temp_dir))
                     
                     # Get extracted images
-                    image_files = list(temp_dir.glob("*"))
+                    image_files = sorted(p for p in temp_dir.iterdir() if p.is_file())
                     images_dir = None
                     
                     if image_files:
@@ -76,36 +140,31 @@ class UniversalDocumentConverter:
                         images_dir = html_path.parent / f"{html_path.stem}_images"
                         images_dir.mkdir(exist_ok=True)
                         
-                        # Move images and track them
+                        # Move images and track them; each one replaces any earlier file at once
                         for i, img_file in enumerate(image_files):
-                            if img_file.is_file():
-                                new_name = f"image_{i+1}{img_file.suffix}"
-                                new_path = images_dir / new_name
-                                shutil.move(str(img_file), str(new_path))
-                                self.extracted_images.append({
-                                    'original_name': img_file.name,
-                                    'new_name': new_name,
-                                    'path': str(new_path)
-                                })
-                    
-                    # Clean up temp directory
-                    if temp_dir.exists():
-                        shutil.rmtree(temp_dir)
+                            new_name = f"image_{i+1}{img_file.suffix}"
+                            new_path = images_dir / new_name
+                            os.replace(img_file, new_path)
+                            self.extracted_images.append({
+                                'original_name': img_file.name,
+                                'new_name': new_name,
+                                'path': str(new_path)
+                            })
                         
                 except Exception as e:
                     print(f"Warning: Could not extract images from .doc file: {e}")
                     text = docx2txt.process(str(doc_path))
                     images_dir = None
+                    self.extracted_images = []
+                finally:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
             else:
                 text = docx2txt.process(str(doc_path))
                 images_dir = None
             
-            # Convert text to HTML
-            html_content = self._convert_text_to_html(text, doc_path.stem, images_dir)
-            
-            # Write HTML file
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            # Convert text to HTML, streaming it to disk
+            with open_html_output(html_path, separator='') as writer:
+                self._write_text_html(writer, text, doc_path.stem, images_dir)
             
             return {
                 'success': True,
@@ -121,10 +180,65 @@ class UniversalDocumentConverter:
                 'error': str(e),
                 'message': f'Failed to convert .doc file: {str(e)}'
             }
+
+    def _convert_word97_to_html(self, doc_path: Path, html_path: Path, extract_images: bool,
+                                include_headers_footers: bool) -> Dict[str, Any]:
+        """Convert a Word 97-2003 .doc read by Word97Reader, like `convert_docx_to_html`"""
+        reader = None
+        try:
+            html_path.parent.mkdir(parents=True, exist_ok=True)
+            reader = Word97Reader(doc_path)
+            self._start_document()
+
+            images_dir = None
+            if extract_images:
+                images_dir = html_path.parent / f"{html_path.stem}_images"
+                images_dir.mkdir(exist_ok=True)
+            else:
+                self.overflow_images_dir = html_path.parent / f"{html_path.stem}_images"
+
+            with open_html_output(html_path, inline_images=self.inline_images) as writer:
+                self._write_word97_content_html(writer, reader, doc_path.stem, images_dir, include_headers_footers)
+
+            return {
+                'success': True,
+                'html_path': str(html_path),
+                'images_extracted': len(self.extracted_images),
+                'images_dir': str(images_dir or self.overflow_images_dir)
+                if any(image['path'] for image in self.extracted_images) else None,
+                **self.image_registry.stats(),
+                **(self.asset_store.stats() if self.asset_store else {}),
+                'message': f'Successfully converted .doc file to HTML'
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f'Failed to convert .doc file: {str(e)}'
+            }
+        finally:
+            self.inline_images.clear()
+            if reader is not None:
+                reader.close()
+
+    def _start_document(self):
+        """Reset the per-document counters, registries and style classes"""
+        self.image_counter = 0
+        self.extracted_images = []
+        self.image_registry.start_document()
+        self.run_styles.start_document()
+        self.fast_run_styles.start_document()
+        self.doc_run_styles.start_document()
+        self.inline_images.clear()
+        self.overflow_images_dir = None
+        if self.asset_store:
+            self.asset_store.start_document()
     
     def convert_docx_to_html(self, docx_path: str, html_path: str, 
                            extract_images: bool = False, 
-                           include_headers_footers: bool = False) -> Dict[str, Any]:
+                           include_headers_footers: bool = False,
+                           engine: str = 'docx') -> Dict[str, Any]:
         """
         Convert .docx file to HTML with full feature support
         
@@ -133,44 +247,54 @@ class UniversalDocumentConverter:
             html_path: Path where HTML file should be saved
             extract_images: Whether to extract and embed images
             include_headers_footers: Whether to include headers and footers
+            engine: 'docx' (python-docx) or 'fast' (lxml directly on the zip); same HTML
             
         Returns:
             Dictionary with conversion results
         """
+        doc = None
         try:
             docx_path = Path(docx_path)
             html_path = Path(html_path)
+            if engine not in DOCX_ENGINES:
+                raise ValueError(f"Unknown engine: {engine}")
             
             # Create output directory if it doesn't exist
             html_path.parent.mkdir(parents=True, exist_ok=True)
             
             # Load the document
-            doc = Document(docx_path)
+            doc = FastDocxReader(docx_path) if engine == 'fast' else Document(docx_path)
             
             # Reset counters
-            self.image_counter = 0
-            self.extracted_images = []
+            self._start_document()
 
             # Prepare images directory for external mode (images are extracted inline during conversion)
             images_dir = None
             if extract_images:
                 images_dir = html_path.parent / f"{html_path.stem}_images"
                 images_dir.mkdir(exist_ok=True)
+            else:
+                self.overflow_images_dir = html_path.parent / f"{html_path.stem}_images"
             
-            # Convert document content
-            html_content = self._convert_docx_content_to_html(
-                doc, docx_path.stem, images_dir, include_headers_footers
-            )
-            
-            # Write HTML file
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            # Convert document content, streaming it to disk element by element
+            with open_html_output(html_path, inline_images=self.inline_images) as writer:
+                if engine == 'fast':
+                    self._write_fast_content_html(
+                        writer, doc, docx_path.stem, images_dir, include_headers_footers
+                    )
+                else:
+                    self._write_docx_content_html(
+                        writer, doc, docx_path.stem, images_dir, include_headers_footers
+                    )
             
             return {
                 'success': True,
                 'html_path': str(html_path),
                 'images_extracted': len(self.extracted_images),
-                'images_dir': str(images_dir) if images_dir and self.extracted_images else None,
+                'images_dir': str(images_dir or self.overflow_images_dir)
+                if any(image['path'] for image in self.extracted_images) else None,
+                **self.image_registry.stats(),
+                **(self.asset_store.stats() if self.asset_store else {}),
                 'message': f'Successfully converted .docx file to HTML'
             }
             
@@ -180,9 +304,14 @@ class UniversalDocumentConverter:
                 'error': str(e),
                 'message': f'Failed to convert .docx file: {str(e)}'
             }
+        finally:
+            self.inline_images.clear()
+            if isinstance(doc, FastDocxReader):
+                doc.close()
     
     def convert_document(self, input_path: str, output_path: str, 
-                        mode: str = 'enhanced') -> Dict[str, Any]:
+                        mode: str = 'enhanced', source_hash: Optional[str] = None,
+                        engine: str = 'docx') -> Dict[str, Any]:
         """
         Universal converter method that handles both .doc and .docx files
         
@@ -190,6 +319,8 @@ class UniversalDocumentConverter:
             input_path: Path to input document (.doc or .docx)
             output_path: Path for output HTML file
             mode: Conversion mode ('basic', 'enhanced', 'complete')
+            source_hash: SHA-256 of the input, if already known (saves re-hashing for the cache)
+            engine: .docx engine, 'docx' or 'fast' (.doc files ignore it)
             
         Returns:
             Dictionary with conversion results
@@ -200,36 +331,60 @@ class UniversalDocumentConverter:
         # Determine file type
         file_extension = input_path.suffix.lower()
         
+        if file_extension not in ('.docx', '.doc'):
+            return {
+                'success': False,
+                'error': f'Unsupported file type: {file_extension}',
+                'message': f'Only .doc and .docx files are supported'
+            }
+        
+        if self.cache is None:
+            return self._convert_document(input_path, output_path, mode, engine)
+        
+        return self.cache.convert(
+            input_path,
+            output_path,
+            mode=mode,
+            options=self.cache_options(),
+            version=__version__,
+            convert=lambda: self._convert_document(input_path, output_path, mode, engine),
+            source_hash=source_hash
+        )
+    
+    def _convert_document(self, input_path: Path, output_path: Path, mode: str,
+                          engine: str = 'docx') -> Dict[str, Any]:
+        """Dispatch a .doc or .docx file to its converter according to `mode`"""
         # Set conversion parameters based on mode
         extract_images = mode in ['enhanced', 'complete']
         include_headers_footers = mode == 'complete'
         
-        if file_extension == '.docx':
+        if input_path.suffix.lower() == '.docx':
             return self.convert_docx_to_html(
                 str(input_path), 
                 str(output_path), 
                 extract_images=extract_images,
-                include_headers_footers=include_headers_footers
+                include_headers_footers=include_headers_footers,
+                engine=engine
             )
-        elif file_extension == '.doc':
-            return self.convert_doc_to_html(
-                str(input_path), 
-                str(output_path), 
-                extract_images=extract_images
-            )
-        else:
-            return {
-                'success': False,
-                'error': f'Unsupported file type: {file_extension}',
-                'message': f'Only .doc and .docx files are supported'
-            }
+        return self.convert_doc_to_html(
+            str(input_path), 
+            str(output_path), 
+            extract_images=extract_images,
+            include_headers_footers=include_headers_footers
+        )
     
     def _convert_text_to_html(self, text: str, title: str, images_dir: Optional[Path]) -> str:
         """Convert plain text to HTML with basic formatting"""
+        buffer = io.StringIO()
+        self._write_text_html(HTMLWriter(buffer, separator=''), text, title, images_dir)
+        return buffer.getvalue()
+    
+    def _write_text_html(self, writer: HTMLWriter, text: str, title: str, images_dir: Optional[Path]):
+        """Write plain text as HTML with basic formatting"""
         # Split text into paragraphs
         paragraphs = text.split('\n\n')
         
-        html_content = f"""<!DOCTYPE html>
+        writer.write(f"""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -275,7 +430,7 @@ class UniversalDocumentConverter:
         <p><em>Converted from .doc format</em></p>
     </div>
     <div class="content">
-"""
+""")
         
         # Add paragraphs
         for paragraph in paragraphs:
@@ -286,28 +441,26 @@ class UniversalDocumentConverter:
                     if line.strip():
                         # Check if it looks like a heading
                         if len(line) < 100 and (line.isupper() or line.startswith('Chapter') or line.startswith('Section')):
-                            html_content += f"        <h2>{html_escape(line.strip())}</h2>\n"
+                            writer.write(f"        <h2>{html_escape(line.strip())}</h2>\n")
                         else:
-                            html_content += f"        <p>{html_escape(line.strip())}</p>\n"
+                            writer.write(f"        <p>{html_escape(line.strip())}</p>\n")
         
         # Add images if any were extracted
         if images_dir and self.extracted_images:
-            html_content += f"""
+            writer.write(f"""
         <div class="note">
             <strong>Note:</strong> This document contained {len(self.extracted_images)} image(s) 
             which have been extracted to the <code>{images_dir.name}/</code> folder.
         </div>
-"""
+""")
             
             for img in self.extracted_images:
                 rel_path = f"{images_dir.name}/{img['new_name']}"
-                html_content += f'        <img src="{rel_path}" alt="{img["original_name"]}" class="image" />\n'
+                writer.write(f'        <img src="{rel_path}" alt="{img["original_name"]}" class="image" />\n')
         
-        html_content += """    </div>
+        writer.write("""    </div>
 </body>
-</html>"""
-        
-        return html_content
+</html>""")
     
     def _get_image_extension(self, image_data: bytes) -> str:
         """Determine image file extension from binary magic bytes"""
@@ -319,6 +472,10 @@ class UniversalDocumentConverter:
             return 'gif'
         elif image_data.startswith(b'BM'):
             return 'bmp'
+        elif image_data[:4] == b'RIFF' and image_data[8:12] == b'WEBP':
+            return 'webp'
+        elif image_data[4:12] in (b'ftypavif', b'ftypavis'):
+            return 'avif'
         return 'png'
 
     def _get_run_style(self, run) -> str:
@@ -361,64 +518,105 @@ class UniversalDocumentConverter:
         Returns HTML <img> tags for all found images, placed at their document position.
         """
         html_parts = []
-        namespaces = {
-            'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
-            'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
-        }
-
         for run in paragraph.runs:
             for drawing in run._element.xpath('.//w:drawing'):
                 try:
-                    blips = drawing.xpath('.//a:blip[@r:embed]', namespaces=namespaces)
-                    for blip in blips:
-                        rel_id = blip.get(
-                            '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed'
-                        )
-                        if not rel_id:
-                            continue
-                        try:
-                            image_data = doc.part.rels[rel_id].target_part.blob
-                        except (KeyError, AttributeError):
+                    for rel_id in iter_image_rel_ids(drawing):
+                        image_part = get_image_part(paragraph, rel_id)
+                        if image_part is None:
                             continue
 
-                        self.image_counter += 1
-                        ext = self._get_image_extension(image_data)
-
-                        if images_dir is not None:
-                            # Save as external file
-                            filename = f'image_{self.image_counter:03d}.{ext}'
-                            img_path = images_dir / filename
-                            with open(img_path, 'wb') as f:
-                                f.write(image_data)
-                            rel_path = f'{images_dir.name}/{filename}'
-                            html_parts.append(
-                                f'<img src="{rel_path}" alt="Image {self.image_counter}" '
-                                f'style="max-width:100%;height:auto;" />'
-                            )
-                            self.extracted_images.append({
-                                'original_name': filename,
-                                'new_name': filename,
-                                'path': str(img_path),
-                            })
-                        else:
-                            # Embed as base64
-                            mime = f"image/{'jpeg' if ext == 'jpg' else ext}"
-                            b64 = base64.b64encode(image_data).decode('utf-8')
-                            src = f'data:{mime};base64,{b64}'
-                            html_parts.append(
-                                f'<img src="{src}" alt="Image {self.image_counter}" '
-                                f'style="max-width:100%;height:auto;" />'
-                            )
-                            self.extracted_images.append({
-                                'original_name': f'image_{self.image_counter}.{ext}',
-                                'new_name': f'image_{self.image_counter}.{ext}',
-                                'path': None,
-                            })
+                        # Each unique image is written once; later references reuse its HTML
+                        image_html, digest = self.image_registry.lookup(image_part)
+                        if image_html is None:
+                            image_html = self._emit_image(image_part, images_dir, digest)
+                        html_parts.append(image_html)
                 except Exception:
                     pass
 
         return ''.join(html_parts)
 
+    def _emit_image(self, image_part, images_dir: Optional[Path], digest: str) -> str:
+        """
+        Save or embed a newly seen image part and return its <img> tag.
+
+        An external image saved unchanged is streamed from the package to its
+        file when the part can be opened as a stream (fast engine), so its
+        bytes are never held in memory as a whole.
+        """
+        self.image_counter += 1
+        img_path = None
+        attributes = ''
+
+        # An image another document of the batch already wrote is linked rather than optimized again
+        existing = self.image_registry.batch_file(digest) if images_dir is not None else None
+        if (images_dir is not None and existing is None and not self.image_format
+                and not self.responsive_images and hasattr(image_part, 'open')):
+            image_data = None
+            source_size = output_size = image_part.size
+            header = part_header(image_part)
+        else:
+            image_data = source_data = image_part.blob
+            source_size = len(image_data)
+            if existing is None and self.image_format:
+                image_data = optimize_image(image_data, output_format=self.image_format)
+            output_size = len(image_data)
+            header = image_data
+            if images_dir is None and self.inline_max_size is not None and output_size > self.inline_max_size:
+                # Too large to embed: saved as an external file instead
+                images_dir = self.overflow_images_dir
+                images_dir.mkdir(exist_ok=True)
+
+        if images_dir is not None:
+            # Save as external file, linking the copy of an earlier document when there is one
+            ext = existing.suffix.lstrip('.') if existing is not None else self._get_image_extension(header)
+            filename = f'image_{self.image_counter:03d}.{ext}'
+            img_path = images_dir / filename
+            if existing is not None:
+                self.image_registry.place(existing, img_path)
+            elif self.asset_store is not None:
+                # Unchanged images are named after the digest the registry already took
+                if image_data is None:
+                    with image_part.open() as source:
+                        asset = self.asset_store.put(digest, ext, source=source)
+                else:
+                    content_digest = digest if image_data is source_data else hashlib.sha256(image_data).hexdigest()
+                    asset = self.asset_store.put(content_digest, ext, image_data)
+                self.asset_store.place(asset, img_path)
+            elif image_data is None:
+                with image_part.open() as source:
+                    copy_image(img_path, source)
+            else:
+                write_image(img_path, image_data)
+            src = f'{images_dir.name}/{filename}'
+            if self.responsive_images:
+                saved = img_path.read_bytes() if existing is not None else image_data
+                attributes = responsive_attributes(saved, img_path, src)
+            self.extracted_images.append({
+                'original_name': filename,
+                'new_name': filename,
+                'path': str(img_path),
+            })
+        else:
+            # Embed as base64, encoded straight into the page when it is written
+            ext = self._get_image_extension(image_data)
+            mime = f"image/{'jpeg' if ext == 'jpg' else ext}"
+            src = f'data:{mime};base64,{self.inline_images.placeholder(digest, image_data)}'
+            if self.responsive_images:
+                attributes = responsive_attributes(image_data)
+            self.extracted_images.append({
+                'original_name': f'image_{self.image_counter}.{ext}',
+                'new_name': f'image_{self.image_counter}.{ext}',
+                'path': None,
+            })
+
+        image_html = (
+            f'<img src="{src}" alt="Image {self.image_counter}"{attributes} '
+            f'style="max-width:100%;height:auto;" />'
+        )
+        self.image_registry.add(digest, image_html, img_path, source_size, output_size)
+        return image_html
+
     def _convert_paragraph(self, doc, paragraph, images_dir: Optional[Path]) -> str:
         """Convert a single docx paragraph to an HTML element, including inline images."""
         # Collect run text with inline styling
@@ -428,11 +626,7 @@ class UniversalDocumentConverter:
             if not text:
                 continue
             text = html_escape(text)
-            style = self._get_run_style(run)
-            if style:
-                text_parts.append(f'<span style="{style}">{text}</span>')
-            else:
-                text_parts.append(text)
+            text_parts.append(self.run_styles.wrap(run, text))
 
         image_html = self._extract_paragraph_images(doc, paragraph, images_dir)
 
@@ -442,9 +636,11 @@ class UniversalDocumentConverter:
 
         if not content:
             return '<br/>'
+        return self._paragraph_element(content, paragraph.style.name, paragraph.alignment)
 
+    def _paragraph_element(self, content: str, style_name: str, alignment) -> str:
+        """Wrap converted paragraph content in a heading or <p> element according to its style."""
         # Heading styles
-        style_name = paragraph.style.name
         if style_name.startswith('Heading'):
             level_str = style_name.replace('Heading ', '')
             try:
@@ -454,12 +650,7 @@ class UniversalDocumentConverter:
             return f'<h{level}>{content}</h{level}>'
 
         # Paragraph alignment
-        _align_map = {
-            WD_PARAGRAPH_ALIGNMENT.CENTER: 'center',
-            WD_PARAGRAPH_ALIGNMENT.RIGHT: 'right',
-            WD_PARAGRAPH_ALIGNMENT.JUSTIFY: 'justify',
-        }
-        alignment = _align_map.get(paragraph.alignment, '')
+        alignment = _ALIGNMENT_CSS.get(alignment, '')
         if alignment:
             return f'<p style="text-align:{alignment}">{content}</p>'
         return f'<p>{content}</p>'
@@ -501,6 +692,37 @@ class UniversalDocumentConverter:
     def _convert_docx_content_to_html(self, doc, title: str, images_dir: Optional[Path],
                                       include_headers_footers: bool) -> str:
         """Convert .docx document content to HTML with inline images and real headers/footers."""
+        buffer = io.StringIO()
+        writer = HTMLWriter(buffer)
+        self._write_docx_content_html(writer, doc, title, images_dir, include_headers_footers)
+        writer.finish()
+        return buffer.getvalue()
+
+    def _write_docx_content_html(self, writer: HTMLWriter, doc, title: str, images_dir: Optional[Path],
+                                 include_headers_footers: bool):
+        """Write .docx document content as HTML, one body element at a time."""
+        def blocks():
+            # Iterate over body elements in document order to preserve layout
+            for block in iter_block_items(doc):
+                if isinstance(block, Paragraph):
+                    yield self._convert_paragraph(doc, block, images_dir)
+                else:
+                    yield self._convert_table_to_html(doc, block, images_dir)
+
+        self._write_page(
+            writer, title, include_headers_footers,
+            headers=lambda: self._extract_headers_footers_html(doc, 'header', images_dir),
+            blocks=blocks(),
+            footers=lambda: self._extract_headers_footers_html(doc, 'footer', images_dir),
+            run_styles=self.run_styles,
+        )
+
+    def _write_page(self, writer: HTMLWriter, title: str, include_headers_footers: bool,
+                    headers, blocks, footers, run_styles: RunStyleCache):
+        """
+        Write the page around converted content: `blocks` yields the HTML of each
+        body element, `headers`/`footers` return the header and footer HTML.
+        """
 
         header_footer_css = ''
         if include_headers_footers:
@@ -522,7 +744,7 @@ class UniversalDocumentConverter:
             .document-footer { position: running(footer); background: white !important; border: none !important; }
         }'''
 
-        html_parts = [
+        writer.extend([
             '<!DOCTYPE html>',
             '<html lang="en">',
             '<head>',
@@ -538,61 +760,260 @@ class UniversalDocumentConverter:
             '        th { background-color: #f2f2f2; }',
             header_footer_css,
             '    </style>',
-            '</head>',
-            '<body>',
-        ]
+        ])
+        if run_styles.use_classes:
+            # Shared run styles (css_classes), filled in once the body is written
+            writer.defer(lambda: run_styles.style_element('    '))
+        writer.extend(['</head>', '<body>'])
 
         # Real header content
         if include_headers_footers:
-            headers_html = self._extract_headers_footers_html(doc, 'header', images_dir)
+            headers_html = headers()
             if headers_html:
-                html_parts.append('<header class="document-header">')
-                html_parts.append(headers_html)
-                html_parts.append('</header>')
-
-        html_parts.append('<main class="document-content">')
-
-        # Iterate over body elements in document order to preserve layout
-        for element in doc.element.body:
-            tag = element.tag.split('}')[-1] if '}' in element.tag else element.tag
-            if tag == 'p':
-                for para in doc.paragraphs:
-                    if para._element is element:
-                        html_parts.append(self._convert_paragraph(doc, para, images_dir))
-                        break
-            elif tag == 'tbl':
-                for table in doc.tables:
-                    if table._element is element:
-                        html_parts.append(self._convert_table_to_html(doc, table, images_dir))
-                        break
-
-        html_parts.append('</main>')
+                writer.write('<header class="document-header">')
+                writer.write(headers_html)
+                writer.write('</header>')
+
+        writer.write('<main class="document-content">')
+
+        for block_html in blocks:
+            writer.write(block_html)
+
+        writer.write('</main>')
 
         # Real footer content
         if include_headers_footers:
-            footers_html = self._extract_headers_footers_html(doc, 'footer', images_dir)
+            footers_html = footers()
             if footers_html:
-                html_parts.append('<footer class="document-footer">')
-                html_parts.append(footers_html)
-                html_parts.append('</footer>')
+                writer.write('<footer class="document-footer">')
+                writer.write(footers_html)
+                writer.write('</footer>')
+
+        writer.extend(['</body>', '</html>'])
 
-        html_parts.extend(['</body>', '</html>'])
-        return '\n'.join(html_parts)
+    # Fast engine: the same conversion on raw lxml elements from FastDocxReader
+
+    def _write_fast_content_html(self, writer: HTMLWriter, reader: FastDocxReader, title: str,
+                                 images_dir: Optional[Path], include_headers_footers: bool):
+        """Write a .docx package read by FastDocxReader as HTML, streaming the body."""
+        def blocks():
+            part = reader.document
+            for element in reader.iter_body_blocks():
+                if element.tag == W_P:
+                    yield self._convert_fast_paragraph(reader, part, element, images_dir)
+                elif element.tag == W_TBL:
+                    yield self._convert_fast_table(reader, part, element, images_dir)
+
+        self._write_page(
+            writer, title, include_headers_footers,
+            headers=lambda: self._extract_fast_headers_footers_html(reader, 'header', images_dir),
+            blocks=blocks(),
+            footers=lambda: self._extract_fast_headers_footers_html(reader, 'footer', images_dir),
+            run_styles=self.fast_run_styles,
+        )
+
+    def _get_fast_run_style(self, r_element) -> str:
+        """Inline CSS of a `w:r` element; same output as `_get_run_style`"""
+        fmt = run_format(run_properties(r_element))
+        styles = []
+
+        if fmt['bold']:
+            styles.append('font-weight:bold')
+        if fmt['italic']:
+            styles.append('font-style:italic')
+        if fmt['underline']:
+            styles.append('text-decoration:underline')
+        if fmt['color']:
+            r, g, b = fmt['color']
+            styles.append(f'color:rgb({r},{g},{b})')
+        if fmt['size']:
+            styles.append(f"font-size:{int(fmt['size'].pt * 1.33)}px")
+        if fmt['font']:
+            styles.append(f"font-family:'{fmt['font']}',sans-serif")
+
+        return ';'.join(styles)
+
+    def _extract_fast_paragraph_images(self, part, p, images_dir: Optional[Path]) -> str:
+        """Inline images of a `w:p`, resolved against the relationships of `part`."""
+        html_parts = []
+        for r in p.iterchildren(W_R):
+            for drawing in r.iter(W_DRAWING):
+                try:
+                    for rel_id in iter_image_rel_ids(drawing):
+                        try:
+                            image_part = part.related(rel_id)
+                        except KeyError:
+                            continue
+
+                        image_html, digest = self.image_registry.lookup(image_part)
+                        if image_html is None:
+                            image_html = self._emit_image(image_part, images_dir, digest)
+                        html_parts.append(image_html)
+                except Exception:
+                    pass
+
+        return ''.join(html_parts)
+
+    def _convert_fast_paragraph(self, reader: FastDocxReader, part, p, images_dir: Optional[Path]) -> str:
+        """Convert a `w:p` element to an HTML element, including inline images."""
+        text_parts = []
+        for r in p.iterchildren(W_R):
+            text = run_text(r)
+            if not text:
+                continue
+            text_parts.append(self.fast_run_styles.wrap(r, html_escape(text)))
+
+        image_html = self._extract_fast_paragraph_images(part, p, images_dir)
+
+        content = ''.join(text_parts)
+        if image_html:
+            content = (content + image_html) if content else image_html
+
+        if not content:
+            return '<br/>'
+        return self._paragraph_element(content, reader.paragraph_style_name(p), paragraph_alignment(p))
+
+    def _convert_fast_table(self, reader: FastDocxReader, part, tbl, images_dir: Optional[Path]) -> str:
+        """Convert a `w:tbl` element to HTML, with rich cell content."""
+        rows_html = []
+        for i, cells in enumerate(iter_table_rows(tbl)):
+            cells_html = []
+            tag = 'th' if i == 0 else 'td'
+            for tc in cells:
+                cell_parts = [
+                    self._convert_fast_paragraph(reader, part, p, images_dir)
+                    for p in tc.iterchildren(W_P)
+                ]
+                cell_content = ''.join(cell_parts) if cell_parts else '&nbsp;'
+                cells_html.append(f'<{tag}>{cell_content}</{tag}>')
+            rows_html.append('<tr>' + ''.join(cells_html) + '</tr>')
+        return '<table>\n' + '\n'.join(rows_html) + '\n</table>'
+
+    def _extract_fast_headers_footers_html(self, reader: FastDocxReader, part: str,
+                                           images_dir: Optional[Path]) -> str:
+        """Header or footer content of all sections, like `_extract_headers_footers_html`."""
+        parts_html = []
+        try:
+            for section_part in reader.header_footer_parts(part):
+                if section_part is None:
+                    continue
+                for p in section_part.root.iterchildren(W_P):
+                    if paragraph_text(p).strip():
+                        parts_html.append(self._convert_fast_paragraph(reader, section_part, p, images_dir))
+        except Exception as e:
+            print(f"Warning: Could not extract {part}: {e}")
+        return '\n'.join(parts_html)
+
+
+    # Word 97 engine: the same conversion on the paragraphs and tables of Word97Reader
+
+    def _write_word97_content_html(self, writer: HTMLWriter, reader: Word97Reader, title: str,
+                                   images_dir: Optional[Path], include_headers_footers: bool):
+        """Write a Word 97-2003 document as HTML, streaming the body as the reader walks it."""
+        def blocks():
+            for block in reader.iter_blocks():
+                if isinstance(block, DocTable):
+                    yield self._convert_word97_table(block, images_dir)
+                else:
+                    yield self._convert_word97_paragraph(block, images_dir)
+
+        self._write_page(
+            writer, title, include_headers_footers,
+            headers=lambda: self._extract_word97_headers_footers_html(reader, 'header', images_dir),
+            blocks=blocks(),
+            footers=lambda: self._extract_word97_headers_footers_html(reader, 'footer', images_dir),
+            run_styles=self.doc_run_styles,
+        )
+
+    def _get_doc_run_style(self, fmt: CharFormat) -> str:
+        """Inline CSS of a .doc run's CharFormat; same output as `_get_run_style`"""
+        styles = []
+
+        if fmt.bold:
+            styles.append('font-weight:bold')
+        if fmt.italic:
+            styles.append('font-style:italic')
+        if fmt.underline:
+            styles.append('text-decoration:underline')
+        if fmt.color:
+            r, g, b = fmt.color
+            styles.append(f'color:rgb({r},{g},{b})')
+        if fmt.size:
+            styles.append(f'font-size:{int(fmt.size * 1.33)}px')
+        if fmt.font:
+            styles.append(f"font-family:'{fmt.font}',sans-serif")
+
+        return ';'.join(styles)
+
+    def _convert_word97_picture(self, picture: DocPicture, images_dir: Optional[Path]) -> str:
+        """<img> tag of an inline .doc picture ('' for pictures that cannot be shown)"""
+        try:
+            if picture.blob is None:
+                return ''
+            image_html, digest = self.image_registry.lookup(picture)
+            if image_html is None:
+                image_html = self._emit_image(picture, images_dir, digest)
+            return image_html
+        except Exception:
+            return ''
+
+    def _convert_word97_paragraph(self, paragraph, images_dir: Optional[Path]) -> str:
+        """Convert a .doc paragraph to an HTML element, including inline images."""
+        text_parts = []
+        image_parts = []
+        for run in paragraph.runs:
+            if isinstance(run, DocPicture):
+                image_parts.append(self._convert_word97_picture(run, images_dir))
+            elif run[0]:
+                text_parts.append(self.doc_run_styles.wrap(run[1], html_escape(run[0])))
+
+        content = ''.join(text_parts) + ''.join(image_parts)
+        if not content:
+            return '<br/>'
+        return self._paragraph_element(content, paragraph.style_name, paragraph.alignment)
+
+    def _convert_word97_table(self, table: DocTable, images_dir: Optional[Path]) -> str:
+        """Convert a .doc table to HTML, with rich cell content."""
+        rows_html = []
+        for i, cells in enumerate(table.rows):
+            cells_html = []
+            tag = 'th' if i == 0 else 'td'
+            for paragraphs in cells:
+                cell_parts = [self._convert_word97_paragraph(p, images_dir) for p in paragraphs]
+                cell_content = ''.join(cell_parts) if cell_parts else '&nbsp;'
+                cells_html.append(f'<{tag}>{cell_content}</{tag}>')
+            rows_html.append('<tr>' + ''.join(cells_html) + '</tr>')
+        return '<table>\n' + '\n'.join(rows_html) + '\n</table>'
+
+    def _extract_word97_headers_footers_html(self, reader: Word97Reader, part: str,
+                                             images_dir: Optional[Path]) -> str:
+        """Header or footer content of all sections, like `_extract_headers_footers_html`."""
+        parts_html = []
+        try:
+            for paragraphs in reader.header_footer_paragraphs(part):
+                for paragraph in paragraphs:
+                    if paragraph.text.strip():
+                        parts_html.append(self._convert_word97_paragraph(paragraph, images_dir))
+        except Exception as e:
+            print(f"Warning: Could not extract {part}: {e}")
+        return '\n'.join(parts_html)
 
 
 def main():
     """Command line interface for testing"""
     if len(sys.argv) < 3:
-        print("Usage: python giaconvert_universal.py <input_file> <output_file> [mode]")
+        print("Usage: python giaconvert_universal.py <input_file> <output_file> [mode] [engine]")
         print("Modes: basic, enhanced, complete")
+        print(f"Engines (.docx): {', '.join(DOCX_ENGINES)}")
         sys.exit(1)
     
     input_file = sys.argv[1]
     output_file = sys.argv[2]
     mode = sys.argv[3] if len(sys.argv) > 3 else 'enhanced'
+    engine = sys.argv[4] if len(sys.argv) > 4 else 'docx'
     
     converter = UniversalDocumentConverter()
-    result = converter.convert_document(input_file, output_file, mode)
+    result = converter.convert_document(input_file, output_file, mode, engine=engine)
     
     if result['success']:
         print(f"✅ {result['message']}")
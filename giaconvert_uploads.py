@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT Resumable Uploads
+Chunked uploads written straight into place on disk, resumable after a dropped connection.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+# Chunk size handed to clients; every chunk but the last has exactly this size
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Read size when hashing a finished upload
+HASH_BLOCK_SIZE = 1024 * 1024
+
+UPLOAD_NOT_FOUND = "Upload not found. It may have been finalized or cancelled."
+
+
+class UploadError(Exception):
+    """A request the upload store cannot accept; `status_code` is the HTTP status to answer with"""
+
+    status_code = 400
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        if status_code is not None:
+            self.status_code = status_code
+
+
+class UploadTooLarge(UploadError):
+    """An upload went over its size limit"""
+
+    status_code = 413
+
+
+class ResumableUpload:
+    """One upload in progress: its target file and which chunks have arrived"""
+
+    def __init__(self, upload_id: str, filename: str, size: int, chunk_size: int, part_path: Path):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.size = size
+        self.chunk_size = chunk_size
+        self.part_path = part_path
+        self.received: Set[int] = set()
+        self.chunks = (size + chunk_size - 1) // chunk_size
+        self.updated = time.time()  # last time a chunk arrived
+
+    def chunk_length(self, index: int) -> int:
+        """Expected length of chunk `index` (the last one may be short)"""
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def missing(self) -> List[int]:
+        return [index for index in range(self.chunks) if index not in self.received]
+
+    def status(self) -> Dict:
+        return {
+            'upload_id': self.upload_id,
+            'filename': self.filename,
+            'size': self.size,
+            'chunk_size': self.chunk_size,
+            'chunks': self.chunks,
+            'missing': self.missing(),
+        }
+
+
+class UploadStore:
+    """
+    Uploads sent as fixed-size chunks in any order, possibly in parallel.
+
+    `create` reserves a sparse file of the announced size; each chunk is
+    written at its offset as it arrives, so nothing is buffered beyond one
+    chunk and a client that lost its connection asks for `missing` chunks
+    and sends only those. `finalize` checks that every chunk is present,
+    hashes the file from disk and moves it to its final name, ready to be
+    converted in place.
+    """
+
+    def __init__(self, directory: Path, chunk_size: int = DEFAULT_CHUNK_SIZE, max_bytes: Optional[int] = None):
+        self.directory = Path(directory)
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self._uploads: Dict[str, ResumableUpload] = {}
+        self._lock = threading.Lock()
+
+    def create(self, filename: str, size: int) -> ResumableUpload:
+        name = Path(filename).name
+        if not name.lower().endswith(('.docx', '.doc')):
+            raise UploadError(f"File {filename} is not a Word document (.doc or .docx)")
+        if size < 0:
+            raise UploadError("Upload size cannot be negative")
+        if self.max_bytes is not None and size > self.max_bytes:
+            raise UploadTooLarge(
+                f"File {filename} exceeds the upload limit of {self.max_bytes // (1024 * 1024)} MB per file"
+            )
+
+        upload_id = str(uuid.uuid4())
+        part_path = self.directory / f"{upload_id}.part"
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+        upload = ResumableUpload(upload_id, name, size, self.chunk_size, part_path)
+        with self._lock:
+            self._uploads[upload_id] = upload
+        return upload
+
+    def get(self, upload_id: str) -> ResumableUpload:
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+        if upload is None:
+            raise UploadError(UPLOAD_NOT_FOUND, 404)
+        return upload
+
+    def write_chunk(self, upload_id: str, offset: int, data: bytes, sha256: Optional[str] = None) -> ResumableUpload:
+        """Store one chunk at `offset`; sending the same chunk again is harmless"""
+        upload = self.get(upload_id)
+        if offset < 0 or offset % upload.chunk_size or offset >= max(upload.size, 1):
+            raise UploadError(f"Offset {offset} is not the start of a chunk")
+        index = offset // upload.chunk_size
+        if len(data) != upload.chunk_length(index):
+            raise UploadError(f"Chunk at offset {offset} must be {upload.chunk_length(index)} bytes, got {len(data)}")
+        if sha256 and hashlib.sha256(data).hexdigest() != sha256.lower():
+            raise UploadError(f"Chunk at offset {offset} does not match its SHA-256")
+
+        with open(upload.part_path, 'r+b') as f:
+            f.seek(offset)
+            f.write(data)
+        upload.received.add(index)
+        upload.updated = time.time()
+        return upload
+
+    def finalize(self, upload_id: str, sha256: Optional[str] = None) -> Dict:
+        """
+        Move a complete upload to its final name.
+
+        Returns the same fields as a regular upload, including the SHA-256
+        of the file; a client-supplied `sha256` must match it.
+        """
+        upload = self.get(upload_id)
+        missing = upload.missing()
+        if missing:
+            raise UploadError(f"Upload is incomplete: {len(missing)} chunk(s) missing", 409)
+
+        digest = hashlib.sha256()
+        try:
+            with open(upload.part_path, 'rb') as f:
+                for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                    digest.update(block)
+        except FileNotFoundError:
+            # Finalized or cancelled by another request meanwhile
+            raise UploadError(UPLOAD_NOT_FOUND, 404)
+        file_hash = digest.hexdigest()
+        if sha256 and sha256.lower() != file_hash:
+            raise UploadError("Uploaded file does not match its SHA-256")
+
+        final_path = self.directory / f"{upload.upload_id}_{upload.filename}"
+        # Only the first of several finalize requests for an upload moves it
+        with self._lock:
+            if self._uploads.get(upload_id) is not upload:
+                raise UploadError(UPLOAD_NOT_FOUND, 404)
+            os.replace(upload.part_path, final_path)
+            del self._uploads[upload_id]
+        return {
+            'upload_id': upload.upload_id,
+            'filename': upload.filename,
+            'size': upload.size,
+            'path': str(final_path),
+            'sha256': file_hash,
+        }
+
+    def abort(self, upload_id: str):
+        """Cancel an upload and delete what was received"""
+        upload = self.get(upload_id)
+        with self._lock:
+            if self._uploads.pop(upload_id, None) is None:
+                raise UploadError(UPLOAD_NOT_FOUND, 404)
+        upload.part_path.unlink(missing_ok=True)
+
+    def part_paths(self) -> Set[str]:
+        """Files of the uploads still in progress"""
+        with self._lock:
+            return {str(upload.part_path) for upload in self._uploads.values()}
+
+    def expire(self, max_age: float) -> int:
+        """Abort uploads that received no chunk for `max_age` seconds; returns how many"""
+        cutoff = time.time() - max_age
+        with self._lock:
+            stale = [upload for upload in self._uploads.values() if upload.updated < cutoff]
+            for upload in stale:
+                del self._uploads[upload.upload_id]
+        for upload in stale:
+            upload.part_path.unlink(missing_ok=True)
+        return len(stale)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+GIACONVERT HTML Writer
+Streams HTML pages to disk element by element instead of building them in memory.
+"""
+
+import base64
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, TextIO
+
+# mkstemp creates files as 0600; pages get the permissions open() would have given them
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Inline images stand in the page as INLINE_MARK + key + INLINE_MARK (XML text cannot
+# contain NUL) until HTMLWriter writes their base64 into the file
+INLINE_MARK = '\x00'
+
+# Image bytes encoded per write; a multiple of 3, so the chunks' base64 joins up without padding
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+# Characters of the page held in memory behind a deferred part before they spill to a temporary file
+DEFERRED_SPOOL_SIZE = 1024 * 1024
+
+
+class InlineImages:
+    """
+    Images of a page waiting to be embedded as base64.
+
+    The HTML built for an inline image holds a `placeholder` instead of
+    its base64 text. An HTMLWriter given this store encodes the bytes chunk
+    by chunk straight into the file when it writes the placeholder, so the
+    base64 of a large image never exists as one string, let alone the
+    copies made by formatting and joining it into the paragraph's HTML.
+    """
+
+    def __init__(self):
+        self._images: Dict[str, bytes] = {}
+
+    def placeholder(self, key: str, data: bytes) -> str:
+        """Text standing for the base64 of `data` in the page; `key` must be unique per image"""
+        self._images[key] = data
+        return f'{INLINE_MARK}{key}{INLINE_MARK}'
+
+    def write(self, stream: TextIO, key: str):
+        """Write the base64 of image `key` to `stream`"""
+        data = memoryview(self._images[key])
+        for start in range(0, len(data), BASE64_CHUNK_SIZE):
+            stream.write(base64.b64encode(data[start:start + BASE64_CHUNK_SIZE]).decode('ascii'))
+
+    def clear(self):
+        """Forget the images of the previous page"""
+        self._images.clear()
+
+
+class HTMLWriter:
+    """
+    Writes the parts of an HTML page to a text stream as they are produced.
+
+    Parts are separated by `separator`, so writing parts one by one gives the
+    same text as `separator.join(parts)` without holding the whole page in
+    memory; only the part currently being written has to fit. Placeholders
+    of `inline_images` are replaced by the images' base64 as they are written.
+
+    A part only known once the page is finished (the stylesheet of the CSS
+    classes used by the body) can be `defer`red: the rest of the page is
+    spooled behind it and `finish` writes it in its place.
+    """
+
+    def __init__(self, stream: TextIO, separator: str = '\n', inline_images: Optional[InlineImages] = None):
+        self.stream = stream
+        self.separator = separator
+        self.inline_images = inline_images
+        self._started = False
+        self._deferred: Optional[Callable[[], List[str]]] = None
+        self._spool: Optional[IO] = None
+
+    def write(self, part: str):
+        """Append one part (a header line, a paragraph, a table, ...) to the page"""
+        stream = self._spool or self.stream
+        if self._started:
+            stream.write(self.separator)
+        if self.inline_images is not None and INLINE_MARK in part:
+            # Text and image keys alternate between the marks
+            for index, piece in enumerate(part.split(INLINE_MARK)):
+                if index % 2:
+                    self.inline_images.write(stream, piece)
+                else:
+                    stream.write(piece)
+        else:
+            stream.write(part)
+        self._started = True
+
+    def extend(self, parts: Iterable[str]):
+        """Append several parts in order"""
+        for part in parts:
+            self.write(part)
+
+    def defer(self, parts: Callable[[], List[str]]):
+        """
+        Reserve this place, after the parts written so far, for the parts
+        `parts()` returns when the page is finished (none is fine).
+
+        Everything written afterwards is held in a temporary file (in memory
+        up to DEFERRED_SPOOL_SIZE characters) until `finish`.
+        """
+        if self._deferred is not None:
+            raise ValueError("A page can defer only one place")
+        self._deferred = parts
+        self._spool = tempfile.SpooledTemporaryFile(DEFERRED_SPOOL_SIZE, mode='w+', encoding='utf-8', newline='')
+
+    def finish(self):
+        """Write the deferred parts, then the page written behind them"""
+        if self._deferred is None:
+            return
+        deferred, spool = self._deferred, self._spool
+        self._deferred = self._spool = None
+        with spool:
+            for part in deferred():
+                self.stream.write(self.separator)
+                self.stream.write(part)
+            spool.seek(0)
+            shutil.copyfileobj(spool, self.stream)
+
+
+@contextmanager
+def open_atomic(path, mode: str = 'w', encoding: Optional[str] = None) -> Iterator[IO]:
+    """
+    Open a temporary file next to `path` and move it over `path` when the block finishes.
+
+    A writer that fails half way never leaves a truncated file behind (or
+    clobbers the previous one), and replacing instead of rewriting in place
+    keeps hard-linked copies of the old file intact.
+    """
+    path = Path(path)
+    fd, temp_name = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as stream:
+            yield stream
+        os.chmod(temp_name, 0o666 & ~_UMASK)
+        os.replace(temp_name, path)
+    except BaseException:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def open_html_output(html_path, separator: str = '\n', encoding: str = 'utf-8',
+                     inline_images: Optional[InlineImages] = None) -> Iterator[HTMLWriter]:
+    """
+    Open `html_path` for streaming and yield an HTMLWriter for it.
+
+    The page is written to a temporary file in the same folder and only
+    replaces `html_path` once it is complete (see `open_atomic`).
+    """
+    with open_atomic(html_path, 'w', encoding=encoding) as stream:
+        writer = HTMLWriter(stream, separator, inline_images)
+        yield writer
+        writer.finish()
@@ -16,6 +16,9 @@ const GiaconvertApp = {
             selectedMode: 'enhanced',
             outputOption: 'beside',
             destinationPath: '',
+            imageFormats: [],
+            imageFormat: '',  // '' keeps images as they are
+            responsiveImages: false,
             
             // Conversion progress
             conversionId: null,
@@ -27,8 +30,14 @@ const GiaconvertApp = {
             conversionErrors: [],
             conversionComplete: false,
             
-            // Polling
-            statusPollingInterval: null,
+            // Status updates: pushed events, or polling as a fallback
+            statusEventSource: null,
+            statusPollingTimer: null,
+            statusCursor: '0:0', // results/errors already received while polling
+            
+            // Chunked uploads
+            uploadParallelism: 4, // chunks in flight per file
+            uploadRetries: 3, // attempts per chunk before the upload fails
             
             // API base URL
             apiBaseUrl: window.location.origin + '/api'
@@ -72,7 +81,7 @@ const GiaconvertApp = {
     },
     
     beforeUnmount() {
-        this.stopStatusPolling();
+        this.stopStatusUpdates();
     },
     
     methods: {
@@ -97,6 +106,7 @@ const GiaconvertApp = {
                 if (response.ok) {
                     const data = await response.json();
                     this.conversionModes = data.modes;
+                    this.imageFormats = data.image_formats || [];
                 }
             } catch (error) {
                 console.error('Failed to load conversion modes:', error);
@@ -241,7 +251,9 @@ const GiaconvertApp = {
                     files: uploadedFiles.map(f => f.path),
                     mode: this.selectedMode,
                     output_option: this.outputOption,
-                    destination_path: this.destinationPath || null
+                    destination_path: this.destinationPath || null,
+                    image_format: this.selectedMode !== 'basic' && this.imageFormat ? this.imageFormat : null,
+                    responsive_images: this.selectedMode !== 'basic' && this.responsiveImages
                 };
                 
                 const response = await fetch(`${this.apiBaseUrl}/convert`, {
@@ -255,7 +267,7 @@ const GiaconvertApp = {
                 if (response.ok) {
                     const result = await response.json();
                     this.conversionId = result.conversion_id;
-                    this.startStatusPolling();
+                    this.startStatusUpdates();
                 } else {
                     const error = await response.json();
                     this.showError(`Failed to start conversion: ${error.error?.message || 'Unknown error'}`);
@@ -268,44 +280,184 @@ const GiaconvertApp = {
         },
         
         async uploadFiles() {
-            const formData = new FormData();
+            const uploaded = [];
             
-            // Add all selected .docx files
-            this.docxFiles.forEach(file => {
-                formData.append('files', file);
-            });
+            // Upload each selected .docx file in chunks
+            for (const file of this.docxFiles) {
+                try {
+                    uploaded.push(await this.uploadFileInChunks(file));
+                } catch (error) {
+                    console.error('Upload error:', error);
+                    this.showError(`Upload of ${file.name} failed: ${error.message}`);
+                    return [];
+                }
+            }
             
-            try {
-                const response = await fetch(`${this.apiBaseUrl}/upload`, {
-                    method: 'POST',
-                    body: formData
-                });
+            return uploaded;
+        },
+        
+        async uploadFileInChunks(file) {
+            // An interrupted upload of the same file is resumed instead of started over
+            const resumeKey = `giaconvert_upload:${file.name}:${file.size}:${file.lastModified}`;
+            let upload = null;
+            const previousId = localStorage.getItem(resumeKey);
+            if (previousId) {
+                const response = await fetch(`${this.apiBaseUrl}/uploads/${previousId}`);
+                upload = response.ok ? await response.json() : null;
+            }
+            if (!upload) {
+                upload = await this.uploadRequest('POST', '/uploads', { filename: file.name, size: file.size });
+                localStorage.setItem(resumeKey, upload.upload_id);
+            }
+            
+            // Send the missing chunks, several at a time
+            const queue = [...upload.missing];
+            const sendNext = async () => {
+                while (queue.length > 0) {
+                    await this.sendChunk(upload, file, queue.shift());
+                }
+            };
+            const senders = Math.min(this.uploadParallelism, queue.length);
+            await Promise.all(Array.from({ length: senders }, sendNext));
+            
+            const result = await this.uploadRequest('POST', `/uploads/${upload.upload_id}/finalize`, {});
+            localStorage.removeItem(resumeKey);
+            return result;
+        },
+        
+        async sendChunk(upload, file, index) {
+            const offset = index * upload.chunk_size;
+            const chunk = await file.slice(offset, offset + upload.chunk_size).arrayBuffer();
+            const headers = { 'Content-Type': 'application/octet-stream' };
+            if (window.crypto && window.crypto.subtle) {
+                const digest = await window.crypto.subtle.digest('SHA-256', chunk);
+                headers['X-Chunk-SHA256'] = Array.from(new Uint8Array(digest))
+                    .map(b => b.toString(16).padStart(2, '0')).join('');
+            }
+            
+            for (let attempt = 1; ; attempt++) {
+                let response = null;
+                try {
+                    response = await fetch(`${this.apiBaseUrl}/uploads/${upload.upload_id}?offset=${offset}`, {
+                        method: 'PUT',
+                        headers,
+                        body: chunk
+                    });
+                } catch (error) {
+                    // Connection dropped: send the chunk again below
+                    if (attempt >= this.uploadRetries) {
+                        throw error;
+                    }
+                }
                 
-                if (response.ok) {
-                    return await response.json();
-                } else {
-                    const error = await response.json();
-                    this.showError(`Upload failed: ${error.error?.message || 'Unknown error'}`);
-                    return [];
+                if (response) {
+                    if (response.ok) {
+                        return;
+                    }
+                    const error = await response.json().catch(() => ({}));
+                    const message = error.error?.message || `HTTP ${response.status}`;
+                    // A cancelled upload or an oversized chunk will not succeed on retry
+                    if (response.status === 404 || response.status === 413 || attempt >= this.uploadRetries) {
+                        throw new Error(message);
+                    }
                 }
-            } catch (error) {
-                console.error('Upload error:', error);
-                this.showError('Failed to upload files. Please check your connection.');
-                return [];
+                await new Promise(resolve => setTimeout(resolve, 500 * attempt));
+            }
+        },
+        
+        async uploadRequest(method, path, body) {
+            const response = await fetch(`${this.apiBaseUrl}${path}`, {
+                method,
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(body)
+            });
+            const result = await response.json();
+            if (!response.ok) {
+                throw new Error(result.error?.message || 'Unknown error');
+            }
+            return result;
+        },
+        
+        // Status updates
+        startStatusUpdates() {
+            // Progress is pushed per file; poll only when the browser or server cannot stream
+            if (!window.EventSource) {
+                this.startStatusPolling();
+                return;
+            }
+            
+            const source = new EventSource(`${this.apiBaseUrl}/events/${this.conversionId}`);
+            this.statusEventSource = source;
+            
+            source.addEventListener('progress', event => {
+                this.applyStatusCounters(JSON.parse(event.data));
+            });
+            source.addEventListener('result', event => {
+                this.conversionResults.push(JSON.parse(event.data));
+                this.statusCursor = event.lastEventId; // polling continues from here if needed
+            });
+            source.addEventListener('file_error', event => {
+                this.conversionErrors.push(JSON.parse(event.data));
+                this.statusCursor = event.lastEventId;
+            });
+            source.addEventListener('done', event => {
+                const status = JSON.parse(event.data);
+                this.applyStatusCounters(status);
+                this.finishConversion(status);
+            });
+            source.onerror = () => {
+                // The browser reconnects by itself after a dropped connection; a closed
+                // stream means the server does not offer it, so fall back to polling
+                if (source.readyState === EventSource.CLOSED) {
+                    this.stopStatusUpdates();
+                    this.startStatusPolling();
+                }
+            };
+        },
+        
+        stopStatusUpdates() {
+            if (this.statusEventSource) {
+                this.statusEventSource.close();
+                this.statusEventSource = null;
             }
+            this.stopStatusPolling();
+        },
+        
+        applyStatusCounters(status) {
+            this.conversionProgress = status.progress;
+            this.currentFile = status.current_file;
+            this.completedFiles = status.completed_files;
+            this.totalFiles = status.total_files;
         },
         
-        // Status polling
+        finishConversion(status) {
+            this.conversionComplete = true;
+            this.stopStatusUpdates();
+            
+            if (status.status === 'failed') {
+                this.showError('Conversion failed. Please check the error messages above.');
+            }
+        },
+        
+        // Status polling (fallback)
         startStatusPolling() {
-            this.statusPollingInterval = setInterval(async () => {
+            // Each poll is scheduled a second after the previous one finished: paging
+            // through a large job can take longer than that, and two polls at once
+            // would read the same cursor and add the same results twice
+            const poll = async () => {
                 await this.checkConversionStatus();
-            }, 1000); // Poll every second
+                if (this.statusPollingTimer === timer) {
+                    this.statusPollingTimer = timer = setTimeout(poll, 1000);
+                }
+            };
+            let timer = setTimeout(poll, 1000);
+            this.statusPollingTimer = timer;
         },
         
         stopStatusPolling() {
-            if (this.statusPollingInterval) {
-                clearInterval(this.statusPollingInterval);
-                this.statusPollingInterval = null;
+            if (this.statusPollingTimer) {
+                clearTimeout(this.statusPollingTimer);
+                this.statusPollingTimer = null;
             }
         },
         
@@ -313,28 +465,25 @@ const GiaconvertApp = {
             if (!this.conversionId) return;
             
             try {
-                const response = await fetch(`${this.apiBaseUrl}/status/${this.conversionId}`);
-                
-                if (response.ok) {
-                    const status = await response.json();
-                    
-                    this.conversionProgress = status.progress;
-                    this.currentFile = status.current_file;
-                    this.completedFiles = status.completed_files;
-                    this.totalFiles = status.total_files;
-                    this.conversionResults = status.results || [];
-                    this.conversionErrors = status.errors || [];
-                    
-                    if (status.status === 'completed' || status.status === 'completed_with_errors' || status.status === 'failed') {
-                        this.conversionComplete = true;
-                        this.stopStatusPolling();
-                        
-                        if (status.status === 'failed') {
-                            this.showError('Conversion failed. Please check the error messages above.');
-                        }
+                // Only fetch the results and errors that arrived since the last poll
+                let status;
+                do {
+                    const response = await fetch(
+                        `${this.apiBaseUrl}/status/${this.conversionId}?since=${this.statusCursor}&limit=500`
+                    );
+                    if (!response.ok) {
+                        console.error('Failed to get conversion status');
+                        return;
                     }
-                } else {
-                    console.error('Failed to get conversion status');
+                    status = await response.json();
+                    this.conversionResults.push(...status.results);
+                    this.conversionErrors.push(...status.errors);
+                    this.statusCursor = status.next_cursor;
+                } while (status.has_more);
+                
+                this.applyStatusCounters(status);
+                if (status.status === 'completed' || status.status === 'completed_with_errors' || status.status === 'failed') {
+                    this.finishConversion(status);
                 }
             } catch (error) {
                 console.error('Status check error:', error);
@@ -345,7 +494,7 @@ const GiaconvertApp = {
         resetConversionState() {
             this.conversionId = null;
             this.resetConversionProgress();
-            this.stopStatusPolling();
+            this.stopStatusUpdates();
         },
         
         resetConversionProgress() {
@@ -356,6 +505,7 @@ const GiaconvertApp = {
             this.conversionResults = [];
             this.conversionErrors = [];
             this.conversionComplete = false;
+            this.statusCursor = '0:0';
         },
         
         formatFileSize(bytes) {
@@ -407,6 +557,8 @@ const GiaconvertApp = {
                     this.selectedMode = parsed.selectedMode || 'enhanced';
                     this.outputOption = parsed.outputOption || 'beside';
                     this.destinationPath = parsed.destinationPath || '';
+                    this.imageFormat = parsed.imageFormat || '';
+                    this.responsiveImages = !!parsed.responsiveImages;
                 }
             } catch (error) {
                 console.error('Failed to load user settings:', error);
@@ -418,7 +570,9 @@ const GiaconvertApp = {
                 const settings = {
                     selectedMode: this.selectedMode,
                     outputOption: this.outputOption,
-                    destinationPath: this.destinationPath
+                    destinationPath: this.destinationPath,
+                    imageFormat: this.imageFormat,
+                    responsiveImages: this.responsiveImages
                 };
                 localStorage.setItem('giaconvert_settings', JSON.stringify(settings));
             } catch (error) {
@@ -438,6 +592,14 @@ const GiaconvertApp = {
         
         destinationPath() {
             this.saveUserSettings();
+        },
+        
+        imageFormat() {
+            this.saveUserSettings();
+        },
+        
+        responsiveImages() {
+            this.saveUserSettings();
         }
     }
 };